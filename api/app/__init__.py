@@ -30,8 +30,14 @@ logging.basicConfig(
 logger = logging.getLogger('nas_ddns_api')
 
 
-def create_app(config_name=None):
-    """应用工厂函数"""
+def create_app(config_name=None, background=True):
+    """
+    应用工厂函数
+
+    Args:
+        config_name: 配置名，默认取 FLASK_ENV
+        background: 是否启动只对 Web worker 有用的后台线程（FRP状态轮询、WebSocket状态推送等），Celery 入口传 False
+    """
     app = Flask(__name__)
 
     # 加载配置
@@ -39,6 +45,9 @@ def create_app(config_name=None):
         config_name = os.getenv('FLASK_ENV', 'production')
 
     app.config.from_object(config[config_name])
+    if not background:
+        app.config['FRP_STATUS_POLLER_ENABLED'] = False
+        app.config['SOCKETIO_ENABLED'] = False
     logger.info(f"Application running in {config_name} mode")
 
     # 初始化扩展
@@ -85,6 +94,11 @@ def create_app(config_name=None):
     if app.config.get('CELERY_ENABLED', False):
         init_celery(app)
 
+    # 初始化 WebSocket（如果启用）
+    if app.config.get('SOCKETIO_ENABLED', False):
+        from app.api.websocket import init_socketio
+        init_socketio(app)
+
     # 注册命令行命令
     register_commands(app)
 
@@ -63,12 +63,28 @@ def index():
             'nas_volumes': '/api/v2/nas/volumes',
             'nas_shares': '/api/v2/nas/shares',
             'nas_files': '/api/v2/nas/files',
+            'nas_volume_forecast': '/api/v2/nas/volumes/<volume_id>/forecast',
+            'nas_folder_size': '/api/v2/nas/folders/size',
+            'nas_search': '/api/v2/nas/search',
+            'nas_download': '/api/v2/nas/files/download',
+            'nas_upload': '/api/v2/nas/files/upload',
+            'nas_dedup_report': '/api/v2/nas/dedup/report',
             'frp_status': '/api/v2/frp/status',
             'frp_configs': '/api/v2/frp/configs',
+            'frp_configs_batch': '/api/v2/frp/configs/batch',
+            'frp_backups': '/api/v2/frp/configs/backups',
+            'frp_backups_diff': '/api/v2/frp/configs/backups/diff',
+            'frp_latency': '/api/v2/frp/latency',
             'frp_logs': '/api/v2/frp/logs',
+            'frp_logs_stream': '/api/v2/frp/logs/stream',
+            'frp_client_process': '/api/v2/frp/client/process',
             'ddns_status': '/api/v2/ddns/status',
             'ddns_update': '/api/v2/ddns/update',
+            'ddns_update_batch': '/api/v2/ddns/update/batch',
+            'ddns_daemon': '/api/v2/ddns/daemon',
+            'ddns_propagation': '/api/v2/ddns/propagation',
             'ddns_history': '/api/v2/ddns/history',
+            'ddns_logs_stream': '/api/v2/ddns/logs/stream',
             # 通用端点
             'health': '/api/v2/health',
             'metrics': '/api/v2/metrics'
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 import logging
-import os
+
+from app.services.ddns_coalesce import update_configured_records
+from app.services.ddns_status import get_ddns_status_provider
 
 ddns_bp = Blueprint('ddns_v2', __name__, url_prefix='/ddns')
 logger = logging.getLogger('ddns_api')
@@ -23,23 +25,11 @@ def log_operation(user_id, action, resource, details=None):
 
 @ddns_bp.route('/status', methods=['GET'])
 def get_ddns_status():
-    """获取DDNS服务状态"""
+    """获取DDNS服务状态（读取共享状态快照，状态文件和定时器由后台线程监视）"""
     try:
-        # 从配置文件获取状态
-        status_file = "/opt/yyc3/run/status.json"
-        if os.path.exists(status_file):
-            import json
-            with open(status_file, 'r') as f:
-                status_data = json.load(f)
-        else:
-            status_data = {"success": False, "message": "Status file not found"}
-
-        # 获取系统DDNS运行状态
-        import subprocess
-        ddns_running = subprocess.run(
-            ["systemctl", "is-active", "--quiet", "yyc3-ddns.timer"],
-            capture_output=True
-        ).returncode == 0
+        snapshot = get_ddns_status_provider().get()
+        status_data = snapshot["data"] or {"success": False, "message": snapshot["error"]}
+        ddns_running = bool(snapshot["running"])
 
         return jsonify({
             "success": True,
@@ -52,7 +42,9 @@ def get_ddns_status():
                 "domain": status_data.get("domain"),
                 "status": status_data.get("message"),
                 "next_check": None,
-                "uptime": get_service_uptime("yyc3-ddns.timer")
+                "uptime": get_service_uptime("yyc3-ddns.timer"),
+                "status_updated_at": snapshot["mtime"],
+                "watcher": snapshot["watcher"]
             },
             "metadata": {
                 "version": "v2",
@@ -202,9 +194,15 @@ def manual_ddns_update():
     force = request.args.get('force', 'false').lower() == 'true'
 
     try:
-        # 执行DDNS更新脚本
-        # result = run_ddns_update(force=force)
-        result = {"success": True, "ip": "8.152.195.33"}
+        # 与 /ddns/update 及其他 worker 的并发更新合并为一次
+        shared, coalesced = update_configured_records(source='manual')
+        result = {
+            "success": shared["update"].get("action") not in ("failed", "partial"),
+            "ip": shared["ip"],
+            "action": shared["update"].get("action"),
+            "summary": shared["update"].get("summary"),
+            "coalesced": coalesced
+        }
 
         log_operation(
             user_id=request.user_id,
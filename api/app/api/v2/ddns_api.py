@@ -5,13 +5,22 @@ DDNS管理API模块
 
 import os
 import subprocess
-import requests
-import hmac
-import hashlib
 from datetime import datetime
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request
 from flask_cors import cross_origin
 
+from app.services.alidns import AlidnsError, alidns_configured
+from app.services.ddns_batch import get_batch_updater, parse_targets, targets_from_dicts, validate_address
+from app.services.ddns_coalesce import address_value, get_update_coalescer, records_key, update_configured_records
+from app.services.ddns_daemon import get_ddns_daemon_client
+from app.services.ddns_history import get_ddns_history_store, record_update
+from app.services.ddns_status import get_ddns_status_provider
+from app.services.dns_propagation import get_propagation_checker
+from app.services.ipv6_prefix import get_ipv6_tracker, warn_missing_ipv6
+from app.services.log_stream import LogFilter, sse_log_stream
+from app.services.public_ip import get_public_ip_detector
+from app.utils.log_tail import tail_lines
+
 ddns_api_bp = Blueprint('ddns_api', __name__)
 
 # 阿里云DDNS配置
@@ -27,6 +36,11 @@ NAS_SERVER_IP = os.getenv('NAS_SERVER_IP', '8.152.195.33')
 DDNS_LOG_PATH = os.getenv('DDNS_LOG_PATH', '/var/log/ddns.log')
 DDNS_UPDATE_INTERVAL = int(os.getenv('DDNS_UPDATE_INTERVAL', '300'))
 
+# 单次最多返回的日志行数
+MAX_LOG_LINES = 5000
+# 单页最多返回的历史记录数
+MAX_HISTORY_PAGE = 500
+
 
 # ========== 模拟数据 ==========
 
@@ -116,14 +130,30 @@ def get_ddns_status():
         JSON: DDNS服务状态信息
     """
     try:
-        # 检查DDNS服务是否运行（容器环境使用模拟数据）
+        daemon = get_ddns_daemon_client().status()
+        if daemon is not None:
+            return jsonify({
+                'success': True,
+                'data': _daemon_status(daemon)
+            }), 200
+        
+        # 守护进程未运行：使用 DDNS 脚本（systemd 定时器）写入的状态文件快照
+        snapshot = get_ddns_status_provider().get()
+        if snapshot['exists'] and snapshot['data']:
+            return jsonify({
+                'success': True,
+                'data': _script_status(snapshot)
+            }), 200
+        
+        # 两者都没有（容器环境使用模拟数据）
         is_running = True
         
-        # 获取当前公网IP
-        try:
-            current_ip = requests.get('https://api.ipify.org', timeout=5).text
-        except:
-            current_ip = NAS_SERVER_IP
+        # 获取当前公网IP（短时缓存，多个来源竞速）
+        detected = get_public_ip_detector().get()
+        current_ip = detected['ip'] or NAS_SERVER_IP
+        
+        # 本机网卡上的 IPv6 地址和前缀（不访问外部服务）
+        ipv6 = get_ipv6_tracker().snapshot()
         
         # 获取最后更新时间
         last_update = datetime.now()
@@ -135,6 +165,10 @@ def get_ddns_status():
             'provider': 'aliyun',
             'domain': f'{ALIYUN_SUB_DOMAIN}.{ALIYUN_DOMAIN}',
             'currentIP': current_ip,
+            'ipSource': detected['source'],
+            'ipDetectedAt': datetime.fromtimestamp(detected['detectedAt']).isoformat(),
+            'currentIPv6': ipv6['address'],
+            'ipv6Prefixes': {name: info['prefix'] for name, info in ipv6['interfaces'].items()},
             'expectedIP': NAS_SERVER_IP,
             'lastUpdate': last_update.isoformat(),
             'nextUpdate': (last_update.timestamp() + DDNS_UPDATE_INTERVAL),
@@ -155,6 +189,102 @@ def get_ddns_status():
         }), 500
 
 
+def _isoformat(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+
+def _daemon_status(daemon):
+    """将守护进程状态转换为 /status 响应格式"""
+    state = daemon['state']
+    current_ip = state['ip'] or NAS_SERVER_IP
+    if state['lastError']:
+        status, message = 'error', state['lastError']['message']
+    elif current_ip != NAS_SERVER_IP:
+        status, message = 'warning', f'IP不匹配: {current_ip} != {NAS_SERVER_IP}'
+    else:
+        status, message = 'success', 'DDNS运行正常'
+    return {
+        'running': True,
+        'enabled': True,
+        'provider': 'aliyun',
+        'domain': f'{ALIYUN_SUB_DOMAIN}.{ALIYUN_DOMAIN}',
+        'currentIP': current_ip,
+        'ipSource': state['ipSource'],
+        'ipDetectedAt': _isoformat(state['lastCheck']),
+        'currentIPv6': state.get('ipv6'),
+        'ipv6Prefixes': state.get('ipv6Prefixes', {}),
+        'expectedIP': NAS_SERVER_IP,
+        'lastUpdate': _isoformat(state['lastUpdate']),
+        'lastChange': _isoformat(state['lastChange']),
+        'nextUpdate': state['nextCheck'],
+        'updateInterval': DDNS_UPDATE_INTERVAL,
+        'watcher': state['watcher'],
+        'daemon': daemon['metrics'],
+        'status': status,
+        'message': message
+    }
+
+
+def _script_status(snapshot):
+    """将 DDNS 脚本的状态文件快照转换为 /status 响应格式"""
+    data = snapshot['data']
+    current_ip = data.get('current_ip') or NAS_SERVER_IP
+    if data.get('success') is False:
+        status, message = 'error', data.get('message') or 'DDNS更新失败'
+    elif current_ip != NAS_SERVER_IP:
+        status, message = 'warning', f'IP不匹配: {current_ip} != {NAS_SERVER_IP}'
+    else:
+        status, message = 'success', data.get('message') or 'DDNS运行正常'
+    return {
+        'running': bool(snapshot['running']),
+        'enabled': True,
+        'provider': 'aliyun',
+        'domain': data.get('domain') or f'{ALIYUN_SUB_DOMAIN}.{ALIYUN_DOMAIN}',
+        'currentIP': current_ip,
+        'ipSource': 'ddns-script',
+        'ipDetectedAt': data.get('timestamp'),
+        'currentIPv6': None,
+        'ipv6Prefixes': {},
+        'expectedIP': NAS_SERVER_IP,
+        'lastUpdate': data.get('timestamp'),
+        'lastIP': data.get('last_ip'),
+        'nextUpdate': None,
+        'updateInterval': DDNS_UPDATE_INTERVAL,
+        'watcher': snapshot['watcher'],
+        'statusUpdatedAt': _isoformat(snapshot['mtime']),
+        'status': status,
+        'message': message
+    }
+
+
+@ddns_api_bp.route('/daemon', methods=['GET'])
+@cross_origin()
+def get_ddns_daemon():
+    """
+    获取DDNS守护进程的原始状态和计数
+    
+    返回:
+        JSON: {'state', 'metrics'}，守护进程未运行时返回 503
+    """
+    try:
+        daemon = get_ddns_daemon_client().status()
+        if daemon is None:
+            return jsonify({
+                'success': False,
+                'error': 'DDNS daemon is not running'
+            }), 503
+        return jsonify({
+            'success': True,
+            'data': daemon
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @ddns_api_bp.route('/domains', methods=['GET'])
 @cross_origin()
 def get_ddns_domains():
@@ -258,34 +388,152 @@ def update_ddns():
         JSON: 操作结果
     """
     try:
-        # 获取当前公网IP
-        try:
-            current_ip = requests.get('https://api.ipify.org', timeout=5).text
-        except:
-            current_ip = NAS_SERVER_IP
+        # 守护进程运行时由其立即检测并更新，避免两处同时写解析记录
+        daemon = get_ddns_daemon_client().check()
+        if daemon is not None and daemon.get('check'):
+            check = daemon['check']
+            if check.get('error'):
+                return jsonify({
+                    'success': False,
+                    'error': check['error']
+                }), 502
+            return _update_response(check['ip'], check.get('update'))
         
-        # 模拟阿里云API调用
-        # 实际项目中应该调用真实的阿里云DNS API
+        if alidns_configured():
+            # 与其他 worker / Celery 任务的并发更新合并为一次：重新检测IP，每个 zone 只读取一次记录
+            shared, _ = update_configured_records(source='api')
+            current_ip, update = shared['ip'], shared['update']
+        else:
+            # 未配置阿里云密钥，模拟更新
+            current_ip = get_public_ip_detector().get(force=True)['ip'] or NAS_SERVER_IP
+            update = None
+            record_update([{
+                'domain': ALIYUN_DOMAIN, 'rr': ALIYUN_SUB_DOMAIN, 'type': 'A', 'value': current_ip,
+                'oldValue': NAS_SERVER_IP, 'action': 'unchanged' if current_ip == NAS_SERVER_IP else 'simulated'
+            }], 'api')
+        
+        return _update_response(current_ip, update)
         
-        # 记录日志
-        log_message = f"[{datetime.now().isoformat()}] DDNS更新: {ALIYUN_SUB_DOMAIN}.{ALIYUN_DOMAIN} -> {current_ip}"
+    except AlidnsError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Alidns error: {str(e)}',
+            'requestId': e.request_id
+        }), 502
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+def _update_response(current_ip, update):
+    """
+    构建 /update 响应；顶层字段对应默认记录 ALIYUN_SUB_DOMAIN.ALIYUN_DOMAIN，records 为全部记录的结果
+    
+    Args:
+        update: 批量更新结果，未配置阿里云密钥（模拟更新）时为 None
+    """
+    if update is None:
+        old_ip = NAS_SERVER_IP
+        action = 'unchanged' if current_ip == NAS_SERVER_IP else 'simulated'
+        primary = {}
+        update = {'results': [], 'summary': {}}
+    else:
+        action = update.get('action', 'unchanged')
+        primary = next(
+            (r for r in update.get('results', [])
+             if r['domain'] == ALIYUN_DOMAIN and r['rr'] == ALIYUN_SUB_DOMAIN and r['type'] == 'A'),
+            {}
+        )
+        old_ip = primary.get('oldValue', current_ip)
+    status = 'success' if action in ('unchanged', 'skipped') else 'updated'
+    
+    return jsonify({
+        'success': action not in ('failed', 'partial'),
+        'message': 'IP未变化，无需更新' if status == 'success' else f'DDNS更新结果: {action}',
+        'data': {
+            'domain': f'{ALIYUN_SUB_DOMAIN}.{ALIYUN_DOMAIN}',
+            'oldIP': old_ip,
+            'newIP': current_ip,
+            'status': status,
+            'action': action,
+            'recordId': primary.get('recordId'),
+            'records': update.get('results', []),
+            'summary': update.get('summary', {}),
+            'timestamp': datetime.now().isoformat()
+        }
+    }), 200 if action not in ('failed', 'partial') else 502
+
+
+@ddns_api_bp.route('/update/batch', methods=['POST'])
+@cross_origin()
+def batch_update_ddns():
+    """
+    批量更新多条解析记录
+    
+    请求体:
+        records: [{'domain', 'rr', 'type': A/AAAA, 'ttl'}]，省略时使用 DDNS_RECORDS
+        ip: IPv4 公网地址，省略时自动检测
+        ipv6: IPv6 公网地址（更新 AAAA 记录），省略时读取本机网卡
+        
+    返回:
+        JSON: {'action', 'results', 'summary', 'duration'}，没有任何可用地址时返回 503
+    """
+    try:
+        data = request.get_json(silent=True) or {}
         try:
-            with open(DDNS_LOG_PATH, 'a') as f:
-                f.write(log_message + '\n')
-        except:
-            pass
+            targets = targets_from_dicts(data['records']) if data.get('records') else parse_targets()
+            addresses = {}
+            if data.get('ip'):
+                addresses['A'] = validate_address(data['ip'], 'A')
+            if data.get('ipv6'):
+                addresses['AAAA'] = validate_address(data['ipv6'], 'AAAA')
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if not alidns_configured():
+            return jsonify({
+                'success': False,
+                'error': 'Aliyun access key not configured'
+            }), 503
+        
+        types = {t.type for t in targets}
+        if 'A' in types and 'A' not in addresses:
+            detected = get_public_ip_detector().get(force=True)['ip']
+            try:
+                addresses['A'] = validate_address(detected, 'A') if detected else None
+            except ValueError:
+                addresses['A'] = None
+        if 'AAAA' in types and 'AAAA' not in addresses:
+            addresses['AAAA'] = get_ipv6_tracker().snapshot()['address']
+            if addresses['AAAA'] is None:
+                warn_missing_ipv6(sum(1 for t in targets if t.type == 'AAAA'))
+        if not any(addresses.get(record_type) for record_type in types):
+            return jsonify({
+                'success': False,
+                'error': f"No {'/'.join(sorted(types))} address available (public IP detection failed "
+                         f"and no ip/ipv6 given)"
+            }), 503
+        
+        def _update():
+            update = get_batch_updater().update(targets, addresses)
+            record_update(update['results'], 'api')
+            return {'ip': addresses.get('A'), 'update': update}
+        
+        # 与其他请求、Celery 任务和守护进程对同一组记录、同一地址的并发更新合并为一次
+        shared, coalesced = get_update_coalescer().run(
+            records_key(targets), _update, value=address_value(targets, addresses)
+        )
+        result = shared['update']
         
         return jsonify({
-            'success': True,
-            'message': 'DDNS更新成功',
-            'data': {
-                'domain': f'{ALIYUN_SUB_DOMAIN}.{ALIYUN_DOMAIN}',
-                'oldIP': NAS_SERVER_IP,
-                'newIP': current_ip,
-                'status': 'success' if current_ip == NAS_SERVER_IP else 'updated',
-                'timestamp': datetime.now().isoformat()
-            }
-        }), 200
+            'success': result['action'] not in ('failed', 'partial'),
+            'data': dict(result, coalesced=coalesced)
+        }), 200 if result['action'] not in ('failed', 'partial') else 502
         
     except Exception as e:
         return jsonify({
@@ -300,57 +548,136 @@ def update_ddns():
 @cross_origin()
 def get_ddns_history():
     """
-    获取DDNS更新历史记录
+    获取DDNS更新历史记录（按时间倒序，游标分页）
     
     查询参数:
-        limit: 返回的记录数量，默认20
+        limit: 返回的记录数量，默认20，最大500
+        cursor: 上一页返回的 nextCursor
+        domain: 完整域名过滤（如 ddns.0379.email）
+        status: success / failed
+        since: 起始时间（ISO 8601 或 Unix 时间戳）
+        until: 结束时间（ISO 8601 或 Unix 时间戳）
         
     返回:
         JSON: DDNS历史记录列表
     """
     try:
-        limit = request.args.get('limit', 20, type=int)
-        
-        # 尝试读取日志文件
-        if os.path.exists(DDNS_LOG_PATH):
-            with open(DDNS_LOG_PATH, 'r') as f:
-                log_lines = f.readlines()
-            
-            # 解析日志行
-            history = []
-            for i, line in enumerate(reversed(log_lines[-limit:])):
-                try:
-                    # 简单解析日志格式
-                    if 'DDNS更新:' in line:
-                        parts = line.split('DDNS更新:')
-                        timestamp = parts[0].strip('[]').strip()
-                        domain_ip = parts[1].strip().split('->')
-                        domain = domain_ip[0].strip()
-                        ip = domain_ip[1].strip()
-                        
-                        history.append({
-                            'id': str(len(log_lines) - i),
-                            'timestamp': timestamp,
-                            'domain': domain,
-                            'ip': ip,
-                            'status': 'success'
-                        })
-                except:
-                    continue
-            
+        limit = max(1, min(request.args.get('limit', 20, type=int), MAX_HISTORY_PAGE))
+        try:
+            since = _parse_time(request.args.get('since'))
+            until = _parse_time(request.args.get('until'))
+            page = get_ddns_history_store().query(
+                limit=limit,
+                cursor=request.args.get('cursor'),
+                domain=request.args.get('domain'),
+                status=request.args.get('status'),
+                since=since,
+                until=until
+            )
+        except ValueError as e:
             return jsonify({
-                'success': True,
-                'data': history,
-                'total': len(history)
-            }), 200
-        else:
-            # 返回模拟数据
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if not page['items'] and not request.args.get('cursor') and not _history_filtered():
+            # 尚无历史记录，返回模拟数据
             return jsonify({
                 'success': True,
                 'data': MOCK_DDNS_HISTORY[:limit],
-                'total': len(MOCK_DDNS_HISTORY)
+                'total': len(MOCK_DDNS_HISTORY),
+                'nextCursor': None,
+                'hasMore': False
             }), 200
         
+        return jsonify({
+            'success': True,
+            'data': page['items'],
+            'total': len(page['items']),
+            'nextCursor': page['nextCursor'],
+            'hasMore': page['hasMore']
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+def _parse_time(value):
+    """解析 ISO 8601 或 Unix 时间戳"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f'invalid time: {value}')
+
+
+def _history_filtered():
+    return any(request.args.get(key) for key in ('domain', 'status', 'since', 'until'))
+
+
+# ========== DNS 传播检测接口 ==========
+
+@ddns_api_bp.route('/propagation', methods=['GET'])
+@cross_origin()
+def get_ddns_propagation():
+    """
+    获取最近的 DNS 传播检测报告（DDNS 更新后自动检测）
+    
+    查询参数:
+        name: 完整域名过滤
+        
+    返回:
+        JSON: 检测报告列表，servers 中的 propagation 为各服务器的生效耗时（秒）
+    """
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_propagation_checker().reports(request.args.get('name'))
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@ddns_api_bp.route('/propagation', methods=['POST'])
+@cross_origin()
+def check_ddns_propagation():
+    """
+    立即并发查询所有公共解析器和权威 NS
+    
+    请求体:
+        name: 完整域名，默认 ALIYUN_SUB_DOMAIN.ALIYUN_DOMAIN
+        type: 记录类型，默认 A
+        expected: 期望的记录值（省略时只检查各服务器是否一致）
+        zone: 主域名（用于查找权威 NS），默认 ALIYUN_DOMAIN
+        
+    返回:
+        JSON: {'converged', 'consistent', 'servers'}
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        result = get_propagation_checker().check(
+            data.get('name') or f'{ALIYUN_SUB_DOMAIN}.{ALIYUN_DOMAIN}',
+            str(data.get('type', 'A')).upper(),
+            data.get('expected'),
+            data.get('zone') or ALIYUN_DOMAIN
+        )
+        return jsonify({
+            'success': True,
+            'data': result
+        }), 200
+        
     except Exception as e:
         return jsonify({
             'success': False,
@@ -451,27 +778,27 @@ def get_ddns_logs():
     
     查询参数:
         lines: 返回的日志行数，默认100
+        before: 游标（上一页返回的 cursor），返回该位置之前的日志
         
     返回:
         JSON: DDNS日志
     """
     try:
-        lines = request.args.get('lines', 100, type=int)
+        lines = min(request.args.get('lines', 100, type=int), MAX_LOG_LINES)
+        before = request.args.get('before', type=int)
         
-        # 读取日志文件
+        # 从文件末尾读取日志
         if os.path.exists(DDNS_LOG_PATH):
-            with open(DDNS_LOG_PATH, 'r') as f:
-                log_lines = f.readlines()
-            
-            # 返回最后N行
-            logs = log_lines[-lines:] if len(log_lines) > lines else log_lines
+            tail = tail_lines(DDNS_LOG_PATH, lines, before=before)
             
             return jsonify({
                 'success': True,
                 'data': {
-                    'logs': logs,
-                    'total': len(log_lines),
-                    'returned': len(logs)
+                    'logs': tail['lines'],
+                    'returned': len(tail['lines']),
+                    'cursor': tail['cursor'],
+                    'hasMore': tail['has_more'],
+                    'size': tail['size']
                 }
             }), 200
         else:
@@ -479,8 +806,10 @@ def get_ddns_logs():
                 'success': True,
                 'data': {
                     'logs': [],
-                    'total': 0,
-                    'returned': 0
+                    'returned': 0,
+                    'cursor': 0,
+                    'hasMore': False,
+                    'size': 0
                 },
                 'message': 'Log file not found'
             }), 200
@@ -490,3 +819,38 @@ def get_ddns_logs():
             'success': False,
             'error': str(e)
         }), 500
+
+
+@ddns_api_bp.route('/logs/stream', methods=['GET'])
+@cross_origin()
+def stream_ddns_logs():
+    """
+    实时推送DDNS日志（Server-Sent Events）
+    
+    查询参数:
+        level: 最低日志级别（trace/debug/info/warn/error）
+        q: 正则过滤
+        tail: 开始推送前先发送的最近行数，默认0
+        
+    返回:
+        text/event-stream: log / rotate / truncate / gap 事件
+    """
+    try:
+        log_filter = LogFilter(request.args.get('level'), request.args.get('q'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    tail = min(request.args.get('tail', 0, type=int), MAX_LOG_LINES)
+    last_event_id = request.headers.get('Last-Event-ID')
+    
+    return Response(
+        sse_log_stream(DDNS_LOG_PATH, log_filter, tail=tail, last_event_id=last_event_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
@@ -1,30 +1,44 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import socket
+import time
+
+from app.services.dns_query import query as dns_query
+from app.services.dns_trace import analyze_trace, get_dns_tracer
 
 dev_bp = Blueprint('dev_v2', __name__, url_prefix='/dev')
 
 
 def dns_query_with_nameserver(domain, record_type, nameserver):
-    """使用指定DNS服务器查询"""
-    # 简化实现，实际需要使用 dnspython
-    return {"result": f"Querying {domain} {record_type} on {nameserver}"}
+    """使用指定DNS服务器查询（直接发送 UDP 查询，截断时改用 TCP）"""
+    result = dns_query(nameserver, domain, record_type)
+    if result["error"]:
+        raise RuntimeError(result["error"])
+    return result
 
 
 def dns_query_local(domain, record_type):
-    """本地DNS查询"""
-    # 简化实现
-    return {"result": f"Local query for {domain} {record_type}"}
+    """本地DNS查询（系统解析器，仅支持 A/AAAA）"""
+    family = {"A": socket.AF_INET, "AAAA": socket.AF_INET6}.get(record_type.upper())
+    if family is None:
+        raise ValueError(f"Local resolver only supports A/AAAA, got {record_type}")
+    start = time.perf_counter()
+    infos = socket.getaddrinfo(domain, None, family, socket.SOCK_STREAM)
+    return {
+        "answers": sorted({info[4][0] for info in infos}),
+        "latency": round((time.perf_counter() - start) * 1000, 2)
+    }
 
 
-def perform_dns_trace(domain):
-    """执行DNS追踪"""
-    # 简化实现
-    return {"trace": f"Trace for {domain}", "hops": []}
+def perform_dns_trace(domain, record_type='A', use_cache=False):
+    """执行DNS追踪（从根服务器逐级迭代查询，每级并发查询全部 NS）"""
+    return get_dns_tracer().trace(domain, record_type, use_cache=use_cache)
 
 
 def analyze_dns_trace(trace_results):
-    """分析DNS追踪结果"""
-    return {"analysis": "DNS trace analysis"}
+    """分析DNS追踪结果（路径耗时、最慢的服务器、同级不一致和错误委派）"""
+    return analyze_trace(trace_results)
 
 
 def test_aliyun_credentials(config):
@@ -60,7 +74,7 @@ def test_dns_resolution():
                 "results": dns_query_with_nameserver(domain, record_type, nameserver)
             })
 
-        # 测试公共DNS
+        # 测试公共DNS（并发查询）
         public_dns_servers = [
             {"name": "Google", "server": "8.8.8.8"},
             {"name": "Cloudflare", "server": "1.1.1.1"},
@@ -68,21 +82,26 @@ def test_dns_resolution():
             {"name": "AliDNS", "server": "223.5.5.5"}
         ]
 
-        for dns_server in public_dns_servers:
-            try:
-                results.append({
-                    "method": "public_dns",
-                    "name": dns_server["name"],
-                    "server": dns_server["server"],
-                    "results": dns_query_with_nameserver(domain, record_type, dns_server["server"])
-                })
-            except Exception as e:
-                results.append({
-                    "method": "public_dns",
-                    "name": dns_server["name"],
-                    "server": dns_server["server"],
-                    "error": str(e)
-                })
+        with ThreadPoolExecutor(max_workers=len(public_dns_servers)) as pool:
+            futures = [
+                pool.submit(dns_query_with_nameserver, domain, record_type, dns_server["server"])
+                for dns_server in public_dns_servers
+            ]
+            for dns_server, future in zip(public_dns_servers, futures):
+                try:
+                    results.append({
+                        "method": "public_dns",
+                        "name": dns_server["name"],
+                        "server": dns_server["server"],
+                        "results": future.result()
+                    })
+                except Exception as e:
+                    results.append({
+                        "method": "public_dns",
+                        "name": dns_server["name"],
+                        "server": dns_server["server"],
+                        "error": str(e)
+                    })
 
         # 测试本地解析
         try:
@@ -119,10 +138,18 @@ def test_dns_resolution():
 
 @dev_bp.route('/trace-dns', methods=['POST'])
 def trace_dns_resolution():
-    """DNS解析追踪（开发工具）"""
+    """
+    DNS解析追踪（开发工具）
+
+    请求体:
+        domain: 域名
+        type: 记录类型（默认 A）
+        use_cache: 从已缓存的最深委派开始追踪（默认 false）
+    """
     data = request.get_json()
 
     domain = data.get('domain')
+    record_type = data.get('type', 'A').upper()
     if not domain:
         return jsonify({
             "success": False,
@@ -131,7 +158,7 @@ def trace_dns_resolution():
 
     try:
         # 执行DNS追踪
-        trace_results = perform_dns_trace(domain)
+        trace_results = perform_dns_trace(domain, record_type, bool(data.get('use_cache', False)))
 
         return jsonify({
             "success": True,
@@ -4,19 +4,33 @@ FRP配置管理API模块
 """
 
 import os
-import subprocess
-import toml
 from datetime import datetime
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request
 from flask_cors import cross_origin
 
+from app.services.frp_backup import BackupNotFoundError, get_backup_store
+from app.services.frp_config import get_frp_config_cache, parse_toml, TomlDecodeError
+from app.services.frp_lint import lint_config, lint_configs
+from app.services.frp_proxies import ProxyRepositoryError, get_proxy_repository
+from app.services.frp_reload import FrpReloadError, get_config_applier
+from app.services.frp_status import get_frp_status_poller
+from app.services.frp_supervisor import get_frp_supervisor
+from app.services.log_stream import LogFilter, sse_log_stream
+from app.services.tunnel_probe import get_tunnel_prober
+from app.utils.log_tail import tail_lines
+
 frp_bp = Blueprint('frp', __name__)
 
 # FRP配置路径
 FRPC_CONFIG_PATH = os.getenv('FRPC_CONFIG_PATH', '/frp/frpc.toml')
 FRP_BIN_PATH = os.getenv('FRP_BIN_PATH', '/usr/local/bin/frpc')
 FRP_LOG_PATH = os.getenv('FRP_LOG_PATH', '/var/log/frpc.log')
-FRP_BACKUP_DIR = os.getenv('FRP_BACKUP_DIR', '/frp/backups')
+
+# 单次最多返回的日志行数
+MAX_LOG_LINES = 5000
+
+# 单次批量校验的最大配置数
+MAX_LINT_CONFIGS = 1000
 
 
 # ========== 模拟数据 ==========
@@ -108,32 +122,105 @@ MOCK_FRP_STATUS = {
 }
 
 
+def load_frpc_config():
+    """
+    读取 frpc 配置（解析结果按文件 mtime/size 缓存）
+
+    Returns:
+        FrpConfig: 配置，文件不存在时返回 None
+    """
+    return get_frp_config_cache().get(FRPC_CONFIG_PATH)
+
+
+@frp_bp.record_once
+def _start_status_poller(state):
+    """注册蓝图时启动隧道状态轮询（FRP_STATUS_POLLER_ENABLED 关闭时在首次请求时启动）"""
+    if state.app.config.get('FRP_STATUS_POLLER_ENABLED', True):
+        get_frp_status_poller()
+
+
+def merge_proxy_status(config, snapshot):
+    """
+    将轮询到的运行状态合并到配置中的代理列表
+    
+    Args:
+        config: FrpConfig
+        snapshot: FrpStatusPoller 快照
+        
+    Returns:
+        list: 代理列表（API格式）
+    """
+    live = snapshot['proxies']
+    proxies = []
+    for item in config.to_api():
+        state = live.get(item['name'])
+        if state is not None:
+            item.update({
+                'status': state['status'],
+                'error': state['err'],
+                'since': state['since'],
+                'connections': state['connections'],
+                'trafficIn': state['trafficIn'],
+                'trafficOut': state['trafficOut'],
+                'rateIn': state['rateIn'],
+                'rateOut': state['rateOut']
+            })
+        else:
+            item['status'] = 'stopped' if snapshot['reachable'] else 'unknown'
+        proxies.append(item)
+    return proxies
+
+
+def format_uptime(seconds):
+    """格式化运行时长"""
+    seconds = int(seconds or 0)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    return f'{days}天 {hours}小时 {seconds // 60}分钟'
+
+
 # ========== FRP 状态接口 ==========
 
 @frp_bp.route('/status', methods=['GET'])
 @cross_origin()
 def get_frp_status():
     """
-    获取FRP客户端状态
+    获取FRP客户端状态（读取后台轮询快照）
     
     返回:
         JSON: FRP客户端和隧道状态
     """
     try:
-        # 检查FRP进程是否运行（容器环境使用模拟数据）
-        is_running = True
+        config = load_frpc_config()
+        if config is None:
+            # 配置文件不存在，返回模拟数据
+            return jsonify({
+                'success': True,
+                'data': dict(MOCK_FRP_STATUS, timestamp=datetime.now().isoformat()),
+                'source': 'mock'
+            }), 200
+        
+        snapshot = get_frp_status_poller().snapshot()
+        process = get_frp_supervisor().status()
+        proxies = merge_proxy_status(config, snapshot)
+        is_running = snapshot['reachable'] or process['pid'] is not None
         
         # 构建状态响应
         status = {
             'client': {
                 'running': is_running,
-                'connected': is_running,
-                'serverAddr': os.getenv('FRP_SERVER_HOST', '8.152.195.33'),
-                'serverPort': int(os.getenv('FRP_SERVER_PORT', '7001')),
-                'proxyCount': len(MOCK_FRP_CONFIGS),
-                'uptime': '15天 3小时 45分钟' if is_running else '0天 0小时 0分钟'
+                'connected': snapshot['reachable'] and any(p['status'] == 'running' for p in proxies),
+                'serverAddr': config.server_addr or os.getenv('FRP_SERVER_HOST', '8.152.195.33'),
+                'serverPort': config.server_port or int(os.getenv('FRP_SERVER_PORT', '7001')),
+                'proxyCount': len(proxies),
+                'runningCount': sum(1 for p in proxies if p['status'] == 'running'),
+                'pid': process['pid'],
+                'uptime': format_uptime(process['uptime']) if process['uptime'] else None,
+                'adminReachable': snapshot['reachable'],
+                'adminError': snapshot['error'],
+                'polledAt': datetime.fromtimestamp(snapshot['polled_at']).isoformat() if snapshot['polled_at'] else None
             },
-            'proxies': MOCK_FRP_CONFIGS,
+            'proxies': proxies,
             'timestamp': datetime.now().isoformat()
         }
         
@@ -153,15 +240,23 @@ def get_frp_status():
 @cross_origin()
 def get_frp_proxies():
     """
-    获取FRP代理隧道列表
+    获取FRP代理隧道列表（含运行状态、连接数与流量）
     
     返回:
         JSON: FRP代理隧道列表
     """
     try:
+        config = load_frpc_config()
+        if config is None:
+            return jsonify({
+                'success': True,
+                'data': MOCK_FRP_CONFIGS,
+                'source': 'mock'
+            }), 200
+        
         return jsonify({
             'success': True,
-            'data': MOCK_FRP_CONFIGS
+            'data': merge_proxy_status(config, get_frp_status_poller().snapshot())
         }), 200
         
     except Exception as e:
@@ -171,35 +266,34 @@ def get_frp_proxies():
         }), 500
 
 
-@frp_bp.route('/client/start', methods=['POST'])
+@frp_bp.route('/latency', methods=['GET'])
 @cross_origin()
-def start_frp_client():
+def get_frp_latency():
     """
-    启动FRP客户端
+    获取所有代理的隧道延迟（公网域名 vs 直连后端）
     
+    查询参数:
+        refresh: 是否立即重新探测（true/false），默认false（尚无结果时自动探测）
+        
     返回:
-        JSON: 操作结果
+        JSON: 每个代理的连接/首字节/总耗时（毫秒）、隧道开销及瓶颈判断
     """
     try:
-        # 检查是否已在运行
-        result = subprocess.run(['pgrep', '-f', 'frpc'], capture_output=True, text=True)
-        if result.returncode == 0:
+        if load_frpc_config() is None:
             return jsonify({
-                'success': True,
-                'message': 'FRP客户端已在运行'
-            }), 200
-        
-        # 启动FRP客户端
-        command = f'nohup {FRP_BIN_PATH} -c {FRPC_CONFIG_PATH} > {FRP_LOG_PATH} 2>&1 &'
-        subprocess.run(command, shell=True, check=True)
+                'success': False,
+                'error': 'Configuration file not found'
+            }), 404
         
-        # 等待启动
-        import time
-        time.sleep(2)
+        prober = get_tunnel_prober()
+        latest = prober.latest()
+        if request.args.get('refresh', 'false').lower() == 'true' or latest['probedAt'] is None:
+            prober.probe_all()
+            latest = prober.latest()
         
         return jsonify({
             'success': True,
-            'message': 'FRP客户端启动成功'
+            'data': latest
         }), 200
         
     except Exception as e:
@@ -209,22 +303,45 @@ def start_frp_client():
         }), 500
 
 
-@frp_bp.route('/client/stop', methods=['POST'])
+@frp_bp.route('/proxies/<name>/latency', methods=['GET'])
 @cross_origin()
-def stop_frp_client():
+def get_frp_proxy_latency(name):
     """
-    停止FRP客户端
+    获取单个代理的隧道延迟及历史
     
+    Args:
+        name: 代理名称
+        
+    查询参数:
+        history: 是否返回延迟历史（true/false），默认true
+        since: 历史起始时间（Unix 时间戳）
+        limit: 每项指标返回的样本数量，默认500
+        
     返回:
-        JSON: 操作结果
+        JSON: 最近一次探测结果与历史
     """
     try:
-        # 杀死FRP进程
-        result = subprocess.run(['pkill', '-f', 'frpc'], capture_output=True, text=True)
+        config = load_frpc_config()
+        if config is None or config.get(name) is None:
+            return jsonify({
+                'success': False,
+                'error': 'Proxy not found'
+            }), 404
+        
+        prober = get_tunnel_prober()
+        latest = prober.latest()
+        data = {
+            'name': name,
+            'probedAt': latest['probedAt'],
+            'latest': latest['proxies'].get(name)
+        }
+        if request.args.get('history', 'true').lower() == 'true':
+            limit = min(request.args.get('limit', 500, type=int), 5000)
+            data['history'] = prober.history(name, since=request.args.get('since', type=float), limit=limit)
         
         return jsonify({
             'success': True,
-            'message': 'FRP客户端已停止'
+            'data': data
         }), 200
         
     except Exception as e:
@@ -234,30 +351,127 @@ def stop_frp_client():
         }), 500
 
 
+def _job_response(job, message):
+    """返回进程操作任务句柄"""
+    return jsonify({
+        'success': True,
+        'message': message,
+        'data': {
+            'job': job.to_dict(),
+            'job_url': f'/api/v2/frp/client/jobs/{job.id}'
+        }
+    }), 202
+
+
+@frp_bp.route('/client/start', methods=['POST'])
+@cross_origin()
+def start_frp_client():
+    """
+    启动FRP客户端（后台执行）
+    
+    返回:
+        JSON: 任务句柄
+    """
+    try:
+        job = get_frp_supervisor().start()
+        return _job_response(job, 'FRP客户端启动任务已提交')
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@frp_bp.route('/client/stop', methods=['POST'])
+@cross_origin()
+def stop_frp_client():
+    """
+    停止FRP客户端（后台执行）
+    
+    返回:
+        JSON: 任务句柄
+    """
+    try:
+        job = get_frp_supervisor().stop()
+        return _job_response(job, 'FRP客户端停止任务已提交')
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @frp_bp.route('/client/restart', methods=['POST'])
 @cross_origin()
 def restart_frp_client():
     """
-    重启FRP客户端
+    重启FRP客户端（后台执行）
     
     返回:
-        JSON: 操作结果
+        JSON: 任务句柄
     """
     try:
-        # 先停止
-        subprocess.run(['pkill', '-f', 'frpc'], capture_output=True, text=True)
+        job = get_frp_supervisor().restart()
+        return _job_response(job, 'FRP客户端重启任务已提交')
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@frp_bp.route('/client/jobs/<job_id>', methods=['GET'])
+@cross_origin()
+def get_frp_client_job(job_id):
+    """
+    获取FRP客户端操作任务状态
+    
+    Args:
+        job_id: 任务ID
         
-        # 等待
-        import time
-        time.sleep(2)
+    返回:
+        JSON: 任务状态与进程状态
+    """
+    try:
+        supervisor = get_frp_supervisor()
+        job = supervisor.get_job(job_id)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
         
-        # 再启动
-        command = f'nohup {FRP_BIN_PATH} -c {FRPC_CONFIG_PATH} > {FRP_LOG_PATH} 2>&1 &'
-        subprocess.run(command, shell=True, check=True)
+        return jsonify({
+            'success': True,
+            'data': {
+                'job': job,
+                'process': supervisor.status()
+            }
+        }), 200
         
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@frp_bp.route('/client/process', methods=['GET'])
+@cross_origin()
+def get_frp_client_process():
+    """
+    获取FRP客户端进程状态
+    
+    返回:
+        JSON: 进程状态（state/pid/uptime/restarts 等）
+    """
+    try:
         return jsonify({
             'success': True,
-            'message': 'FRP客户端重启成功'
+            'data': get_frp_supervisor().status()
         }), 200
         
     except Exception as e:
@@ -280,30 +494,13 @@ def get_frp_configs():
     """
     try:
         # 尝试读取配置文件
-        if os.path.exists(FRPC_CONFIG_PATH):
-            with open(FRPC_CONFIG_PATH, 'r') as f:
-                config = toml.load(f)
-                proxies = config.get('proxies', [])
-                
-                # 转换为API格式
-                configs = []
-                for i, proxy in enumerate(proxies):
-                    configs.append({
-                        'id': proxy.get('name', f'proxy-{i}'),
-                        'name': proxy.get('name', ''),
-                        'type': proxy.get('type', 'http'),
-                        'localIP': proxy.get('localIP', ''),
-                        'localPort': proxy.get('localPort', 0),
-                        'subdomain': proxy.get('subdomain', ''),
-                        'enabled': True,
-                        'status': 'running'
-                    })
-                
-                return jsonify({
-                    'success': True,
-                    'data': configs,
-                    'source': 'file'
-                }), 200
+        config = load_frpc_config()
+        if config is not None:
+            return jsonify({
+                'success': True,
+                'data': config.to_api(),
+                'source': 'file'
+            }), 200
         
         # 配置文件不存在，返回模拟数据
         return jsonify({
@@ -332,8 +529,13 @@ def get_frp_config(config_id):
         JSON: FRP隧道配置详情
     """
     try:
-        # 从模拟数据中查找
-        config = next((c for c in MOCK_FRP_CONFIGS if c['id'] == config_id), None)
+        frpc_config = load_frpc_config()
+        if frpc_config is not None:
+            proxy = frpc_config.get(config_id)
+            config = proxy.to_dict() if proxy else None
+        else:
+            # 从模拟数据中查找
+            config = next((c for c in MOCK_FRP_CONFIGS if c['id'] == config_id), None)
         
         if config:
             return jsonify({
@@ -357,7 +559,7 @@ def get_frp_config(config_id):
 @cross_origin()
 def create_frp_config():
     """
-    创建新的FRP隧道配置
+    创建新的FRP隧道配置（写入 frpc.toml 并热加载）
     
     请求体:
         JSON: 隧道配置
@@ -366,35 +568,54 @@ def create_frp_config():
         JSON: 操作结果
     """
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         
         # 验证必填字段
-        if not all(k in data for k in ['name', 'type', 'localIP', 'localPort']):
+        if not all(k in data for k in ['name', 'type', 'localPort']):
             return jsonify({
                 'success': False,
-                'error': 'Missing required fields: name, type, localIP, localPort'
+                'error': 'Missing required fields: name, type, localPort'
             }), 400
         
-        # 创建配置
-        new_config = {
-            'id': data['name'],
-            'name': data['name'],
-            'type': data['type'],
-            'localIP': data['localIP'],
-            'localPort': data['localPort'],
-            'subdomain': data.get('subdomain', ''),
-            'enabled': True,
-            'status': 'stopped'
-        }
+        if not os.path.exists(FRPC_CONFIG_PATH):
+            # 配置文件不存在，修改模拟数据
+            new_config = {
+                'id': data['name'],
+                'name': data['name'],
+                'type': data['type'],
+                'localIP': data.get('localIP', '127.0.0.1'),
+                'localPort': data['localPort'],
+                'subdomain': data.get('subdomain', ''),
+                'enabled': True,
+                'status': 'stopped'
+            }
+            MOCK_FRP_CONFIGS.append(new_config)
+            return jsonify({
+                'success': True,
+                'data': new_config,
+                'source': 'mock',
+                'message': 'FRP隧道配置创建成功'
+            }), 201
         
-        MOCK_FRP_CONFIGS.append(new_config)
+        result = get_proxy_repository().create(data)
         
         return jsonify({
             'success': True,
-            'data': new_config,
+            'data': result['proxies'][data['name']],
+            'apply': result['apply'],
             'message': 'FRP隧道配置创建成功'
         }), 201
         
+    except ProxyRepositoryError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except FrpReloadError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
     except Exception as e:
         return jsonify({
             'success': False,
@@ -406,10 +627,10 @@ def create_frp_config():
 @cross_origin()
 def update_frp_config(config_id):
     """
-    更新FRP隧道配置
+    更新FRP隧道配置（只修改请求中给出的字段，值为 null 时删除该字段）
     
     Args:
-        config_id: 配置ID
+        config_id: 配置ID（代理名称）
         
     请求体:
         JSON: 隧道配置
@@ -418,23 +639,43 @@ def update_frp_config(config_id):
         JSON: 操作结果
     """
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         
-        # 查找并更新配置
-        for i, config in enumerate(MOCK_FRP_CONFIGS):
-            if config['id'] == config_id:
-                MOCK_FRP_CONFIGS[i].update(data)
+        if not os.path.exists(FRPC_CONFIG_PATH):
+            # 配置文件不存在，修改模拟数据
+            config = next((c for c in MOCK_FRP_CONFIGS if c['id'] == config_id), None)
+            if config is None:
                 return jsonify({
-                    'success': True,
-                    'data': MOCK_FRP_CONFIGS[i],
-                    'message': 'FRP隧道配置更新成功'
-                }), 200
+                    'success': False,
+                    'error': 'Config not found'
+                }), 404
+            config.update(data)
+            return jsonify({
+                'success': True,
+                'data': config,
+                'source': 'mock',
+                'message': 'FRP隧道配置更新成功'
+            }), 200
+        
+        result = get_proxy_repository().update(config_id, data)
         
         return jsonify({
-            'success': False,
-            'error': 'Config not found'
-        }), 404
+            'success': True,
+            'data': result['proxies'][data.get('name') or config_id],
+            'apply': result['apply'],
+            'message': 'FRP隧道配置更新成功'
+        }), 200
         
+    except ProxyRepositoryError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except FrpReloadError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
     except Exception as e:
         return jsonify({
             'success': False,
@@ -449,26 +690,100 @@ def delete_frp_config(config_id):
     删除FRP隧道配置
     
     Args:
-        config_id: 配置ID
+        config_id: 配置ID（代理名称）
         
     返回:
         JSON: 操作结果
     """
     try:
-        # 查找并删除配置
-        for i, config in enumerate(MOCK_FRP_CONFIGS):
-            if config['id'] == config_id:
-                del MOCK_FRP_CONFIGS[i]
+        if not os.path.exists(FRPC_CONFIG_PATH):
+            # 配置文件不存在，修改模拟数据
+            config = next((c for c in MOCK_FRP_CONFIGS if c['id'] == config_id), None)
+            if config is None:
                 return jsonify({
-                    'success': True,
-                    'message': 'FRP隧道配置删除成功'
-                }), 200
+                    'success': False,
+                    'error': 'Config not found'
+                }), 404
+            MOCK_FRP_CONFIGS.remove(config)
+            return jsonify({
+                'success': True,
+                'source': 'mock',
+                'message': 'FRP隧道配置删除成功'
+            }), 200
+        
+        result = get_proxy_repository().delete(config_id)
+        
+        return jsonify({
+            'success': True,
+            'apply': result['apply'],
+            'message': 'FRP隧道配置删除成功'
+        }), 200
         
+    except ProxyRepositoryError as e:
         return jsonify({
             'success': False,
-            'error': 'Config not found'
-        }), 404
+            'error': str(e)
+        }), e.status_code
+    except FrpReloadError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@frp_bp.route('/configs/batch', methods=['POST'])
+@cross_origin()
+def batch_frp_configs():
+    """
+    批量修改FRP隧道配置（全部操作合并为一次写入和一次热加载，任一操作无效则不写入）
+    
+    请求体:
+        JSON: {
+            operations: [{ action: create/update/upsert/delete, name: string, proxy: object }],
+            dry_run: bool
+        }
         
+    返回:
+        JSON: 修改后的代理配置（删除的为 null）及生效方式
+    """
+    try:
+        data = request.get_json() or {}
+        operations = data.get('operations')
+        
+        if not isinstance(operations, list) or not operations:
+            return jsonify({
+                'success': False,
+                'error': 'operations must be a non-empty list'
+            }), 400
+        
+        result = get_proxy_repository().apply_batch(operations, dry_run=bool(data.get('dry_run')))
+        
+        return jsonify({
+            'success': True,
+            'data': result['proxies'],
+            'apply': result['apply']
+        }), 200
+        
+    except ProxyRepositoryError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except TomlDecodeError as e:
+        return jsonify({
+            'success': False,
+            'error': f'TOML syntax error: {str(e)}'
+        }), 400
+    except FrpReloadError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
     except Exception as e:
         return jsonify({
             'success': False,
@@ -486,27 +801,27 @@ def get_frp_logs():
     
     查询参数:
         lines: 返回的日志行数，默认100
+        before: 游标（上一页返回的 cursor），返回该位置之前的日志
         
     返回:
         JSON: FRP日志
     """
     try:
-        lines = request.args.get('lines', 100, type=int)
+        lines = min(request.args.get('lines', 100, type=int), MAX_LOG_LINES)
+        before = request.args.get('before', type=int)
         
-        # 读取日志文件
+        # 从文件末尾读取日志
         if os.path.exists(FRP_LOG_PATH):
-            with open(FRP_LOG_PATH, 'r') as f:
-                log_lines = f.readlines()
-            
-            # 返回最后N行
-            logs = log_lines[-lines:] if len(log_lines) > lines else log_lines
+            tail = tail_lines(FRP_LOG_PATH, lines, before=before)
             
             return jsonify({
                 'success': True,
                 'data': {
-                    'logs': logs,
-                    'total': len(log_lines),
-                    'returned': len(logs)
+                    'logs': tail['lines'],
+                    'returned': len(tail['lines']),
+                    'cursor': tail['cursor'],
+                    'hasMore': tail['has_more'],
+                    'size': tail['size']
                 }
             }), 200
         else:
@@ -514,8 +829,10 @@ def get_frp_logs():
                 'success': True,
                 'data': {
                     'logs': [],
-                    'total': 0,
-                    'returned': 0
+                    'returned': 0,
+                    'cursor': 0,
+                    'hasMore': False,
+                    'size': 0
                 },
                 'message': 'Log file not found'
             }), 200
@@ -527,22 +844,81 @@ def get_frp_logs():
         }), 500
 
 
+@frp_bp.route('/logs/stream', methods=['GET'])
+@cross_origin()
+def stream_frp_logs():
+    """
+    实时推送FRP客户端日志（Server-Sent Events）
+    
+    查询参数:
+        level: 最低日志级别（trace/debug/info/warn/error）
+        q: 正则过滤
+        tail: 开始推送前先发送的最近行数，默认0
+        
+    返回:
+        text/event-stream: log / rotate / truncate / gap 事件
+    """
+    try:
+        log_filter = LogFilter(request.args.get('level'), request.args.get('q'))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    tail = min(request.args.get('tail', 0, type=int), MAX_LOG_LINES)
+    last_event_id = request.headers.get('Last-Event-ID')
+    
+    return Response(
+        sse_log_stream(FRP_LOG_PATH, log_filter, tail=tail, last_event_id=last_event_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+
 # ========== FRP 配置验证接口 ==========
 
 @frp_bp.route('/configs/validate', methods=['POST'])
 @cross_origin()
 def validate_frp_config():
     """
-    验证FRP配置文件
+    验证FRP配置文件（支持批量）
     
     请求体:
-        JSON: 配置内容
+        JSON: { content: string }
+              或 { configs: [{ id: string, content: string }], cross_check: bool }
         
     返回:
-        JSON: 验证结果
+        JSON: 验证结果，diagnostics 含错误代码、键路径、行号和列号；
+              批量校验时 cross_check 为 true（默认）会检测连接同一 frps 的配置之间的冲突
     """
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
+        
+        if 'configs' in data:
+            configs = data['configs']
+            if not isinstance(configs, list) or not configs:
+                return jsonify({
+                    'success': False,
+                    'error': 'configs must be a non-empty list'
+                }), 400
+            if len(configs) > MAX_LINT_CONFIGS:
+                return jsonify({
+                    'success': False,
+                    'error': f'At most {MAX_LINT_CONFIGS} configs per request'
+                }), 400
+            
+            result = lint_configs(configs, cross_check=data.get('cross_check', True))
+            
+            return jsonify({
+                'success': True,
+                'data': result,
+                'message': 'Configuration validation completed'
+            }), 200
+        
         config_content = data.get('content', '')
         
         if not config_content:
@@ -551,58 +927,72 @@ def validate_frp_config():
                 'error': 'Config content is required'
             }), 400
         
-        # 尝试解析TOML
-        try:
-            config = toml.loads(config_content)
-            
-            # 基本验证
-            errors = []
-            warnings = []
-            
-            # 检查必需字段
-            if 'serverAddr' not in config and 'server_addr' not in config:
-                errors.append('Missing required field: serverAddr')
-            
-            if 'serverPort' not in config and 'server_port' not in config:
-                errors.append('Missing required field: serverPort')
-            
-            # 检查代理配置
-            proxies = config.get('proxies', [])
-            if not proxies:
-                warnings.append('No proxy configurations found')
-            
-            # 检查端口冲突
-            used_ports = set()
-            for proxy in proxies:
-                local_port = proxy.get('localPort') or proxy.get('local_port')
-                if local_port:
-                    if local_port in used_ports:
-                        errors.append(f'Port conflict: localPort {local_port} is already used')
-                    used_ports.add(local_port)
-            
-            # 检查端口范围
-            for proxy in proxies:
-                local_port = proxy.get('localPort') or proxy.get('local_port')
-                if local_port and (local_port < 1 or local_port > 65535):
-                    errors.append(f'Invalid port number: {local_port}')
-            
-            return jsonify({
-                'success': True,
-                'valid': len(errors) == 0,
-                'errors': errors,
-                'warnings': warnings,
-                'message': 'Configuration validation completed'
-            }), 200
+        result = lint_config(config_content)
+        diagnostics = result['diagnostics']
+        syntax_error = any(d['code'] == 'syntax' for d in diagnostics)
+        
+        return jsonify({
+            'success': not syntax_error,
+            'valid': result['valid'],
+            'errors': [_format_diagnostic(d) for d in diagnostics if d['severity'] == 'error'],
+            'warnings': [_format_diagnostic(d) for d in diagnostics if d['severity'] == 'warning'],
+            'diagnostics': diagnostics,
+            'message': 'Configuration validation failed' if syntax_error else 'Configuration validation completed'
+        }), 400 if syntax_error else 200
             
-        except toml.TomlDecodeError as e:
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+def _format_diagnostic(diagnostic):
+    """诊断转换为文本（兼容旧的 errors/warnings 字段）"""
+    if diagnostic['line']:
+        return f"line {diagnostic['line']}: {diagnostic['message']}"
+    return diagnostic['message']
+
+
+@frp_bp.route('/configs/apply', methods=['POST'])
+@cross_origin()
+def apply_frp_config():
+    """
+    应用FRP配置文件（只有代理变化时通过管理接口热加载，不重启frpc）
+    
+    请求体:
+        JSON: { content: string, dry_run: bool }
+        
+    返回:
+        JSON: 代理差异、生效方式（none/reload/restart/file）及代理状态
+    """
+    try:
+        data = request.get_json() or {}
+        content = data.get('content', '')
+        
+        if not content:
             return jsonify({
                 'success': False,
-                'valid': False,
-                'errors': [f'TOML syntax error: {str(e)}'],
-                'warnings': [],
-                'message': 'Configuration validation failed'
+                'error': 'Config content is required'
             }), 400
-            
+        
+        result = get_config_applier().apply(content, dry_run=bool(data.get('dry_run')))
+        
+        return jsonify({
+            'success': True,
+            'data': result
+        }), 200
+        
+    except TomlDecodeError as e:
+        return jsonify({
+            'success': False,
+            'error': f'TOML syntax error: {str(e)}'
+        }), 400
+    except FrpReloadError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
     except Exception as e:
         return jsonify({
             'success': False,
@@ -616,43 +1006,34 @@ def validate_frp_config():
 @cross_origin()
 def backup_frp_config():
     """
-    备份FRP配置文件
+    备份FRP配置文件（内容与最近一次备份相同时不重复保存）
     
+    请求体:
+        JSON: { label: string }（可选）
+        
     返回:
         JSON: 操作结果
     """
     try:
-        # 确保备份目录存在
-        os.makedirs(FRP_BACKUP_DIR, exist_ok=True)
-        
-        # 生成备份文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_filename = f'frpc_backup_{timestamp}.toml'
-        backup_path = os.path.join(FRP_BACKUP_DIR, backup_filename)
+        data = request.get_json(silent=True) or {}
         
-        # 读取当前配置
-        if os.path.exists(FRPC_CONFIG_PATH):
-            with open(FRPC_CONFIG_PATH, 'r') as f:
-                config_content = f.read()
-            
-            # 写入备份文件
-            with open(backup_path, 'w') as f:
-                f.write(config_content)
-            
-            return jsonify({
-                'success': True,
-                'message': 'Configuration backed up successfully',
-                'data': {
-                    'backup_file': backup_filename,
-                    'backup_path': backup_path,
-                    'timestamp': timestamp
-                }
-            }), 200
-        else:
+        if not os.path.exists(FRPC_CONFIG_PATH):
             return jsonify({
                 'success': False,
                 'error': 'Configuration file not found'
             }), 404
+        
+        with open(FRPC_CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config_content = f.read()
+        
+        entry, duplicate = get_backup_store().create(config_content, label=data.get('label', ''))
+        
+        return jsonify({
+            'success': True,
+            'message': 'Configuration unchanged since last backup' if duplicate
+                       else 'Configuration backed up successfully',
+            'data': dict(entry, backup_file=entry['id'], duplicate=duplicate)
+        }), 200
             
     except Exception as e:
         return jsonify({
@@ -665,37 +1046,17 @@ def backup_frp_config():
 @cross_origin()
 def list_frp_backups():
     """
-    获取FRP配置备份列表
+    获取FRP配置备份列表（读取备份清单）
     
     返回:
-        JSON: 备份文件列表
+        JSON: 备份列表（新的在前）
     """
     try:
-        backups = []
-        
-        if os.path.exists(FRP_BACKUP_DIR):
-            for filename in os.listdir(FRP_BACKUP_DIR):
-                if filename.startswith('frpc_backup_') and filename.endswith('.toml'):
-                    filepath = os.path.join(FRP_BACKUP_DIR, filename)
-                    stat = os.stat(filepath)
-                    
-                    # 从文件名提取时间戳
-                    timestamp_str = filename.replace('frpc_backup_', '').replace('.toml', '')
-                    
-                    backups.append({
-                        'filename': filename,
-                        'path': filepath,
-                        'size': stat.st_size,
-                        'created': datetime.fromtimestamp(stat.st_ctime).isoformat(),
-                        'timestamp': timestamp_str
-                    })
-        
-        # 按创建时间倒序排序
-        backups.sort(key=lambda x: x['created'], reverse=True)
+        backups = get_backup_store().list()
         
         return jsonify({
             'success': True,
-            'data': backups,
+            'data': [dict(entry, filename=entry['id']) for entry in backups],
             'total': len(backups)
         }), 200
         
@@ -706,6 +1067,93 @@ def list_frp_backups():
         }), 500
 
 
+@frp_bp.route('/configs/backups/<backup_id>', methods=['GET'])
+@cross_origin()
+def get_frp_backup(backup_id):
+    """
+    获取FRP配置备份内容
+    
+    Args:
+        backup_id: 备份ID
+        
+    返回:
+        JSON: 备份记录及内容
+    """
+    try:
+        store = get_backup_store()
+        entry = store.get(backup_id)
+        
+        return jsonify({
+            'success': True,
+            'data': dict(entry, content=store.read(backup_id))
+        }), 200
+        
+    except BackupNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Backup not found'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@frp_bp.route('/configs/backups/diff', methods=['GET'])
+@cross_origin()
+def diff_frp_backups():
+    """
+    比较两个FRP配置版本
+    
+    查询参数:
+        from: 起始备份ID
+        to: 目标备份ID（默认与当前配置比较）
+        context: 上下文行数（默认 3）
+        
+    返回:
+        JSON: unified diff
+    """
+    try:
+        from_id = request.args.get('from')
+        to_id = request.args.get('to')
+        context = min(max(request.args.get('context', 3, type=int), 0), 100)
+        
+        if not from_id:
+            return jsonify({
+                'success': False,
+                'error': 'from is required'
+            }), 400
+        
+        current = None
+        if not to_id:
+            if not os.path.exists(FRPC_CONFIG_PATH):
+                return jsonify({
+                    'success': False,
+                    'error': 'Configuration file not found'
+                }), 404
+            with open(FRPC_CONFIG_PATH, 'r', encoding='utf-8') as f:
+                current = f.read()
+        
+        result = get_backup_store().diff(from_id, to_id, current=current, context=context)
+        
+        return jsonify({
+            'success': True,
+            'data': result
+        }), 200
+        
+    except BackupNotFoundError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Backup not found: {str(e)}'
+        }), 404
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @frp_bp.route('/configs/restore', methods=['POST'])
 @cross_origin()
 def restore_frp_config():
@@ -713,58 +1161,65 @@ def restore_frp_config():
     恢复FRP配置文件
     
     请求体:
-        JSON: { backup_file: string }
+        JSON: { backup_file: string }（备份ID）
         
     返回:
         JSON: 操作结果
     """
     try:
-        data = request.get_json()
-        backup_filename = data.get('backup_file')
+        data = request.get_json() or {}
+        backup_id = data.get('backup_file') or data.get('backup_id')
         
-        if not backup_filename:
+        if not backup_id:
             return jsonify({
                 'success': False,
                 'error': 'backup_file is required'
             }), 400
         
-        backup_path = os.path.join(FRP_BACKUP_DIR, backup_filename)
-        
-        if not os.path.exists(backup_path):
-            return jsonify({
-                'success': False,
-                'error': 'Backup file not found'
-            }), 404
-        
-        # 读取备份文件
-        with open(backup_path, 'r') as f:
-            backup_content = f.read()
+        store = get_backup_store()
+        backup_content = store.read(backup_id)
         
         # 验证备份文件
         try:
-            toml.loads(backup_content)
-        except toml.TomlDecodeError as e:
+            parse_toml(backup_content)
+        except TomlDecodeError as e:
             return jsonify({
                 'success': False,
                 'error': f'Invalid backup file: {str(e)}'
             }), 400
         
-        # 备份当前配置
-        current_backup = backup_frp_config()
+        # 备份当前配置（与已有备份相同时不重复保存）
+        current_backup = None
+        if os.path.exists(FRPC_CONFIG_PATH):
+            with open(FRPC_CONFIG_PATH, 'r', encoding='utf-8') as f:
+                entry, duplicate = store.create(f.read(), label=f'before restore {backup_id}')
+            current_backup = dict(entry, duplicate=duplicate)
         
-        # 恢复配置
-        with open(FRPC_CONFIG_PATH, 'w') as f:
-            f.write(backup_content)
+        # 恢复配置（按代理差异热加载）
+        applied = get_config_applier().apply(backup_content)
         
         return jsonify({
             'success': True,
             'message': 'Configuration restored successfully',
             'data': {
-                'restored_from': backup_filename,
-                'current_backup': current_backup.get_json().get('data', {})
+                'restored_from': backup_id,
+                'current_backup': current_backup,
+                'apply': applied
             }
         }), 200
         
+    except BackupNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Backup file not found'
+        }), 404
+        
+    except FrpReloadError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+        
     except Exception as e:
         return jsonify({
             'success': False,
@@ -772,33 +1227,31 @@ def restore_frp_config():
         }), 500
 
 
-@frp_bp.route('/configs/backups/<backup_filename>', methods=['DELETE'])
+@frp_bp.route('/configs/backups/<backup_id>', methods=['DELETE'])
 @cross_origin()
-def delete_frp_backup(backup_filename):
+def delete_frp_backup(backup_id):
     """
-    删除FRP配置备份
+    删除FRP配置备份（压缩对象不再被其他备份引用时一并删除）
     
     Args:
-        backup_filename: 备份文件名
+        backup_id: 备份ID
         
     返回:
         JSON: 操作结果
     """
     try:
-        backup_path = os.path.join(FRP_BACKUP_DIR, backup_filename)
+        get_backup_store().delete(backup_id)
         
-        if os.path.exists(backup_path):
-            os.remove(backup_path)
-            return jsonify({
-                'success': True,
-                'message': 'Backup deleted successfully'
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Backup file not found'
-            }), 404
+        return jsonify({
+            'success': True,
+            'message': 'Backup deleted successfully'
+        }), 200
             
+    except BackupNotFoundError:
+        return jsonify({
+            'success': False,
+            'error': 'Backup file not found'
+        }), 404
     except Exception as e:
         return jsonify({
             'success': False,
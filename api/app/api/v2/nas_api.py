@@ -4,13 +4,23 @@ NAS管理API模块
 """
 
 import os
+import time
+import logging
 import subprocess
 import requests
 from datetime import datetime
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, send_file
 from flask_cors import cross_origin
 
+from app.celery import TaskDispatchError, dispatch_task
+from app.services.dir_size import get_size_aggregator
+from app.services.capacity_forecast import get_capacity_forecaster
+from app.services.file_index import get_file_index
+from app.services.dedup import get_dedup_scanner
+from app.services.file_transfer import TransferError, resolve_volume_path, stream_to_file
+
 nas_bp = Blueprint('nas', __name__)
+logger = logging.getLogger('nas_api')
 
 # NAS API配置
 NAS_API_URL = os.getenv('NAS_API_URL', 'http://localhost:6004')
@@ -382,6 +392,215 @@ def get_nas_volume(volume_id):
         }), 500
 
 
+@nas_bp.route('/volumes/<volume_id>/usage', methods=['GET'])
+@cross_origin()
+def get_nas_volume_usage(volume_id):
+    """
+    获取存储卷目录占用（读取后台统计结果）
+    
+    Args:
+        volume_id: 存储卷ID
+        
+    查询参数:
+        limit: 返回的子目录数量，默认50
+        
+    返回:
+        JSON: 存储卷根目录累计大小及占用最多的子目录
+    """
+    try:
+        aggregator = get_size_aggregator()
+        root = aggregator.volumes.get(volume_id)
+        if not root:
+            return jsonify({
+                'success': False,
+                'error': 'Volume not found'
+            }), 404
+        
+        limit = request.args.get('limit', 50, type=int)
+        usage = aggregator.get_folder_size(root, children=True, limit=limit)
+        
+        if usage is None:
+            # 尚未统计，投递扫描任务（扫描已在进行中则不重复投递）
+            if not aggregator.is_scanning(volume_id):
+                dispatch_task('tasks.nas_size_scan', volume_id)
+            return jsonify({
+                'success': True,
+                'data': None,
+                'scanning': True,
+                'message': '目录大小统计中，请稍后再试'
+            }), 202
+        
+        return jsonify({
+            'success': True,
+            'data': usage,
+            'scanning': aggregator.is_scanning(volume_id),
+            'scan': aggregator.index.get_scan(volume_id)
+        }), 200
+        
+    except TaskDispatchError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@nas_bp.route('/volumes/<volume_id>/scan', methods=['POST'])
+@cross_origin()
+def scan_nas_volume(volume_id):
+    """
+    触发存储卷目录大小后台统计（投递 Celery 任务）
+    
+    Args:
+        volume_id: 存储卷ID
+        
+    返回:
+        JSON: 操作结果，taskId 为投递的任务ID
+    """
+    try:
+        aggregator = get_size_aggregator()
+        if volume_id not in aggregator.volumes:
+            return jsonify({
+                'success': False,
+                'error': 'Volume not found'
+            }), 404
+        
+        if aggregator.is_scanning(volume_id):
+            return jsonify({
+                'success': True,
+                'started': False,
+                'scan': aggregator.index.get_scan(volume_id),
+                'message': '目录大小统计正在进行中'
+            }), 202
+        
+        task = dispatch_task('tasks.nas_size_scan', volume_id)
+        
+        return jsonify({
+            'success': True,
+            'started': True,
+            'taskId': task.id,
+            'message': '目录大小统计已启动'
+        }), 202
+        
+    except TaskDispatchError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@nas_bp.route('/volumes/<volume_id>/forecast', methods=['GET'])
+@cross_origin()
+def get_nas_volume_forecast(volume_id):
+    """
+    获取存储卷容量增长趋势与写满预测
+
+    Args:
+        volume_id: 存储卷ID
+
+    查询参数:
+        history: 是否返回采样历史（true/false），默认false
+        limit: 返回的历史样本数量，默认500
+
+    返回:
+        JSON: 每日增长量、预计写满天数
+    """
+    try:
+        forecaster = get_capacity_forecaster()
+        if volume_id not in forecaster.volumes:
+            return jsonify({
+                'success': False,
+                'error': 'Volume not found'
+            }), 404
+
+        forecast = forecaster.forecast(volume_id)
+        if forecast['samples'] == 0:
+            # 尚无采样数据，先采样一次
+            forecaster.sample()
+            forecast = forecaster.forecast(volume_id)
+
+        if request.args.get('history', 'false').lower() == 'true':
+            limit = min(request.args.get('limit', 500, type=int), 5000)
+            forecast['history'] = forecaster.history(volume_id, limit=limit)
+
+        response = {
+            'success': True,
+            'data': forecast
+        }
+        if forecast['daysUntilFullEstimate'] is None:
+            response['message'] = '容量样本不足或容量未增长，暂无法预测'
+
+        return jsonify(response), 200
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@nas_bp.route('/folders/size', methods=['GET'])
+@cross_origin()
+def get_nas_folder_size():
+    """
+    获取目录累计大小和文件数
+    
+    查询参数:
+        path: 目录路径
+        children: 是否返回子目录大小，默认false
+        limit: 返回的子目录数量，默认50
+        
+    返回:
+        JSON: 目录大小信息（包含 computed_at 统计时间）
+    """
+    try:
+        path = request.args.get('path')
+        if not path:
+            return jsonify({
+                'success': False,
+                'error': 'path is required'
+            }), 400
+        
+        children = request.args.get('children', 'false').lower() == 'true'
+        limit = request.args.get('limit', 50, type=int)
+        
+        aggregator = get_size_aggregator()
+        volume_id, _ = aggregator.volume_for_path(path)
+        if volume_id is None:
+            return jsonify({
+                'success': False,
+                'error': 'Path is not on a NAS volume'
+            }), 400
+        
+        size = aggregator.get_folder_size(path, children=children, limit=limit)
+        if size is None:
+            return jsonify({
+                'success': False,
+                'error': 'Folder not indexed',
+                'scanning': aggregator.is_scanning(volume_id)
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': size
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 # ========== 文件共享接口 ==========
 
 @nas_bp.route('/shares', methods=['GET'])
@@ -555,3 +774,275 @@ def get_nas_files():
             'success': False,
             'error': str(e)
         }), 500
+
+
+@nas_bp.route('/files/download', methods=['GET'])
+@cross_origin()
+def download_nas_file():
+    """
+    下载NAS文件
+    
+    支持 Range/If-Range 断点续传以及 ETag/Last-Modified 条件请求，
+    文件内容通过 wsgi.file_wrapper 输出（gunicorn 下使用 sendfile）
+    
+    查询参数:
+        path: 文件路径
+        attachment: 是否以附件形式下载，默认true
+        
+    返回:
+        文件内容
+    """
+    try:
+        path = resolve_volume_path(request.args.get('path'))
+        
+        if not os.path.isfile(path):
+            return jsonify({
+                'success': False,
+                'error': 'File not found'
+            }), 404
+        
+        return send_file(
+            path,
+            as_attachment=request.args.get('attachment', 'true').lower() == 'true',
+            conditional=True,
+            etag=True,
+            max_age=0
+        )
+        
+    except TransferError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@nas_bp.route('/files/upload', methods=['PUT', 'POST'])
+@cross_origin()
+def upload_nas_file():
+    """
+    流式上传NAS文件
+    
+    请求体为文件原始内容，按固定大小缓冲区写入磁盘并批量 fsync，
+    不会将整个文件读入内存
+    
+    查询参数:
+        path: 目标文件路径
+        overwrite: 是否覆盖已有文件，默认false
+        
+    返回:
+        JSON: 上传结果
+    """
+    try:
+        path = resolve_volume_path(request.args.get('path'))
+        overwrite = request.args.get('overwrite', 'false').lower() == 'true'
+        
+        result = stream_to_file(
+            request.stream,
+            path,
+            overwrite=overwrite,
+            content_length=request.content_length
+        )
+        
+        # 增量更新目录大小统计（文件已写入，索引失败不影响上传结果，下次全量扫描会修正）
+        try:
+            get_size_aggregator().record_change(path, result['old_size'], result['size'])
+        except Exception as e:
+            logger.error(f"Failed to update size index for {path}: {e}")
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'path': result['path'],
+                'size': result['size'],
+                'overwritten': result['old_size'] is not None
+            },
+            'message': '文件上传成功'
+        }), 201
+        
+    except TransferError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status_code
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# ========== 文件搜索接口 ==========
+
+def _parse_timestamp(value):
+    """解析时间参数（ISO格式或Unix时间戳）"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+@nas_bp.route('/search', methods=['GET'])
+@cross_origin()
+def search_nas_files():
+    """
+    搜索NAS文件（基于文件索引，不遍历磁盘）
+    
+    查询参数:
+        q: 关键词（文件名子串；少于3个字符时按前缀匹配）
+        ext: 扩展名，多个用逗号分隔
+        min_size: 最小文件大小（字节）
+        max_size: 最大文件大小（字节）
+        modified_after: 修改时间下限（ISO格式或Unix时间戳）
+        volume: 存储卷ID
+        type: file 或 dir
+        in_path: 是否匹配完整路径，默认false
+        limit: 返回数量，默认50
+        offset: 偏移量，默认0
+        
+    返回:
+        JSON: 搜索结果
+    """
+    try:
+        exts = [e.strip().lower().lstrip('.') for e in request.args.get('ext', '').split(',') if e.strip()]
+        
+        try:
+            modified_after = _parse_timestamp(request.args.get('modified_after'))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid modified_after'
+            }), 400
+        
+        started = time.perf_counter()
+        results = get_file_index().search(
+            q=request.args.get('q'),
+            exts=exts,
+            min_size=request.args.get('min_size', type=int),
+            max_size=request.args.get('max_size', type=int),
+            modified_after=modified_after,
+            volume=request.args.get('volume'),
+            kind=request.args.get('type'),
+            in_path=request.args.get('in_path', 'false').lower() == 'true',
+            limit=request.args.get('limit', 50, type=int),
+            offset=request.args.get('offset', 0, type=int)
+        )
+        took_ms = round((time.perf_counter() - started) * 1000, 2)
+        
+        files = [{
+            'path': r['path'],
+            'name': r['name'],
+            'ext': r['ext'],
+            'volume': r['volume'],
+            'type': 'folder' if r['is_dir'] else 'file',
+            'size': r['size'],
+            'updatedAt': datetime.fromtimestamp(r['mtime']).isoformat()
+        } for r in results]
+        
+        return jsonify({
+            'success': True,
+            'data': files,
+            'returned': len(files),
+            'took_ms': took_ms
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+# ========== 重复文件接口 ==========
+
+@nas_bp.route('/dedup/scan', methods=['POST'])
+@cross_origin()
+def scan_nas_duplicates():
+    """
+    启动重复文件后台扫描（投递 Celery 任务）
+    
+    请求体:
+        JSON: { volume: string }（可选，只扫描指定存储卷）
+        
+    返回:
+        JSON: 操作结果，taskId 为投递的任务ID
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        scanner = get_dedup_scanner()
+        if scanner.running:
+            return jsonify({
+                'success': True,
+                'started': False,
+                'progress': scanner.progress,
+                'message': '重复文件扫描正在进行中'
+            }), 202
+        
+        task = dispatch_task('tasks.nas_dedup_scan', data.get('volume'))
+        
+        return jsonify({
+            'success': True,
+            'started': True,
+            'taskId': task.id,
+            'message': '重复文件扫描已启动'
+        }), 202
+        
+    except TaskDispatchError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 503
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@nas_bp.route('/dedup/report', methods=['GET'])
+@cross_origin()
+def get_nas_dedup_report():
+    """
+    获取重复文件报告
+    
+    查询参数:
+        id: 报告ID，默认最新一份
+        limit: 返回的重复组数量（按浪费空间倒序），默认100
+        
+    返回:
+        JSON: 重复文件报告
+    """
+    try:
+        scanner = get_dedup_scanner()
+        report = scanner.index.get_dedup_report(request.args.get('id', type=int))
+        
+        if report is None:
+            return jsonify({
+                'success': False,
+                'error': 'Report not found',
+                'running': scanner.running
+            }), 404
+        
+        limit = request.args.get('limit', 100, type=int)
+        report['groups'] = report['groups'][:limit]
+        report['started_at'] = datetime.fromtimestamp(report['started_at']).isoformat()
+        report['finished_at'] = datetime.fromtimestamp(report['finished_at']).isoformat()
+        
+        return jsonify({
+            'success': True,
+            'data': report,
+            'running': scanner.running,
+            'progress': scanner.progress
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
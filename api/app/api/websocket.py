@@ -2,9 +2,7 @@ from flask import Blueprint, request, jsonify
 from flask_socketio import emit, join_room, leave_room, rooms
 from datetime import datetime
 
-# 注意：这只是一个示例文件
-# 实际的 WebSocket 功能需要在主应用中初始化 SocketIO
-# 并使用装饰器 @socketio.on() 来处理事件
+# SocketIO 由 create_app() 调用 init_socketio() 创建，下面的事件处理器在其中注册
 
 # 创建蓝图（虽然 WebSocket 不使用蓝图路由，但保留结构）
 ws_bp = Blueprint('websocket_v2', __name__, url_prefix='/ws')
@@ -112,6 +110,58 @@ def broadcast_ddns_update(data):
     emit('ddns_update', event_data, room='event:ddns_update', namespace='/')
 
 
+def init_socketio(app):
+    """
+    创建 SocketIO，注册事件处理器和 DDNS 状态推送
+
+    每个 worker 只向连接到自己的客户端推送（各 worker 都监视状态文件，不使用消息队列，客户端不会收到重复事件）；
+    没有消息队列时轮询传输的会话只存在于单个 worker，多 worker 部署需要粘性会话，因此 SOCKETIO_ENABLED 默认关闭
+
+    Returns:
+        SocketIO: 实例（同时保存在 app.extensions['socketio']）
+    """
+    from flask_socketio import SocketIO
+
+    socketio = SocketIO(app, cors_allowed_origins=app.config.get('CORS_ORIGINS', '*'))
+    socketio.on_event('connect', handle_connect)
+    socketio.on_event('disconnect', handle_disconnect)
+    socketio.on_event('join_room', handle_join_room)
+    socketio.on_event('leave_room', handle_leave_room)
+    socketio.on_event('subscribe_events', handle_subscribe_events)
+    socketio.on_event('unsubscribe_events', handle_unsubscribe_events)
+    register_ddns_status_push(socketio)
+    return socketio
+
+
+def register_ddns_status_push(socketio):
+    """
+    将 DDNS 状态文件的变化推送到 event:ddns_update 房间（由 init_socketio() 调用）
+
+    Args:
+        socketio: flask_socketio.SocketIO 实例（监视线程中没有请求上下文，不能使用 emit）
+    """
+    from app.services.ddns_status import get_ddns_status_provider
+
+    def push(snapshot, previous):
+        data = snapshot['data'] or {}
+        old = previous['data'] or {}
+        socketio.emit('ddns_update', {
+            'type': 'ddns_update',
+            'domain': data.get('domain'),
+            'subdomain': data.get('subdomain'),
+            'old_ip': old.get('current_ip'),
+            'new_ip': data.get('current_ip'),
+            'running': snapshot['running'],
+            'status': data.get('message') or snapshot['error'],
+            'timestamp': data.get('timestamp', datetime.utcnow().isoformat())
+        }, room='event:ddns_update', namespace='/')
+
+    provider = get_ddns_status_provider()
+    provider.subscribe(push)
+    provider.start()
+    return push
+
+
 def broadcast_alert(data):
     """广播告警事件"""
     event_data = {
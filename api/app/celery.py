@@ -19,6 +19,7 @@ def make_celery(app):
         task_time_limit=30 * 60,  # 硬限制 30 分钟
         task_soft_time_limit=25 * 60,  # 软限制 25 分钟
         worker_prefetch_multiplier=4,  # 预取 4 倍任务
+        beat_schedule={},  # 周期任务在 register_tasks 中添加
     )
 
     class ContextTask(celery.Task):
@@ -31,10 +32,35 @@ def make_celery(app):
     return celery
 
 
+class TaskDispatchError(RuntimeError):
+    """Celery 未启用，无法投递任务"""
+
+
+def dispatch_task(name, *args):
+    """
+    向 Celery 投递已注册的任务（在请求上下文中调用）
+
+    Args:
+        name: 任务名，如 tasks.nas_size_scan
+        *args: 任务参数
+
+    Returns:
+        AsyncResult: 任务结果句柄
+    """
+    from flask import current_app
+    celery = current_app.extensions.get('celery')
+    if celery is None:
+        raise TaskDispatchError('Celery is not enabled (CELERY_ENABLED=false)')
+    return celery.tasks[name].delay(*args)
+
+
 # 注册任务
 def init_celery(app):
-    """初始化 Celery 并注册任务"""
+    """初始化 Celery 并注册任务（同一应用只初始化一次）"""
+    if 'celery' in app.extensions:
+        return app.extensions['celery']
     from .tasks import register_tasks
     celery = make_celery(app)
     register_tasks(celery)
+    app.extensions['celery'] = celery
     return celery
@@ -0,0 +1,234 @@
+"""
+阿里云云解析（Alidns）客户端
+实现 RPC 签名 v1（HMAC-SHA1），公共参数的编码结果和 HMAC 密钥状态只计算一次；
+通过连接池复用 HTTPS 连接，同步记录时先一次性拉取域名下的解析记录，只有值或 TTL 变化时才调用更新接口
+"""
+
+import os
+import hmac
+import uuid
+import base64
+import hashlib
+import logging
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.parse import quote
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+ALIYUN_ACCESS_KEY_ID = os.getenv('ALIYUN_ACCESS_KEY_ID', '')
+ALIYUN_ACCESS_KEY_SECRET = os.getenv('ALIYUN_ACCESS_KEY_SECRET', '')
+ALIDNS_ENDPOINT = os.getenv('ALIDNS_ENDPOINT', 'https://alidns.aliyuncs.com/')
+ALIDNS_TIMEOUT = float(os.getenv('ALIDNS_TIMEOUT', '10'))
+
+API_VERSION = '2015-01-09'
+PAGE_SIZE = 500
+
+
+class AlidnsError(Exception):
+    """Alidns 接口错误"""
+
+    def __init__(self, code, message, request_id=None, status_code=None):
+        super().__init__(f'{code}: {message}')
+        self.code = code
+        self.message = message
+        self.request_id = request_id
+        self.status_code = status_code
+
+    @property
+    def throttled(self):
+        return self.code in ('Throttling', 'Throttling.User', 'Throttling.Api') or self.status_code == 429
+
+
+@lru_cache(maxsize=4096)
+def percent_encode(value):
+    """RFC 3986 编码（阿里云规范：空格为 %20，* 为 %2A，~ 不编码）"""
+    return quote(str(value), safe='~')
+
+
+class RpcSigner:
+    """RPC 签名 v1"""
+
+    def __init__(self, access_key_id, access_key_secret, static_params):
+        self._hmac = hmac.new(f'{access_key_secret}&'.encode('utf-8'), digestmod=hashlib.sha1)
+        params = dict(static_params, AccessKeyId=access_key_id)
+        # 公共参数在每个请求中不变，预先编码
+        self._static = {k: f'{percent_encode(k)}={percent_encode(v)}' for k, v in params.items()}
+        self.static_params = params
+
+    def sign(self, params, method='GET'):
+        """
+        计算签名
+
+        Args:
+            params: 不含公共参数和 Signature 的请求参数
+
+        Returns:
+            tuple: (完整参数 dict, 签名)
+        """
+        encoded = dict(self._static)
+        for key, value in params.items():
+            encoded[key] = f'{percent_encode(key)}={percent_encode(value)}'
+        canonicalized = '&'.join(encoded[key] for key in sorted(encoded))
+        string_to_sign = f'{method}&%2F&{percent_encode(canonicalized)}'
+        mac = self._hmac.copy()
+        mac.update(string_to_sign.encode('utf-8'))
+        signature = base64.b64encode(mac.digest()).decode('ascii')
+        return dict(self.static_params, **params), signature
+
+
+def signature_params():
+    """每个请求不同的签名参数"""
+    return {
+        'Timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'SignatureNonce': uuid.uuid4().hex
+    }
+
+
+class AlidnsClient:
+    """Alidns 客户端"""
+
+    def __init__(self, access_key_id=None, access_key_secret=None, endpoint=None, timeout=None, pool_size=10):
+        self.access_key_id = access_key_id or ALIYUN_ACCESS_KEY_ID
+        self.endpoint = endpoint or ALIDNS_ENDPOINT
+        self.timeout = timeout or ALIDNS_TIMEOUT
+        self.signer = RpcSigner(self.access_key_id, access_key_secret or ALIYUN_ACCESS_KEY_SECRET, {
+            'Format': 'JSON',
+            'Version': API_VERSION,
+            'SignatureMethod': 'HMAC-SHA1',
+            'SignatureVersion': '1.0'
+        })
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def call(self, action, **params):
+        """
+        调用接口
+
+        Raises:
+            AlidnsError: 接口返回错误或网络错误
+        """
+        request_params = {'Action': action}
+        request_params.update((k, v) for k, v in params.items() if v is not None)
+        request_params.update(signature_params())
+        query, signature = self.signer.sign(request_params)
+        query['Signature'] = signature
+        try:
+            response = self.session.get(self.endpoint, params=query, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            raise AlidnsError('NetworkError', str(e))
+        try:
+            data = response.json()
+        except ValueError:
+            raise AlidnsError('InvalidResponse', response.text[:200], status_code=response.status_code)
+        if response.status_code >= 400 or ('Code' in data and 'Message' in data):
+            raise AlidnsError(data.get('Code', 'HTTP%d' % response.status_code), data.get('Message', ''),
+                              data.get('RequestId'), response.status_code)
+        return data
+
+    # ========== 解析记录 ==========
+
+    def describe_domain_records(self, domain, rr=None, record_type=None):
+        """
+        获取域名下的全部解析记录（自动翻页）
+
+        Returns:
+            list: 解析记录（RecordId、RR、Type、Value、TTL、Status...）
+        """
+        records = []
+        page = 1
+        while True:
+            data = self.call('DescribeDomainRecords', DomainName=domain, PageNumber=page, PageSize=PAGE_SIZE,
+                             RRKeyWord=rr, Type=record_type)
+            batch = (data.get('DomainRecords') or {}).get('Record') or []
+            records.extend(batch)
+            if not batch or len(records) >= int(data.get('TotalCount', 0)):
+                return records
+            page += 1
+
+    def describe_domain_record_info(self, record_id):
+        """按 RecordId 获取单条解析记录"""
+        return self.call('DescribeDomainRecordInfo', RecordId=record_id)
+
+    def add_domain_record(self, domain, rr, record_type, value, ttl=None):
+        return self.call('AddDomainRecord', DomainName=domain, RR=rr, Type=record_type, Value=value, TTL=ttl)
+
+    def update_domain_record(self, record_id, rr, record_type, value, ttl=None):
+        return self.call('UpdateDomainRecord', RecordId=record_id, RR=rr, Type=record_type, Value=value, TTL=ttl)
+
+    def delete_domain_record(self, record_id):
+        return self.call('DeleteDomainRecord', RecordId=record_id)
+
+    def sync_record(self, domain, rr, record_type, value, ttl=None, records=None):
+        """
+        使解析记录指向指定值，值和 TTL 未变化时不调用写接口
+
+        Args:
+            domain: 主域名
+            rr: 主机记录（如 ddns、@）
+            record_type: 记录类型（A/AAAA/CNAME...）
+            value: 记录值
+            ttl: TTL（为 None 时不比较也不修改）
+            records: 已获取的域名解析记录（批量同步时复用，为 None 时自动获取）
+
+        Returns:
+            dict: {'action': unchanged/updated/created, 'recordId', 'oldValue', 'value'}
+        """
+        if records is None:
+            records = self.describe_domain_records(domain, rr=rr, record_type=record_type)
+        ttl = int(ttl) if ttl is not None else None
+        existing = next(
+            (r for r in records if r.get('RR') == rr and r.get('Type') == record_type),
+            None
+        )
+        result = {'domain': domain, 'rr': rr, 'type': record_type, 'value': value,
+                  'oldValue': existing.get('Value') if existing else None}
+
+        if existing is None:
+            data = self.add_domain_record(domain, rr, record_type, value, ttl)
+            result.update(action='created', recordId=data.get('RecordId'))
+            return result
+
+        result['recordId'] = existing.get('RecordId')
+        same_ttl = ttl is None or int(existing.get('TTL', 0)) == ttl
+        if existing.get('Value') == value and same_ttl:
+            result['action'] = 'unchanged'
+            return result
+
+        try:
+            self.update_domain_record(existing['RecordId'], rr, record_type, value, ttl)
+        except AlidnsError as e:
+            # 记录已是目标值（并发更新或本地记录列表过期）
+            if e.code != 'DomainRecordDuplicate':
+                raise
+            result['action'] = 'unchanged'
+            return result
+        result['action'] = 'updated'
+        return result
+
+    def close(self):
+        self.session.close()
+
+
+def alidns_configured():
+    """是否配置了阿里云访问密钥"""
+    return bool(ALIYUN_ACCESS_KEY_ID and ALIYUN_ACCESS_KEY_SECRET)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_alidns_client():
+    """获取全局 Alidns 客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = AlidnsClient()
+    return _client
@@ -0,0 +1,183 @@
+"""
+本地模拟 Alidns 接口
+校验 RPC 签名 v1，在内存中维护解析记录，实现 DescribeDomainRecords（分页）、DescribeDomainRecordInfo、
+AddDomainRecord、UpdateDomainRecord、DeleteDomainRecord，并统计各接口调用次数；
+用于测试和没有阿里云密钥的开发环境（将 ALIDNS_ENDPOINT 指向该服务）
+"""
+
+import json
+import time
+import uuid
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+
+from .alidns import RpcSigner
+
+
+class FakeAlidnsServer:
+    """模拟 Alidns 接口"""
+
+    def __init__(self, access_key_id='test-id', access_key_secret='test-secret', host='127.0.0.1', port=0,
+                 rate_limit=None):
+        """
+        Args:
+            rate_limit: 每秒允许的写请求数，超过时返回 Throttling.User（None 表示不限制）
+        """
+        self.access_key_id = access_key_id
+        self.access_key_secret = access_key_secret
+        self.rate_limit = rate_limit
+        self.records = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._window = (0, 0)
+        self._signer = RpcSigner(access_key_id, access_key_secret, {})
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-alidns', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def add_record(self, domain, rr, record_type, value, ttl=600):
+        """预置解析记录"""
+        record_id = uuid.uuid4().hex[:16]
+        self.records[record_id] = {
+            'RecordId': record_id, 'DomainName': domain, 'RR': rr, 'Type': record_type,
+            'Value': value, 'TTL': ttl, 'Status': 'ENABLE', 'Line': 'default', 'Locked': False
+        }
+        return record_id
+
+    def find(self, domain, rr, record_type):
+        return [r for r in self.records.values()
+                if r['DomainName'] == domain and r['RR'] == rr and r['Type'] == record_type]
+
+    # ========== 接口实现 ==========
+
+    def _verify(self, params):
+        signature = params.pop('Signature', None)
+        if params.get('AccessKeyId') != self.access_key_id:
+            raise _ApiError(404, 'InvalidAccessKeyId.NotFound', 'Specified access key is not found.')
+        signed = {k: v for k, v in params.items() if k != 'AccessKeyId'}
+        expected = self._signer.sign(signed)[1]
+        if signature != expected:
+            raise _ApiError(400, 'SignatureDoesNotMatch', 'Specified signature is not matched with our calculation.')
+
+    def _throttle(self, action):
+        if self.rate_limit is None or action.startswith('Describe'):
+            return
+        second = int(time.time())
+        with self._lock:
+            window, count = self._window
+            if window != second:
+                window, count = second, 0
+            count += 1
+            self._window = (window, count)
+        if count > self.rate_limit:
+            raise _ApiError(400, 'Throttling.User', 'Request was denied due to user flow control.')
+
+    def handle(self, params):
+        self._verify(params)
+        action = params.get('Action')
+        self._throttle(action)
+        with self._lock:
+            self.calls[action] += 1
+            handler = getattr(self, f'_action_{action}', None)
+            if handler is None:
+                raise _ApiError(400, 'InvalidAction.NotFound', f'Specified api is not found: {action}')
+            return handler(params)
+
+    def _action_DescribeDomainRecords(self, p):
+        records = sorted(
+            (r for r in self.records.values() if r['DomainName'] == p.get('DomainName')),
+            key=lambda r: (r['RR'], r['Type'], r['RecordId'])
+        )
+        if p.get('RRKeyWord'):
+            records = [r for r in records if p['RRKeyWord'] in r['RR']]
+        if p.get('Type'):
+            records = [r for r in records if r['Type'] == p['Type']]
+        page = int(p.get('PageNumber', 1))
+        size = min(int(p.get('PageSize', 20)), 500)
+        chunk = records[(page - 1) * size:page * size]
+        return {'TotalCount': len(records), 'PageNumber': page, 'PageSize': size,
+                'DomainRecords': {'Record': [dict(r) for r in chunk]}}
+
+    def _action_DescribeDomainRecordInfo(self, p):
+        record = self.records.get(p.get('RecordId'))
+        if record is None:
+            raise _ApiError(400, 'DomainRecordNotBelongToUser', 'The DNS record does not exist.')
+        return dict(record)
+
+    def _action_AddDomainRecord(self, p):
+        if self.find(p['DomainName'], p['RR'], p['Type']) and p['Type'] == 'CNAME':
+            raise _ApiError(400, 'DomainRecordConflict', 'The DNS record is conflicted with other records.')
+        if any(r['Value'] == p['Value'] for r in self.find(p['DomainName'], p['RR'], p['Type'])):
+            raise _ApiError(400, 'DomainRecordDuplicate', 'The DNS record already exists.')
+        record_id = self.add_record(p['DomainName'], p['RR'], p['Type'], p['Value'], int(p.get('TTL', 600)))
+        return {'RecordId': record_id}
+
+    def _action_UpdateDomainRecord(self, p):
+        record = self.records.get(p.get('RecordId'))
+        if record is None:
+            raise _ApiError(400, 'DomainRecordNotBelongToUser', 'The DNS record does not exist.')
+        ttl = int(p.get('TTL', record['TTL']))
+        if (record['RR'], record['Type'], record['Value'], record['TTL']) == (p['RR'], p['Type'], p['Value'], ttl):
+            raise _ApiError(400, 'DomainRecordDuplicate', 'The DNS record already exists.')
+        record.update(RR=p['RR'], Type=p['Type'], Value=p['Value'], TTL=ttl)
+        return {'RecordId': record['RecordId']}
+
+    def _action_DeleteDomainRecord(self, p):
+        if self.records.pop(p.get('RecordId'), None) is None:
+            raise _ApiError(400, 'DomainRecordNotBelongToUser', 'The DNS record does not exist.')
+        return {'RecordId': p['RecordId']}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                params = dict(parse_qsl(urlparse(self.path).query, keep_blank_values=True))
+                request_id = str(uuid.uuid4()).upper()
+                try:
+                    code, body = 200, dict(server.handle(params), RequestId=request_id)
+                except _ApiError as e:
+                    code, body = e.status, {'RequestId': request_id, 'Code': e.code, 'Message': e.message}
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+class _ApiError(Exception):
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
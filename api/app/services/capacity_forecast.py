@@ -0,0 +1,228 @@
+"""
+存储卷容量趋势模块
+定期采样各存储卷已用/总容量写入指标时序存储，并根据历史拟合增长速度，估算存储卷写满的天数
+
+线性拟合使用指数衰减加权的最小二乘，只维护累加量，每次查询仅折叠新增样本；
+稳健拟合使用最近样本的 Theil-Sen 中位数斜率，不受一次性大文件拷贝/删除的影响
+"""
+
+import os
+import shutil
+import logging
+import threading
+import time
+from datetime import datetime
+
+from .file_index import load_volume_mounts
+from .metrics_store import get_metrics_store
+
+logger = logging.getLogger(__name__)
+
+# 采样周期（秒，由 Celery beat 调度，0 表示不定期采样）、线性拟合半衰期（天）、稳健拟合使用的样本数、最少样本数
+NAS_CAPACITY_SAMPLE_INTERVAL = int(os.getenv('NAS_CAPACITY_SAMPLE_INTERVAL', '3600'))
+NAS_FORECAST_HALF_LIFE_DAYS = float(os.getenv('NAS_FORECAST_HALF_LIFE_DAYS', '30'))
+NAS_FORECAST_ROBUST_SAMPLES = int(os.getenv('NAS_FORECAST_ROBUST_SAMPLES', '168'))
+NAS_FORECAST_MIN_SAMPLES = 3
+
+DAY = 86400
+
+
+def used_series(volume_id):
+    return f'nas.volume.{volume_id}.used'
+
+
+def total_series(volume_id):
+    return f'nas.volume.{volume_id}.total'
+
+
+def theil_sen_slope(points):
+    """
+    计算 Theil-Sen 斜率（所有样本对斜率的中位数）
+
+    Args:
+        points: [(x, y), ...]，按 x 升序
+
+    Returns:
+        float: 斜率，样本不足时返回 None
+    """
+    slopes = []
+    for i, (x1, y1) in enumerate(points):
+        for x2, y2 in points[i + 1:]:
+            if x2 > x1:
+                slopes.append((y2 - y1) / (x2 - x1))
+    if not slopes:
+        return None
+    slopes.sort()
+    mid = len(slopes) // 2
+    if len(slopes) % 2:
+        return slopes[mid]
+    return (slopes[mid - 1] + slopes[mid]) / 2
+
+
+class _DecayedRegression:
+    """指数衰减加权的增量最小二乘"""
+
+    __slots__ = ('t0', 'y0', 'last_ts', 'n', 'sw', 'sx', 'sy', 'sxx', 'sxy')
+
+    def __init__(self, t0, y0):
+        # 以首个样本为原点，避免时间戳和字节数过大造成精度损失
+        self.t0 = t0
+        self.y0 = y0
+        self.last_ts = None
+        self.n = 0
+        self.sw = self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def add(self, ts, value, half_life_days):
+        x = (ts - self.t0) / DAY
+        y = value - self.y0
+        if self.last_ts is not None:
+            decay = 0.5 ** (((ts - self.last_ts) / DAY) / half_life_days)
+            self.sw *= decay
+            self.sx *= decay
+            self.sy *= decay
+            self.sxx *= decay
+            self.sxy *= decay
+        self.sw += 1.0
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+        self.last_ts = ts
+        self.n += 1
+
+    def slope(self):
+        """每天的增长量，样本不足时返回 None"""
+        denom = self.sw * self.sxx - self.sx * self.sx
+        if self.n < 2 or denom <= 1e-12:
+            return None
+        return (self.sw * self.sxy - self.sx * self.sy) / denom
+
+
+class CapacityForecaster:
+    """存储卷容量采样与写满预测"""
+
+    def __init__(self, store, volumes=None, half_life_days=None, robust_samples=None):
+        self.store = store
+        self.volumes = volumes if volumes is not None else load_volume_mounts()
+        self.half_life_days = half_life_days or NAS_FORECAST_HALF_LIFE_DAYS
+        self.robust_samples = robust_samples or NAS_FORECAST_ROBUST_SAMPLES
+        self._lock = threading.Lock()
+        self._regressions = {}
+
+    # ========== 采样 ==========
+
+    def sample(self, now=None):
+        """
+        采样所有已挂载存储卷的容量
+
+        Returns:
+            list: [{'volume', 'used', 'total'}, ...]
+        """
+        now = now or time.time()
+        samples = []
+        results = []
+        for volume_id, root in self.volumes.items():
+            if not os.path.isdir(root):
+                continue
+            try:
+                usage = shutil.disk_usage(root)
+            except OSError as e:
+                logger.warning(f"Capacity sample failed for {volume_id}: {e}")
+                continue
+            samples.append((used_series(volume_id), usage.used, now))
+            samples.append((total_series(volume_id), usage.total, now))
+            results.append({'volume': volume_id, 'used': usage.used, 'total': usage.total})
+
+        if samples:
+            self.store.record_many(samples)
+        return results
+
+    # ========== 预测 ==========
+
+    def _linear_slope(self, volume_id):
+        """折叠新增样本并返回衰减加权线性斜率"""
+        series = used_series(volume_id)
+        with self._lock:
+            regression = self._regressions.get(volume_id)
+            since = regression.last_ts if regression else None
+            for ts, value in self.store.query(series, since=since):
+                if regression is None:
+                    regression = _DecayedRegression(ts, value)
+                    self._regressions[volume_id] = regression
+                regression.add(ts, value, self.half_life_days)
+            return regression.slope() if regression else None
+
+    def forecast(self, volume_id, now=None):
+        """
+        估算存储卷写满时间
+
+        Returns:
+            dict: 当前容量、每日增长量及剩余天数，样本不足时剩余天数为 None
+        """
+        now = now or time.time()
+        latest_used = self.store.latest(used_series(volume_id))
+        latest_total = self.store.latest(total_series(volume_id))
+        recent = self.store.query(used_series(volume_id), limit=self.robust_samples)
+
+        result = {
+            'volume': volume_id,
+            'samples': len(recent),
+            'used': latest_used[1] if latest_used else None,
+            'total': latest_total[1] if latest_total else None,
+            'sampledAt': _isoformat(latest_used[0]) if latest_used else None,
+            'growthPerDay': {'linear': None, 'robust': None},
+            'daysUntilFull': {'linear': None, 'robust': None},
+            'daysUntilFullEstimate': None,
+            'fullAt': None,
+            'method': None
+        }
+        if len(recent) < NAS_FORECAST_MIN_SAMPLES or not latest_total:
+            return result
+
+        t0 = recent[0][0]
+        robust = theil_sen_slope([((ts - t0) / DAY, value) for ts, value in recent])
+        linear = self._linear_slope(volume_id)
+
+        remaining = max(latest_total[1] - latest_used[1], 0)
+        # 预测基准从最后一次采样算起，扣除已过去的时间
+        elapsed_days = (now - latest_used[0]) / DAY
+        for method, slope in (('linear', linear), ('robust', robust)):
+            if slope is None:
+                continue
+            result['growthPerDay'][method] = round(slope)
+            if slope > 0:
+                result['daysUntilFull'][method] = round(max(remaining / slope - elapsed_days, 0), 1)
+
+        for method in ('robust', 'linear'):
+            days = result['daysUntilFull'][method]
+            if days is not None:
+                result['method'] = method
+                result['daysUntilFullEstimate'] = days
+                result['fullAt'] = _isoformat(now + days * DAY)
+                break
+        return result
+
+    def history(self, volume_id, since=None, limit=500):
+        """获取容量采样历史"""
+        return [
+            {'timestamp': _isoformat(ts), 'used': value}
+            for ts, value in self.store.query(used_series(volume_id), since=since, limit=limit)
+        ]
+
+
+def _isoformat(ts):
+    return datetime.fromtimestamp(ts).isoformat()
+
+
+_forecaster = None
+_forecaster_lock = threading.Lock()
+
+
+def get_capacity_forecaster():
+    """获取全局容量预测器"""
+    global _forecaster
+    if _forecaster is None:
+        with _forecaster_lock:
+            if _forecaster is None:
+                _forecaster = CapacityForecaster(get_metrics_store())
+    return _forecaster
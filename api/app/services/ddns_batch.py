@@ -0,0 +1,324 @@
+"""
+DDNS 批量更新模块
+按主域名（zone）分组，每个 zone 只拉取一次解析记录，只对值变化的 A/AAAA 记录并发调用写接口；
+并发数有上限，每个服务商有独立的自适应限速器：被限流时降低速率并退避重试，之后逐步恢复
+"""
+
+import os
+import time
+import logging
+import ipaddress
+import threading
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .alidns import AlidnsError, alidns_configured, get_alidns_client
+from .ipv6_prefix import get_ipv6_tracker, warn_missing_ipv6
+
+logger = logging.getLogger(__name__)
+
+ALIYUN_DOMAIN = os.getenv('ALIYUN_DOMAIN', '0379.email')
+ALIYUN_SUB_DOMAIN = os.getenv('ALIYUN_SUB_DOMAIN', 'ddns')
+ALIYUN_TTL = os.getenv('ALIYUN_TTL', '600')
+
+# 需要跟随公网IP的记录，逗号分隔的 rr@domain[:type]，如 ddns@0379.email:A,mail.ddns@0379.email
+DDNS_RECORDS = os.getenv('DDNS_RECORDS', f'{ALIYUN_SUB_DOMAIN}@{ALIYUN_DOMAIN}:A')
+# 同时进行的写请求数
+DDNS_BATCH_CONCURRENCY = int(os.getenv('DDNS_BATCH_CONCURRENCY', '8'))
+# Alidns 写接口的速率（次/秒）和突发量
+ALIDNS_RATE_LIMIT = float(os.getenv('ALIDNS_RATE_LIMIT', '10'))
+ALIDNS_RATE_BURST = int(os.getenv('ALIDNS_RATE_BURST', '5'))
+# 被限流后的最大重试次数
+DDNS_THROTTLE_RETRIES = int(os.getenv('DDNS_THROTTLE_RETRIES', '5'))
+
+# 跟随公网IP的记录类型
+ADDRESS_TYPES = ('A', 'AAAA')
+
+DdnsTarget = namedtuple('DdnsTarget', ['domain', 'rr', 'type', 'ttl'])
+
+
+def parse_targets(spec=None, ttl=None):
+    """
+    解析记录配置
+
+    Args:
+        spec: rr@domain[:type] 逗号分隔列表（默认 DDNS_RECORDS），type 默认为 A
+
+    Returns:
+        list: DdnsTarget 列表（去重，保持顺序）
+    """
+    ttl = ttl or ALIYUN_TTL
+    targets = OrderedDict()
+    for item in (spec if spec is not None else DDNS_RECORDS).split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, record_type = item.partition(':')
+        rr, sep, domain = name.rpartition('@')
+        if not sep or not rr or not domain:
+            raise ValueError(f'invalid DDNS record {item!r}, expected rr@domain[:type]')
+        record_type = (record_type or 'A').upper()
+        if record_type not in ADDRESS_TYPES:
+            raise ValueError(f'unsupported DDNS record type {record_type!r} in {item!r}')
+        target = DdnsTarget(domain.lower(), rr, record_type, ttl)
+        targets[target[:3]] = target
+    return list(targets.values())
+
+
+def targets_from_dicts(items):
+    """从请求体构建记录列表，items 为 [{'domain', 'rr', 'type', 'ttl'}]"""
+    targets = []
+    for item in items:
+        record_type = str(item.get('type', 'A')).upper()
+        if not item.get('domain') or not item.get('rr'):
+            raise ValueError('each record requires domain and rr')
+        if record_type not in ADDRESS_TYPES:
+            raise ValueError(f'unsupported DDNS record type: {record_type}')
+        targets.append(DdnsTarget(item['domain'].lower(), item['rr'], record_type, item.get('ttl') or ALIYUN_TTL))
+    return targets
+
+
+def validate_address(value, record_type):
+    """
+    校验记录值是否为对应版本的公网地址
+
+    Args:
+        value: 地址文本
+        record_type: A（IPv4）或 AAAA（IPv6）
+
+    Returns:
+        str: 规范化后的地址
+
+    Raises:
+        ValueError: 地址格式错误、版本不符或不是公网地址
+    """
+    version = 4 if record_type == 'A' else 6
+    try:
+        address = ipaddress.ip_address(str(value).strip())
+    except ValueError:
+        raise ValueError(f'invalid IPv{version} address: {value!r}')
+    if address.version != version:
+        raise ValueError(f'{value} is not an IPv{version} address')
+    if not address.is_global:
+        raise ValueError(f'{value} is not a public address')
+    return str(address)
+
+
+class AdaptiveRateLimiter:
+    """令牌桶限速器；被限流时速率减半，之后每次成功逐步恢复到上限"""
+
+    def __init__(self, rate, burst=1, min_rate=0.5):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min_rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0
+        self._lock = threading.Lock()
+        self.throttle_count = 0
+
+    def acquire(self):
+        """阻塞直到获得一个令牌"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def throttled(self, backoff):
+        """服务商返回限流：降低速率并暂停 backoff 秒"""
+        with self._lock:
+            self.throttle_count += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + backoff)
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider):
+    """获取服务商的全局限速器（同一进程内所有批量更新共用）"""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            if provider == 'aliyun':
+                limiter = AdaptiveRateLimiter(ALIDNS_RATE_LIMIT, ALIDNS_RATE_BURST)
+            else:
+                limiter = AdaptiveRateLimiter(5, 1)
+            _limiters[provider] = limiter
+        return limiter
+
+
+class BatchUpdater:
+    """DDNS 批量更新器"""
+
+    def __init__(self, client=None, provider='aliyun', concurrency=None, limiter=None, retries=None):
+        self.client = client or get_alidns_client()
+        self.provider = provider
+        self.concurrency = concurrency or DDNS_BATCH_CONCURRENCY
+        self.limiter = limiter or get_rate_limiter(provider)
+        self.retries = DDNS_THROTTLE_RETRIES if retries is None else retries
+
+    def _call(self, func, *args, **kwargs):
+        """限速调用，被限流时退避重试"""
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except AlidnsError as e:
+                if not e.throttled or attempt >= self.retries:
+                    raise
+                attempt += 1
+                backoff = min(30, 0.5 * 2 ** attempt)
+                logger.warning(f"{self.provider} throttled ({e.code}), retry {attempt} in {backoff}s")
+                self.limiter.throttled(backoff)
+                continue
+            self.limiter.succeeded()
+            return result
+
+    def _sync(self, target, value, existing):
+        """同步单条记录，结果附带耗时（毫秒）"""
+        start = time.perf_counter()
+        try:
+            # 只传入该记录本身，sync_record 不再重复拉取
+            result = self._call(self.client.sync_record, target.domain, target.rr, target.type, value, target.ttl,
+                                [existing] if existing else [])
+        except AlidnsError as e:
+            result = _result(target, value, action='failed', error=str(e),
+                             oldValue=existing.get('Value') if existing else None)
+        result['latency'] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    def update(self, targets, addresses, overrides=None):
+        """
+        将记录更新为当前地址
+
+        Args:
+            targets: DdnsTarget 列表
+            addresses: {'A': IPv4, 'AAAA': IPv6}，缺少某类型地址时跳过该类型记录
+            overrides: 单条记录的地址 {(domain, rr, type): 地址}（如按 IPv6 前缀计算的局域网主机地址）
+
+        Returns:
+            dict: {'action', 'results', 'summary', 'duration'}，action 为 unchanged/updated/partial/failed
+        """
+        start = time.perf_counter()
+        overrides = overrides or {}
+        values = {}
+        results = []
+        zones = OrderedDict()
+        for target in targets:
+            value = overrides.get(target[:3]) or addresses.get(target.type)
+            if value:
+                values[target[:3]] = value
+                zones.setdefault(target.domain, []).append(target)
+            else:
+                results.append(_result(target, None, action='skipped', error=f'no {target.type} address'))
+
+        workers = max(1, min(self.concurrency, len(targets)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ddns-batch') as pool:
+            # 每个 zone 只拉取一次解析记录
+            fetched = {
+                domain: pool.submit(self._call, self.client.describe_domain_records, domain)
+                for domain in zones
+            }
+            pending = []
+            for domain, zone_targets in zones.items():
+                try:
+                    records = fetched[domain].result()
+                except AlidnsError as e:
+                    results.extend(_result(t, values[t[:3]], action='failed', error=str(e)) for t in zone_targets)
+                    continue
+                for target in zone_targets:
+                    value = values[target[:3]]
+                    existing = _find(records, target)
+                    if existing and existing.get('Value') == value and int(existing.get('TTL', 0)) == int(target.ttl):
+                        results.append(_result(target, value, action='unchanged', oldValue=value,
+                                               recordId=existing.get('RecordId')))
+                    else:
+                        pending.append(pool.submit(self._sync, target, value, existing))
+            results.extend(future.result() for future in pending)
+
+        summary = {}
+        for result in results:
+            summary[result['action']] = summary.get(result['action'], 0) + 1
+        changed = summary.get('updated', 0) + summary.get('created', 0)
+        if summary.get('failed'):
+            action = 'partial' if changed or summary.get('unchanged') else 'failed'
+        else:
+            action = 'updated' if changed else 'unchanged'
+        return {
+            'action': action,
+            'results': results,
+            'summary': summary,
+            'duration': round((time.perf_counter() - start) * 1000, 1)
+        }
+
+
+def _find(records, target):
+    return next((r for r in records if r.get('RR') == target.rr and r.get('Type') == target.type), None)
+
+
+def _result(target, value, **fields):
+    result = {'domain': target.domain, 'rr': target.rr, 'type': target.type, 'value': value,
+              'oldValue': None, 'recordId': None}
+    result.update(fields)
+    return result
+
+
+def sync_configured_records(addresses, targets=None, ipv6=None):
+    """
+    更新 DDNS_RECORDS 和 DDNS_IPV6_HOSTS 中的全部记录，A 和 AAAA 在同一批中完成（守护进程和 /ddns/update 使用）
+
+    Args:
+        addresses: {'A': IPv4, 'AAAA': IPv6}，也可直接传入 IPv4 字符串；未给出 AAAA 时读取本机网卡
+        ipv6: Ipv6PrefixTracker.snapshot() 的结果（调用方已读取时传入，避免重复读取）
+    """
+    if isinstance(addresses, str):
+        addresses = {'A': addresses}
+    if not alidns_configured():
+        return {'action': 'skipped', 'reason': 'Aliyun access key not configured', 'results': [], 'summary': {}}
+
+    targets = list(targets or parse_targets())
+    overrides = {}
+    tracker = get_ipv6_tracker()
+    if 'AAAA' not in addresses and (tracker.hosts or any(t.type == 'AAAA' for t in targets)):
+        ipv6 = ipv6 or tracker.snapshot()
+        addresses = dict(addresses, AAAA=ipv6['address'])
+        overrides = ipv6['hosts']
+        known = {t[:3] for t in targets}
+        targets.extend(DdnsTarget(domain, rr, record_type, ALIYUN_TTL)
+                       for domain, rr, record_type in overrides if (domain, rr, record_type) not in known)
+        if ipv6['address'] is None:
+            missing = len(tracker.hosts) - len(overrides) + \
+                sum(1 for t in targets if t.type == 'AAAA' and t[:3] not in overrides)
+            if missing:
+                warn_missing_ipv6(missing)
+    return get_batch_updater().update(targets, addresses, overrides)
+
+
+_updater = None
+_updater_lock = threading.Lock()
+
+
+def get_batch_updater():
+    """获取全局批量更新器"""
+    global _updater
+    if _updater is None:
+        with _updater_lock:
+            if _updater is None:
+                _updater = BatchUpdater()
+    return _updater
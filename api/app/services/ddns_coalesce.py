@@ -0,0 +1,295 @@
+"""
+DDNS 更新请求合并模块
+合并键由记录标识 (domain, rr, type) 组成：/ddns/update、/ddns/update/batch、Celery tasks.ddns_update 和
+DDNS 守护进程对同一组记录的并发更新只执行一次，目标值相同（或调用方不指定值）的调用等待并共享结果，
+目标值不同的调用等进行中的更新结束后再执行；
+进程内用 Event 合并，配置了 Redis 时再用 SET NX 锁跨 gunicorn worker / Celery worker / 守护进程合并，
+结果短时写入 Redis 供其他进程读取；可选的短暂延迟让 IP 抖动期间的多次触发合并成一次更新。
+所有路径的结果格式相同：{'ip', 'update': {'action', 'results', 'summary', ...}}
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+
+from .ddns_batch import parse_targets, sync_configured_records
+from .ddns_history import record_update
+from .dns_propagation import DNS_PROPAGATION_WATCH, get_propagation_checker
+from .ipv6_prefix import get_ipv6_tracker
+from .public_ip import get_public_ip_detector
+
+try:
+    import redis
+    redis_available = True
+except ImportError:
+    redis_available = False
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv('REDIS_URL', '')
+# 领头请求执行前的等待时间（秒），期间到达的请求直接合并
+DDNS_COALESCE_DELAY = float(os.getenv('DDNS_COALESCE_DELAY', '1'))
+# 跨进程锁的过期时间和等待上限（秒）
+DDNS_COALESCE_LOCK_TTL = float(os.getenv('DDNS_COALESCE_LOCK_TTL', '60'))
+DDNS_COALESCE_WAIT = float(os.getenv('DDNS_COALESCE_WAIT', '60'))
+# 结果在 Redis 中的保留时间（秒）
+RESULT_TTL = 30
+KEY_PREFIX = 'ddns:flight:'
+
+# 仅在持有者匹配时删除锁
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def record_key(domain, rr, record_type):
+    """单条记录的标识"""
+    return f'{domain.lower()}/{rr}/{record_type.upper()}'
+
+
+def records_key(records):
+    """
+    一组记录的合并键
+
+    Args:
+        records: [(domain, rr, type, ...)]，如 DdnsTarget 列表
+    """
+    return 'records:' + ','.join(sorted({record_key(*record[:3]) for record in records}))
+
+
+def configured_records():
+    """DDNS_RECORDS 与 DDNS_IPV6_HOSTS 中的全部记录 [(domain, rr, type)]（守护进程和 /ddns/update 共用）"""
+    records = [target[:3] for target in parse_targets()]
+    records.extend((host['domain'], host['rr'], 'AAAA') for host in get_ipv6_tracker().hosts)
+    return records
+
+
+def address_value(records, addresses):
+    """
+    合并用的目标值：只取这组记录涉及的类型，不同路径对同一组记录、同一地址的更新得到相同的值
+
+    Args:
+        addresses: {'A': IPv4, 'AAAA': IPv6}
+    """
+    return [[record_type, addresses.get(record_type)] for record_type in sorted({r[2].upper() for r in records})]
+
+
+def _value_tag(value):
+    return json.dumps(value, default=str)
+
+
+# 不指定目标值的调用可复用任意结果
+ANY_VALUE = _value_tag(None)
+
+
+class _Flight:
+    def __init__(self, value=None):
+        self.value = value
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.joined = 0
+
+
+class UpdateCoalescer:
+    """更新请求合并器"""
+
+    def __init__(self, redis_client=None, lock_ttl=None, wait_timeout=None):
+        self.redis = redis_client
+        self.lock_ttl = lock_ttl or DDNS_COALESCE_LOCK_TTL
+        self.wait_timeout = wait_timeout or DDNS_COALESCE_WAIT
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.stats = {'executed': 0, 'coalesced': 0, 'remote': 0}
+
+    def run(self, key, func, delay=0, value=None):
+        """
+        执行或加入同一 key 的进行中更新
+
+        Args:
+            key: 合并键（records_key()）
+            func: 无参数的更新函数，返回值需可 JSON 序列化（跨进程共享）
+            delay: 领头请求执行前的等待时间（秒）
+            value: 目标值（address_value()）；进行中的更新目标值不同时等待其结束后再执行，None 表示接受任意值
+
+        Returns:
+            tuple: (结果, 是否为合并结果)
+        """
+        tag = _value_tag(value)
+        while True:
+            with self._lock:
+                flight = self._flights.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._flights[key] = _Flight(tag)
+                    break
+                if value is None or flight.value == tag:
+                    flight.joined += 1
+                    break
+            if not flight.event.wait(self.wait_timeout + delay):
+                raise TimeoutError(f'timed out waiting for in-flight DDNS update {key}')
+
+        if not leader:
+            if not flight.event.wait(self.wait_timeout + delay):
+                raise TimeoutError(f'timed out waiting for in-flight DDNS update {key}')
+            with self._lock:
+                self.stats['coalesced'] += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            if delay:
+                time.sleep(delay)
+            flight.result, coalesced = self._run_shared(key, func, tag)
+            return flight.result, coalesced
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _run_shared(self, key, func, tag=ANY_VALUE):
+        """跨进程合并：持有 Redis 锁的进程执行，其余进程等待其结果（只复用目标值相同的结果）"""
+        if self.redis is None:
+            return self._execute(func), False
+
+        lock_key = f'{KEY_PREFIX}{key}:lock'
+        result_key = f'{KEY_PREFIX}{key}:result'
+        token = uuid.uuid4().hex
+        started = time.time()
+        deadline = time.monotonic() + self.wait_timeout
+        try:
+            while True:
+                if self.redis.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000)):
+                    break
+                # 其他进程正在更新：等待其完成后复用结果
+                while self.redis.exists(lock_key) and time.monotonic() < deadline:
+                    time.sleep(0.1)
+                shared = self._read_result(result_key, started, tag)
+                if shared is not None:
+                    with self._lock:
+                        self.stats['remote'] += 1
+                    return shared, True
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f'timed out waiting for DDNS update lock {key}')
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Redis unavailable for DDNS coalescing, running locally: {e}")
+            return self._execute(func), False
+
+        try:
+            result = self._execute(func)
+            try:
+                payload = {'finishedAt': time.time(), 'value': tag, 'result': result}
+                self.redis.set(result_key, json.dumps(payload, default=str), ex=RESULT_TTL)
+            except (redis.exceptions.RedisError, TypeError) as e:
+                logger.warning(f"Cannot share DDNS update result: {e}")
+            return result, False
+        finally:
+            try:
+                self.redis.eval(RELEASE_SCRIPT, 1, lock_key, token)
+            except redis.exceptions.RedisError as e:
+                logger.warning(f"Cannot release DDNS update lock: {e}")
+
+    def _read_result(self, result_key, since, tag=ANY_VALUE):
+        """读取在 since 之后完成、目标值相同的共享结果"""
+        raw = self.redis.get(result_key)
+        if not raw:
+            return None
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return None
+        if tag != ANY_VALUE and data.get('value') != tag:
+            return None
+        return data['result'] if data.get('finishedAt', 0) >= since else None
+
+    def _execute(self, func):
+        with self._lock:
+            self.stats['executed'] += 1
+        return func()
+
+    def inflight(self):
+        """进程内进行中的更新 {key: 等待者数量}"""
+        with self._lock:
+            return {key: flight.joined for key, flight in self._flights.items()}
+
+
+def _create_redis_client():
+    if not (redis_available and REDIS_URL):
+        return None
+    try:
+        return redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+    except (redis.exceptions.RedisError, ValueError) as e:
+        logger.warning(f"Redis client unavailable for DDNS coalescing: {e}")
+        return None
+
+
+def update_configured_records(source, delay=None):
+    """
+    重新检测公网IP并更新 DDNS_RECORDS 中的全部记录；与守护进程等对同一组记录的并发更新合并为一次（/ddns/update 使用）
+
+    Returns:
+        tuple: ({'ip', 'update'}, 是否为合并结果)
+
+    Raises:
+        RuntimeError: 公网IP检测失败
+    """
+    def _update():
+        # 在等待窗口之后检测，抖动期间的多个IP只会更新最后一个
+        ip = get_public_ip_detector().get(force=True)['ip']
+        if ip is None:
+            raise RuntimeError('public IP detection failed')
+        update = sync_configured_records(ip)
+        record_update(update.get('results'), source)
+        if DNS_PROPAGATION_WATCH:
+            get_propagation_checker().watch_results(update.get('results'))
+        return {'ip': ip, 'update': update}
+
+    return get_update_coalescer().run(records_key(configured_records()), _update,
+                                      DDNS_COALESCE_DELAY if delay is None else delay)
+
+
+def sync_addresses(ip, ipv6, source):
+    """
+    将 DDNS_RECORDS 与 DDNS_IPV6_HOSTS 更新为指定地址（守护进程使用）；与 /ddns/update 等的并发更新合并
+
+    Args:
+        ip: IPv4 地址
+        ipv6: Ipv6PrefixTracker.snapshot() 的结果
+
+    Returns:
+        tuple: ({'ip', 'update'}, 是否为合并结果)
+    """
+    def _update():
+        update = sync_configured_records(ip, ipv6=ipv6)
+        record_update(update.get('results'), source)
+        if DNS_PROPAGATION_WATCH:
+            get_propagation_checker().watch_results(update.get('results'))
+        return {'ip': ip, 'update': update}
+
+    records = configured_records()
+    value = address_value(records, {'A': ip, 'AAAA': ipv6['address']})
+    return get_update_coalescer().run(records_key(records), _update, value=value)
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_update_coalescer():
+    """获取全局更新合并器"""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = UpdateCoalescer(_create_redis_client())
+    return _coalescer
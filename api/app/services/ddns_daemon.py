@@ -0,0 +1,394 @@
+"""
+DDNS 常驻守护进程
+基于 asyncio：通过 netlink 监听网卡地址/链路变化（不支持时轮询网卡地址）即时触发检测，
+并保留周期性检测兜底；短时间内的多次触发合并为一次更新（去抖）；
+运行状态和计数通过本地 Unix socket 提供给 Flask 接口读取
+
+运行: python -m app.services.ddns_daemon
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import logging
+import threading
+
+from .alidns import AlidnsError
+from .ddns_coalesce import sync_addresses
+from .ipv6_prefix import get_ipv6_tracker
+from .public_ip import get_public_ip_detector
+
+try:
+    import psutil
+    psutil_available = True
+except ImportError:
+    psutil_available = False
+
+logger = logging.getLogger(__name__)
+
+# 本地 socket、兜底检测周期（秒）、去抖窗口（秒）、网卡轮询周期（秒，netlink 不可用时）
+DDNS_DAEMON_SOCKET = os.getenv('DDNS_DAEMON_SOCKET', '/app/data/ddns.sock')
+DDNS_CHECK_INTERVAL = float(os.getenv('DDNS_CHECK_INTERVAL', os.getenv('DDNS_UPDATE_INTERVAL', '300')))
+DDNS_DEBOUNCE_SECONDS = float(os.getenv('DDNS_DEBOUNCE_SECONDS', '2'))
+DDNS_IFACE_POLL_INTERVAL = float(os.getenv('DDNS_IFACE_POLL_INTERVAL', '5'))
+# 连续失败后的重试间隔上限（秒）
+DDNS_RETRY_MAX = float(os.getenv('DDNS_RETRY_MAX', '300'))
+
+# netlink 组：链路、IPv4 地址、IPv6 地址变化
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV6_IFADDR = 0x100
+
+
+def sync_dual_stack(ip, ipv6):
+    """A 和 AAAA 记录在同一批中更新（与 API / Celery 的并发更新合并，并记录更新历史）"""
+    shared, _ = sync_addresses(ip, ipv6, 'daemon')
+    return shared['update']
+
+
+class DdnsDaemon:
+    """DDNS 守护进程"""
+
+    def __init__(self, detector=None, updater=None, socket_path=None, check_interval=None, debounce=None,
+                 iface_poll_interval=None, ipv6_tracker=None):
+        """
+        Args:
+            detector: 公网IP检测器（需提供 get(force=True)）
+            updater: 更新回调 updater(ip, ipv6) -> dict（默认批量更新 DDNS_RECORDS 和 DDNS_IPV6_HOSTS，
+                     更新历史和传播检查由回调负责）
+            ipv6_tracker: IPv6 前缀跟踪器
+        """
+        self.detector = detector or get_public_ip_detector()
+        self.updater = updater or sync_dual_stack
+        self.ipv6_tracker = ipv6_tracker or get_ipv6_tracker()
+        self.socket_path = socket_path or DDNS_DAEMON_SOCKET
+        self.check_interval = check_interval or DDNS_CHECK_INTERVAL
+        self.debounce = DDNS_DEBOUNCE_SECONDS if debounce is None else debounce
+        self.iface_poll_interval = iface_poll_interval or DDNS_IFACE_POLL_INTERVAL
+
+        self.state = {
+            'startedAt': None,
+            'ip': None,
+            'ipSource': None,
+            'ipv6': None,
+            'ipv6Prefixes': {},
+            'lastCheck': None,
+            'lastChange': None,
+            'lastUpdate': None,
+            'lastResult': None,
+            'lastError': None,
+            'nextCheck': None,
+            'watcher': None
+        }
+        self.metrics = {
+            'checks': 0,
+            'changes': 0,
+            'updates': 0,
+            'errors': 0,
+            'triggers': {},
+            'lastCheckDuration': None
+        }
+        self._trigger = None
+        self._pending_reasons = set()
+        self._waiters = []
+        self._failures = 0
+        self._stopping = None
+
+    # ========== 触发与去抖 ==========
+
+    def trigger(self, reason):
+        """请求一次检测（去抖窗口内的多次触发合并）"""
+        self.metrics['triggers'][reason] = self.metrics['triggers'].get(reason, 0) + 1
+        self._pending_reasons.add(reason)
+        self._trigger.set()
+
+    async def _update_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._trigger.wait()
+            if self.debounce:
+                await asyncio.sleep(self.debounce)
+            self._trigger.clear()
+            reasons = sorted(self._pending_reasons)
+            self._pending_reasons.clear()
+            waiters, self._waiters = self._waiters, []
+
+            try:
+                result = await loop.run_in_executor(None, self._check, reasons)
+            except Exception as e:
+                logger.exception(f"DDNS check crashed: {e}")
+                result = {'reasons': reasons, 'error': str(e)}
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(result)
+
+    def _check(self, reasons):
+        """检测公网IP，变化（或上次更新失败）时调用更新回调；在线程池中执行"""
+        start = time.time()
+        self.metrics['checks'] += 1
+        self.state['lastCheck'] = start
+        result = {'reasons': reasons, 'ip': None, 'changed': False, 'update': None, 'error': None}
+        try:
+            detected = self.detector.get(force=True)
+            ip = detected['ip']
+            result['ip'] = ip
+            if ip is None:
+                raise RuntimeError(f"public IP detection failed: {detected.get('errors')}")
+
+            # IPv6 只读本机网卡，与 IPv4 一起判断是否变化
+            ipv6 = self.ipv6_tracker.snapshot()
+            prefixes = {name: info['prefix'] for name, info in ipv6['interfaces'].items()}
+            result['ipv6'] = ipv6['address']
+
+            changed = ip != self.state['ip'] or ipv6['address'] != self.state['ipv6'] or \
+                prefixes != self.state['ipv6Prefixes']
+            result['changed'] = changed
+            if changed:
+                self.metrics['changes'] += 1
+                self.state['lastChange'] = start
+                logger.info(f"Public address changed: {self.state['ip']}/{self.state['ipv6']} -> "
+                            f"{ip}/{ipv6['address']} ({', '.join(reasons)})")
+            self.state['ip'] = ip
+            self.state['ipSource'] = detected['source']
+            self.state['ipv6'] = ipv6['address']
+            self.state['ipv6Prefixes'] = prefixes
+
+            # 地址未变化且上次更新成功时不调用更新接口
+            if changed or self._failures or self.state['lastUpdate'] is None:
+                update = self.updater(ip, ipv6)
+                result['update'] = update
+                self.metrics['updates'] += 1
+                self.state['lastUpdate'] = time.time()
+                self.state['lastResult'] = update
+                logger.info(f"DDNS sync {ip}: {_summarize(update)}")
+                # 部分记录失败时保留失败状态，下次检测重试
+                if isinstance(update, dict) and update.get('action') in ('failed', 'partial'):
+                    raise RuntimeError(f"DDNS update {update['action']}: {update.get('summary')}")
+            self._failures = 0
+            self.state['lastError'] = None
+        except (AlidnsError, RuntimeError, OSError) as e:
+            self._failures += 1
+            self.metrics['errors'] += 1
+            self.state['lastError'] = {'time': time.time(), 'message': str(e)}
+            result['error'] = str(e)
+            logger.error(f"DDNS check failed ({self._failures}): {e}")
+        self.metrics['lastCheckDuration'] = round(time.time() - start, 3)
+        return result
+
+    async def _periodic_loop(self):
+        """周期性兜底检测；失败后按指数退避提前重试"""
+        while True:
+            if self._failures:
+                delay = min(self.check_interval, DDNS_RETRY_MAX, 5 * 2 ** (self._failures - 1))
+            else:
+                delay = self.check_interval
+            self.state['nextCheck'] = time.time() + delay
+            await asyncio.sleep(delay)
+            self.trigger('retry' if self._failures else 'periodic')
+
+    # ========== 网卡变化监听 ==========
+
+    async def _watch_netlink(self):
+        """通过 netlink 监听地址/链路变化"""
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR))
+        sock.setblocking(False)
+        loop = asyncio.get_running_loop()
+        self.state['watcher'] = 'netlink'
+        try:
+            while True:
+                await loop.sock_recv(sock, 65536)
+                self.trigger('netlink')
+        finally:
+            sock.close()
+
+    async def _watch_polling(self):
+        """轮询网卡地址（netlink 不可用时）"""
+        self.state['watcher'] = 'polling'
+        previous = _interface_fingerprint()
+        while True:
+            await asyncio.sleep(self.iface_poll_interval)
+            current = _interface_fingerprint()
+            if current != previous:
+                previous = current
+                self.trigger('interface')
+
+    async def _watch_interfaces(self):
+        if hasattr(socket, 'AF_NETLINK'):
+            try:
+                await self._watch_netlink()
+                return
+            except OSError as e:
+                logger.warning(f"netlink unavailable, falling back to polling: {e}")
+        if psutil_available:
+            await self._watch_polling()
+        else:
+            self.state['watcher'] = None
+
+    # ========== 本地 socket ==========
+
+    async def _handle_client(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), timeout=5)
+            try:
+                request = json.loads(line or b'{}')
+            except ValueError:
+                request = {}
+            command = request.get('cmd', 'status')
+            if command == 'status':
+                response = self.status()
+            elif command == 'check':
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                self.trigger('manual')
+                result = await asyncio.wait_for(waiter, timeout=request.get('timeout', 30))
+                response = dict(self.status(), check=result)
+            else:
+                response = {'error': f'unknown command: {command}'}
+            writer.write(json.dumps(response, default=str).encode('utf-8') + b'\n')
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"Socket client error: {e}")
+        finally:
+            writer.close()
+
+    def status(self):
+        return {'state': dict(self.state), 'metrics': dict(self.metrics, triggers=dict(self.metrics['triggers']))}
+
+    # ========== 运行 ==========
+
+    async def run(self):
+        self._trigger = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self.state['startedAt'] = time.time()
+
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"DDNS daemon listening on {self.socket_path}")
+
+        tasks = [
+            asyncio.create_task(self._update_loop()),
+            asyncio.create_task(self._periodic_loop()),
+            asyncio.create_task(self._watch_interfaces())
+        ]
+        self.trigger('startup')
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            server.close()
+            await server.wait_closed()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+
+def _interface_fingerprint():
+    """所有网卡地址的快照"""
+    return frozenset(
+        (name, addr.address)
+        for name, addrs in psutil.net_if_addrs().items()
+        for addr in addrs
+        if addr.family in (socket.AF_INET, socket.AF_INET6)
+    )
+
+
+def _summarize(update):
+    if not isinstance(update, dict):
+        return str(update)
+    if update.get('summary'):
+        return f"{update.get('action')} {update['summary']}"
+    return update.get('action') or json.dumps(update, default=str)[:200]
+
+
+class DdnsDaemonClient:
+    """守护进程本地 socket 客户端（供 Flask 接口使用）"""
+
+    def __init__(self, socket_path=None, timeout=2):
+        self.socket_path = socket_path or DDNS_DAEMON_SOCKET
+        self.timeout = timeout
+
+    def available(self):
+        return os.path.exists(self.socket_path)
+
+    def request(self, cmd, params=None, timeout=None):
+        """
+        发送命令
+
+        Returns:
+            dict: 守护进程响应，守护进程未运行时返回 None
+        """
+        if not self.available():
+            return None
+        timeout = timeout or self.timeout
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(json.dumps(dict(params or {}, cmd=cmd)).encode('utf-8') + b'\n')
+                chunks = []
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    if chunk.endswith(b'\n'):
+                        break
+            return json.loads(b''.join(chunks) or b'null')
+        except (OSError, ValueError) as e:
+            logger.debug(f"DDNS daemon unavailable: {e}")
+            return None
+
+    def status(self):
+        return self.request('status')
+
+    def check(self, timeout=30):
+        """触发一次立即检测并等待结果"""
+        return self.request('check', {'timeout': timeout}, timeout=timeout + 2)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ddns_daemon_client():
+    """获取全局守护进程客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DdnsDaemonClient()
+    return _client
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    daemon = DdnsDaemon()
+
+    async def _run():
+        import signal
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, daemon.stop)
+        await daemon.run()
+
+    asyncio.run(_run())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
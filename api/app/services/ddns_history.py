@@ -0,0 +1,292 @@
+"""
+DDNS 更新历史存储模块
+每次记录同步的结果作为一行追加到 SQLite（时间戳、域名、新旧IP、耗时、结果），
+按 (ts, id) 和 (domain, ts, id) 建索引，查询使用游标（keyset）分页，耗时只与页大小有关；
+同一数据库中保存 DNS 传播检测报告（每个 名称+类型 保留最新一份），守护进程、API 和 Celery worker 共享
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DDNS_LOG_PATH = os.getenv('DDNS_LOG_PATH', '/var/log/ddns.log')
+DDNS_HISTORY_DB_PATH = os.getenv('DDNS_HISTORY_DB_PATH', '/app/data/ddns_history.db')
+DDNS_HISTORY_RETENTION_DAYS = int(os.getenv('DDNS_HISTORY_RETENTION_DAYS', '365'))
+# 清理过期记录的周期（秒，由 Celery beat 调度，<= 0 表示不清理）
+DDNS_HISTORY_PRUNE_INTERVAL = int(os.getenv('DDNS_HISTORY_PRUNE_INTERVAL', '86400'))
+
+# 保留的传播检测报告数量
+PROPAGATION_MAX_REPORTS = 100
+
+# 同步结果 action 对应的历史状态
+FAILED_ACTIONS = ('failed',)
+
+COLUMNS = ('id', 'ts', 'domain', 'rr', 'zone', 'type', 'old_ip', 'new_ip', 'action', 'status', 'latency',
+           'error', 'source')
+
+
+class HistoryCursorError(ValueError):
+    """分页游标无效"""
+
+
+def encode_cursor(ts, row_id):
+    return f'{ts!r}_{row_id}'
+
+
+def decode_cursor(cursor):
+    try:
+        ts, row_id = cursor.rsplit('_', 1)
+        return float(ts), int(row_id)
+    except (AttributeError, ValueError):
+        raise HistoryCursorError(f'invalid cursor: {cursor!r}')
+
+
+class DdnsHistoryStore:
+    """DDNS 更新历史存储"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DDNS_HISTORY_DB_PATH
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ddns_updates (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL NOT NULL,
+                    domain TEXT NOT NULL,
+                    rr TEXT,
+                    zone TEXT,
+                    type TEXT,
+                    old_ip TEXT,
+                    new_ip TEXT,
+                    action TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    latency REAL,
+                    error TEXT,
+                    source TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ddns_updates_ts ON ddns_updates (ts, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ddns_updates_domain ON ddns_updates (domain, ts, id)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_ddns_updates_status ON ddns_updates (status, ts, id)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS propagation_reports (
+                    name TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    report TEXT NOT NULL,
+                    PRIMARY KEY (name, type)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_propagation_started ON propagation_reports (started_at)')
+
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def record_results(self, results, source=None, ts=None):
+        """
+        记录一批同步结果
+
+        Args:
+            results: 批量更新返回的 results（domain、rr、type、value、oldValue、action、latency、error）
+            source: 触发来源（daemon、api、task...）
+
+        Returns:
+            int: 写入的行数
+        """
+        ts = ts or time.time()
+        rows = []
+        for result in results:
+            if result['action'] == 'skipped':
+                continue
+            rr = result.get('rr')
+            zone = result.get('domain')
+            rows.append((
+                ts,
+                f'{rr}.{zone}' if rr and rr != '@' else zone,
+                rr, zone, result.get('type'),
+                result.get('oldValue'), result.get('value'),
+                result['action'],
+                'failed' if result['action'] in FAILED_ACTIONS else 'success',
+                result.get('latency'), result.get('error'), source
+            ))
+        if not rows:
+            return 0
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.executemany(
+                'INSERT INTO ddns_updates (ts, domain, rr, zone, type, old_ip, new_ip, action, status, latency, '
+                'error, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+        return len(rows)
+
+    def query(self, limit=20, cursor=None, domain=None, status=None, since=None, until=None):
+        """
+        按时间倒序查询历史
+
+        Args:
+            limit: 页大小
+            cursor: 上一页返回的 nextCursor
+            domain: 完整域名（如 ddns.0379.email）
+            status: success / failed
+            since: 起始时间戳（含）
+            until: 结束时间戳（含）
+
+        Returns:
+            dict: {'items': [...], 'nextCursor', 'hasMore'}
+
+        Raises:
+            HistoryCursorError: 游标无效
+        """
+        clauses = []
+        params = []
+        if domain:
+            clauses.append('domain = ?')
+            params.append(domain)
+        if status:
+            clauses.append('status = ?')
+            params.append(status)
+        if since is not None:
+            clauses.append('ts >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('ts <= ?')
+            params.append(until)
+        if cursor:
+            ts, row_id = decode_cursor(cursor)
+            clauses.append('(ts, id) < (?, ?)')
+            params.extend((ts, row_id))
+
+        sql = f'SELECT {", ".join(COLUMNS)} FROM ddns_updates'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY ts DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        rows = self._connect().execute(sql, params).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = [_to_item(dict(zip(COLUMNS, row))) for row in rows]
+        return {
+            'items': items,
+            'nextCursor': encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None,
+            'hasMore': has_more
+        }
+
+    def latest(self, domain=None):
+        """最近一条记录，没有数据时返回 None"""
+        items = self.query(limit=1, domain=domain)['items']
+        return items[0] if items else None
+
+    def prune(self, retention_days=None):
+        """删除超过保留时间的记录"""
+        cutoff = time.time() - (retention_days or DDNS_HISTORY_RETENTION_DAYS) * 86400
+        conn = self._connect()
+        with self._write_lock, conn:
+            return conn.execute('DELETE FROM ddns_updates WHERE ts < ?', (cutoff,)).rowcount
+
+    def save_propagation_report(self, report):
+        """保存（替换）传播检测报告，只保留最新的 PROPAGATION_MAX_REPORTS 份"""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO propagation_reports (name, type, started_at, report) VALUES (?, ?, ?, ?)',
+                (report['name'], report['type'], report['startedAt'], json.dumps(report, default=str))
+            )
+            conn.execute(
+                'DELETE FROM propagation_reports WHERE started_at < (SELECT started_at FROM propagation_reports '
+                'ORDER BY started_at DESC LIMIT 1 OFFSET ?)',
+                (PROPAGATION_MAX_REPORTS - 1,)
+            )
+
+    def propagation_reports(self, name=None):
+        """传播检测报告（按开始时间倒序）"""
+        sql = 'SELECT report FROM propagation_reports'
+        params = []
+        if name:
+            sql += ' WHERE name = ?'
+            params.append(name)
+        sql += ' ORDER BY started_at DESC'
+        return [json.loads(row[0]) for row in self._connect().execute(sql, params)]
+
+
+def _to_item(row):
+    if row['status'] == 'failed':
+        message = row['error'] or 'DDNS更新失败'
+    elif row['action'] == 'unchanged':
+        message = 'IP未变化，无需更新'
+    else:
+        message = 'IP已更新'
+    return {
+        'id': str(row['id']),
+        'timestamp': datetime.fromtimestamp(row['ts']).isoformat(),
+        'domain': row['domain'],
+        'type': row['type'],
+        'oldIP': row['old_ip'],
+        'newIP': row['new_ip'],
+        'action': row['action'],
+        'status': row['status'],
+        'latency': row['latency'],
+        'source': row['source'],
+        'message': message
+    }
+
+
+def record_update(results, source):
+    """
+    写入历史存储，并为每条记录追加一行更新日志（/ddns/logs 展示）
+
+    Args:
+        results: 批量更新返回的 results
+        source: 触发来源（daemon、api、task...）
+    """
+    results = [r for r in results or [] if r['action'] != 'skipped']
+    if not results:
+        return
+    try:
+        get_ddns_history_store().record_results(results, source=source)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Cannot record DDNS history: {e}")
+    now = datetime.now().isoformat()
+    lines = [
+        f"[{now}] DDNS更新: {r['rr']}.{r['domain']} -> {r['value']} "
+        f"({'success' if r['action'] == 'unchanged' else r['action']})\n"
+        for r in results
+    ]
+    try:
+        with open(DDNS_LOG_PATH, 'a') as f:
+            f.write(''.join(lines))
+    except OSError as e:
+        logger.debug(f"Cannot write DDNS log: {e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_ddns_history_store():
+    """获取全局 DDNS 历史存储"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DdnsHistoryStore()
+    return _store
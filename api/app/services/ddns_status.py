@@ -0,0 +1,286 @@
+"""
+DDNS 状态文件共享读取模块
+DDNS 脚本每次运行后重写 status.json（shell 重定向写入：先截断再写），
+后台线程通过 inotify 监听所在目录的 IN_CLOSE_WRITE/IN_MOVED_TO 事件（不可用时按 mtime 轮询），
+文件变化时才重新解析，systemd 定时器状态按间隔检查；接口只读取内存快照，
+状态变化时通知订阅者（如 WebSocket ddns_update 房间）
+"""
+
+import os
+import json
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+# DDNS 脚本写入的状态文件
+DDNS_STATUS_FILE = os.getenv('DDNS_STATUS_FILE', '/opt/yyc3/run/status.json')
+# 没有 inotify 时的轮询间隔（秒）；有 inotify 时作为兜底检查间隔
+DDNS_STATUS_POLL_INTERVAL = float(os.getenv('DDNS_STATUS_POLL_INTERVAL', '2'))
+DDNS_STATUS_FALLBACK_INTERVAL = float(os.getenv('DDNS_STATUS_FALLBACK_INTERVAL', '30'))
+# systemd 定时器及其状态检查间隔（秒）
+DDNS_TIMER_UNIT = os.getenv('DDNS_TIMER_UNIT', 'yyc3-ddns.timer')
+DDNS_TIMER_CHECK_INTERVAL = float(os.getenv('DDNS_TIMER_CHECK_INTERVAL', '30'))
+
+# inotify 常量（linux/inotify.h）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _Inotify:
+    """基于 libc 的最小 inotify 封装（只监听一个目录）"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.wd = None
+
+    def watch(self, directory):
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch {directory} failed')
+        self.wd = wd
+
+    def read(self):
+        """
+        读取待处理的事件
+
+        Returns:
+            list: [(mask, name)]
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', errors='replace')
+                offset += length
+                if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    self.wd = None
+                events.append((mask, name))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def check_timer_active(unit):
+    """systemd 单元是否处于 active（没有 systemctl 时返回 None）"""
+    try:
+        return subprocess.run(
+            ['systemctl', 'is-active', '--quiet', unit], capture_output=True, timeout=5
+        ).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+class DdnsStatusProvider:
+    """DDNS 状态文件的共享读取器"""
+
+    def __init__(self, path=None, timer_unit=None, poll_interval=None, timer_interval=None,
+                 fallback_interval=None, timer_checker=None, use_inotify=True):
+        """
+        Args:
+            path: 状态文件路径
+            timer_checker: 定时器状态检查函数（默认调用 systemctl，测试时可替换）
+            use_inotify: 是否尝试使用 inotify（失败时自动回退到轮询）
+        """
+        self.path = path or DDNS_STATUS_FILE
+        self.timer_unit = timer_unit or DDNS_TIMER_UNIT
+        self.poll_interval = poll_interval or DDNS_STATUS_POLL_INTERVAL
+        self.timer_interval = timer_interval or DDNS_TIMER_CHECK_INTERVAL
+        self.fallback_interval = fallback_interval or DDNS_STATUS_FALLBACK_INTERVAL
+        self.timer_checker = timer_checker or check_timer_active
+        self.use_inotify = use_inotify
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._thread = None
+        self._stopped = threading.Event()
+        self._stat_key = None
+        self._timer_checked = 0
+        self._snapshot = {
+            'path': self.path, 'exists': False, 'data': None, 'error': 'not loaded yet', 'mtime': None,
+            'loadedAt': None, 'running': None, 'runningCheckedAt': None, 'watcher': None, 'version': 0
+        }
+
+    # ========== 读取 ==========
+
+    def get(self):
+        """最新快照（首次调用时加载并启动后台监视，之后只读内存）"""
+        if self._thread is None:
+            self.start()
+        return self._snapshot
+
+    def start(self):
+        """同步加载一次并启动后台监视（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stopped.clear()
+            self.refresh()
+            self.check_timer()
+            self._thread = threading.Thread(target=self._run, name='ddns-status-watch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def refresh(self):
+        """文件的 (inode, mtime, 大小) 变化时重新解析，返回快照是否变化"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            if self._snapshot['exists'] or self._stat_key is None:
+                self._stat_key = ()
+                return self._update(exists=False, data=None, error='Status file not found', mtime=None)
+            return False
+        except OSError as e:
+            return self._update(error=str(e))
+
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if key == self._stat_key:
+            return False
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            # 脚本截断后尚未写完，保留上一次的内容，等待下一次写入事件
+            logger.debug(f"DDNS status file not readable yet: {e}")
+            return False
+        self._stat_key = key
+        if data == self._snapshot['data'] and self._snapshot['exists']:
+            return False
+        return self._update(exists=True, data=data, error=None, mtime=st.st_mtime)
+
+    def check_timer(self):
+        """检查 systemd 定时器状态，返回快照是否变化"""
+        self._timer_checked = time.monotonic()
+        running = self.timer_checker(self.timer_unit)
+        self._snapshot = dict(self._snapshot, runningCheckedAt=time.time())
+        if running == self._snapshot['running']:
+            return False
+        return self._update(running=running)
+
+    def _update(self, **changes):
+        previous = self._snapshot
+        snapshot = dict(previous, **changes)
+        snapshot['loadedAt'] = time.time()
+        snapshot['version'] = previous['version'] + 1
+        self._snapshot = snapshot
+        # start() 中的首次加载不通知
+        if self._thread is not None:
+            self._notify(snapshot, previous)
+        return True
+
+    # ========== 订阅 ==========
+
+    def subscribe(self, callback):
+        """
+        注册变化回调
+
+        Args:
+            callback: callback(snapshot, previous)，在监视线程中调用
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _notify(self, snapshot, previous):
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot, previous)
+            except Exception as e:
+                logger.error(f"DDNS status listener failed: {e}")
+
+    # ========== 监视线程 ==========
+
+    def _open_inotify(self):
+        if not self.use_inotify:
+            return None
+        try:
+            inotify = _Inotify()
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable, polling {self.path}: {e}")
+            return None
+        self._watch(inotify)
+        return inotify
+
+    def _watch(self, inotify):
+        try:
+            inotify.watch(os.path.dirname(os.path.abspath(self.path)))
+        except OSError as e:
+            # 目录尚不存在时先轮询，之后再重试
+            if e.errno != errno.ENOENT:
+                logger.warning(f"Cannot watch {self.path}: {e}")
+
+    def _run(self):
+        inotify = self._open_inotify()
+        name = os.path.basename(self.path)
+        try:
+            while not self._stopped.is_set():
+                watching = inotify is not None and inotify.wd is not None
+                self._snapshot = dict(self._snapshot, watcher='inotify' if watching else 'poll')
+                timeout = self.fallback_interval if watching else self.poll_interval
+                timeout = max(min(timeout, self._timer_checked + self.timer_interval - time.monotonic()), 0)
+                try:
+                    if watching:
+                        readable, _, _ = select.select([inotify.fd], [], [], timeout)
+                        if readable and not any(event_name == name or not event_name
+                                                for _, event_name in inotify.read()):
+                            continue
+                    else:
+                        if self._stopped.wait(timeout):
+                            break
+                        if inotify is not None:
+                            self._watch(inotify)
+                    self.refresh()
+                    if time.monotonic() - self._timer_checked >= self.timer_interval:
+                        self.check_timer()
+                except Exception as e:
+                    logger.error(f"DDNS status watcher error: {e}")
+                    self._stopped.wait(self.poll_interval)
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_ddns_status_provider():
+    """获取全局 DDNS 状态读取器"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = DdnsStatusProvider()
+    return _provider
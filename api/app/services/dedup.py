@@ -0,0 +1,248 @@
+"""
+重复文件扫描模块
+基于文件索引按 大小 -> 首尾块哈希 -> 全文件哈希 逐级筛选重复文件，
+全文件哈希使用进程池 + mmap 计算，哈希结果按 (path, size, mtime) 缓存，重复扫描只计算变化的文件。
+扫描在 Celery worker 中执行（进程池不能在 gevent 猴子补丁后的 gunicorn worker 中 fork），
+通过跨进程文件锁互斥，进度记录在索引的 dedup_scan 表中
+"""
+
+import os
+import mmap
+import time
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from app.utils.file_lock import FileLock, FileLockBusy
+from .file_index import get_file_index, NAS_INDEX_DB_PATH
+
+try:
+    import xxhash
+    xxhash_available = True
+except ImportError:
+    xxhash_available = False
+
+logger = logging.getLogger(__name__)
+
+# 参与比较的最小文件大小、首尾块大小（字节）
+NAS_DEDUP_MIN_SIZE = int(os.getenv('NAS_DEDUP_MIN_SIZE', str(1024 * 1024)))
+NAS_DEDUP_BLOCK_SIZE = int(os.getenv('NAS_DEDUP_BLOCK_SIZE', str(64 * 1024)))
+NAS_DEDUP_WORKERS = int(os.getenv('NAS_DEDUP_WORKERS', str(os.cpu_count() or 2)))
+# 扫描任务的时间上限（秒），超过后仍为 running 的状态视为扫描进程已被终止
+NAS_DEDUP_TIME_LIMIT = int(os.getenv('NAS_DEDUP_TIME_LIMIT', '21600'))
+# 扫描锁文件（所有 worker 共享）
+NAS_DEDUP_LOCK_FILE = os.getenv('NAS_DEDUP_LOCK_FILE',
+                                os.path.join(os.path.dirname(NAS_INDEX_DB_PATH), 'locks', 'nas_dedup.lock'))
+
+# 全文件哈希时每次送入哈希函数的 mmap 窗口大小
+_HASH_WINDOW = 8 * 1024 * 1024
+
+HASH_ALGORITHM = 'xxh3_128' if xxhash_available else 'blake2b'
+
+
+def _new_hasher():
+    if xxhash_available:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=20)
+
+
+def partial_hash(path, size, block_size=NAS_DEDUP_BLOCK_SIZE):
+    """
+    计算文件首尾块哈希（不超过两个块的文件直接计算全文件哈希）
+
+    Returns:
+        str: 十六进制哈希，文件无法读取时返回 None
+    """
+    hasher = _new_hasher()
+    try:
+        with open(path, 'rb') as f:
+            if size <= block_size * 2:
+                hasher.update(f.read())
+            else:
+                hasher.update(f.read(block_size))
+                f.seek(-block_size, os.SEEK_END)
+                hasher.update(f.read(block_size))
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+def full_hash(path):
+    """
+    通过 mmap 计算全文件哈希（在子进程中执行）
+
+    Returns:
+        tuple: (path, 十六进制哈希)，文件无法读取时哈希为 None
+    """
+    hasher = _new_hasher()
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return path, hasher.hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                view = memoryview(mm)
+                try:
+                    for offset in range(0, size, _HASH_WINDOW):
+                        hasher.update(view[offset:offset + _HASH_WINDOW])
+                finally:
+                    view.release()
+    except (OSError, ValueError):
+        return path, None
+    return path, hasher.hexdigest()
+
+
+class DedupScanner:
+    """重复文件扫描器"""
+
+    def __init__(self, index, min_size=None, workers=None, lock_file=None):
+        self.index = index
+        self.min_size = min_size or NAS_DEDUP_MIN_SIZE
+        self.workers = workers or NAS_DEDUP_WORKERS
+        self.lock_file = lock_file or NAS_DEDUP_LOCK_FILE
+
+    def scan(self, volume=None):
+        """
+        同步执行一次重复文件扫描并保存报告（其他进程正在扫描时直接返回）
+
+        Args:
+            volume: 只扫描指定存储卷，默认全部
+
+        Returns:
+            dict: 报告摘要，已有扫描进行中时为 {'skipped': True, 'progress'}
+        """
+        try:
+            with FileLock(self.lock_file, blocking=False):
+                self.index.begin_dedup_scan(volume)
+                try:
+                    summary = self._scan(volume)
+                except Exception:
+                    self.index.update_dedup_scan(status='failed', finished_at=time.time())
+                    raise
+                self.index.update_dedup_scan(status='completed', stage=None, pending=0,
+                                             finished_at=time.time(), report_id=summary['id'])
+                return summary
+        except FileLockBusy:
+            logger.info("Dedup scan already running, skipping")
+            return {'skipped': True, 'progress': self.progress}
+
+    def _scan(self, volume):
+        started = time.time()
+        stats = {'files_scanned': 0, 'files_hashed': 0, 'bytes_hashed': 0}
+
+        # 第一级：同大小分组（SQL中完成）
+        by_size = defaultdict(list)
+        for row in self.index.iter_size_candidates(self.min_size, volume):
+            by_size[row['size']].append(row)
+            stats['files_scanned'] += 1
+
+        # 第二级：首尾块哈希
+        self.index.update_dedup_scan(stage='partial')
+        need_partial = [r for rows in by_size.values() for r in rows if not r['partial_hash']]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for row, digest in zip(need_partial, executor.map(
+                    lambda r: partial_hash(r['path'], r['size']), need_partial)):
+                row['partial_hash'] = digest
+                # 小文件的首尾块哈希即全文件哈希
+                row['full_hash'] = digest if row['size'] <= NAS_DEDUP_BLOCK_SIZE * 2 else None
+        self.index.save_hashes([
+            (r['path'], r['size'], r['mtime'], r['partial_hash'], r['full_hash'])
+            for r in need_partial if r['partial_hash']
+        ])
+
+        candidates = []
+        for rows in by_size.values():
+            by_partial = defaultdict(list)
+            for row in rows:
+                if row['partial_hash']:
+                    by_partial[row['partial_hash']].append(row)
+            candidates.extend(group for group in by_partial.values() if len(group) > 1)
+
+        # 第三级：全文件哈希（进程池）
+        need_full = {r['path']: r for group in candidates for r in group if not r['full_hash']}
+        pending = len(need_full)
+        self.index.update_dedup_scan(stage='full', pending=pending)
+        if need_full:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                batch = []
+                for path, digest in executor.map(full_hash, list(need_full), chunksize=8):
+                    row = need_full[path]
+                    row['full_hash'] = digest
+                    if digest:
+                        stats['files_hashed'] += 1
+                        stats['bytes_hashed'] += row['size']
+                        batch.append((path, row['size'], row['mtime'], row['partial_hash'], digest))
+                    pending -= 1
+                    if len(batch) >= 500:
+                        self.index.save_hashes(batch)
+                        self.index.update_dedup_scan(pending=pending)
+                        batch = []
+                self.index.save_hashes(batch)
+
+        groups = []
+        for group in candidates:
+            by_full = defaultdict(list)
+            for row in group:
+                if row['full_hash']:
+                    by_full[row['full_hash']].append(row['path'])
+            for digest, paths in by_full.items():
+                if len(paths) > 1:
+                    size = group[0]['size']
+                    groups.append({
+                        'hash': digest,
+                        'size': size,
+                        'count': len(paths),
+                        'wasted': size * (len(paths) - 1),
+                        'paths': sorted(paths)
+                    })
+        groups.sort(key=lambda g: g['wasted'], reverse=True)
+
+        report = dict(stats)
+        report.update({
+            'started_at': started,
+            'finished_at': time.time(),
+            'algorithm': HASH_ALGORITHM,
+            'group_count': len(groups),
+            'wasted_bytes': sum(g['wasted'] for g in groups),
+            'groups': groups
+        })
+        report_id = self.index.save_dedup_report(report)
+
+        logger.info(f"Dedup scan completed: {len(groups)} groups, {report['wasted_bytes']} bytes wasted")
+        summary = {k: v for k, v in report.items() if k != 'groups'}
+        summary['id'] = report_id
+        return summary
+
+    @property
+    def running(self):
+        """是否有扫描正在进行（读取 dedup_scan 表，所有进程结果一致）"""
+        scan = self.index.get_dedup_scan()
+        return bool(scan and scan['status'] == 'running'
+                    and time.time() - scan['started_at'] < NAS_DEDUP_TIME_LIMIT)
+
+    @property
+    def progress(self):
+        """正在进行的扫描的阶段与待计算文件数，没有扫描进行时为空"""
+        if not self.running:
+            return {}
+        scan = self.index.get_dedup_scan()
+        return {'stage': scan['stage'], 'pending': scan['pending'], 'volume': scan['volume'],
+                'started_at': scan['started_at']}
+
+
+_scanner = None
+_scanner_lock = threading.Lock()
+
+
+def get_dedup_scanner():
+    """获取全局重复文件扫描器"""
+    global _scanner
+    if _scanner is None:
+        with _scanner_lock:
+            if _scanner is None:
+                _scanner = DedupScanner(get_file_index())
+    return _scanner
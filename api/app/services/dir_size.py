@@ -0,0 +1,268 @@
+"""
+目录大小统计模块
+由 Celery 任务使用线程池遍历存储卷，计算每个目录的累计大小和文件数并写入文件索引，
+之后根据文件变更事件增量更新，接口查询时直接读取索引。
+同一存储卷的扫描通过跨进程文件锁互斥，扫描状态记录在索引的 scans 表中
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from app.utils.file_lock import FileLock, FileLockBusy
+from .file_index import get_file_index, load_volume_mounts, INDEX_BATCH_SIZE, NAS_INDEX_DB_PATH
+
+logger = logging.getLogger(__name__)
+
+# 扫描线程数与周期（秒，由 Celery beat 调度，0 表示不定期扫描）
+NAS_SCAN_WORKERS = int(os.getenv('NAS_SCAN_WORKERS', '8'))
+NAS_SCAN_INTERVAL = int(os.getenv('NAS_SCAN_INTERVAL', '21600'))
+# 单个存储卷扫描任务的时间上限（秒），大容量存储卷全量扫描会超过 Celery 默认的 30 分钟
+NAS_SCAN_TIME_LIMIT = int(os.getenv('NAS_SCAN_TIME_LIMIT', '21600'))
+# 存储卷扫描锁目录（所有 worker 共享）
+NAS_SCAN_LOCK_DIR = os.getenv('NAS_SCAN_LOCK_DIR', os.path.join(os.path.dirname(NAS_INDEX_DB_PATH), 'locks'))
+
+
+def _scan_directory(path):
+    """
+    扫描单个目录（不递归）
+
+    Returns:
+        tuple: (文件列表 [(path, name, size, mtime)], 子目录列表 [(path, name, mtime)])
+    """
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        subdirs.append((entry.path, entry.name, st.st_mtime))
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        files.append((entry.path, entry.name, st.st_size, st.st_mtime))
+                except OSError:
+                    continue
+    except PermissionError:
+        logger.warning(f"Permission denied: {path}")
+    except OSError as e:
+        logger.error(f"Error reading {path}: {e}")
+    return files, subdirs
+
+
+class DirSizeAggregator:
+    """目录大小后台统计器"""
+
+    def __init__(self, index, volumes=None, max_workers=None, lock_dir=None):
+        self.index = index
+        self.volumes = volumes if volumes is not None else load_volume_mounts()
+        self.max_workers = max_workers or NAS_SCAN_WORKERS
+        self.lock_dir = lock_dir or NAS_SCAN_LOCK_DIR
+
+    def volume_for_path(self, path):
+        """
+        查找路径所属的存储卷
+
+        Returns:
+            tuple: (volume_id, mount_point)，不属于任何存储卷时返回 (None, None)
+        """
+        path = os.path.normpath(path)
+        for volume_id, root in self.volumes.items():
+            if path == root or path.startswith(root + os.sep):
+                return volume_id, root
+        return None, None
+
+    # ========== 全量扫描 ==========
+
+    def scan_volume(self, volume_id):
+        """
+        同步扫描一个存储卷（其他进程正在扫描同一存储卷时直接返回）
+
+        两次扫描同时进行时，先完成的一次会删除另一次写入的条目，因此必须互斥
+
+        Returns:
+            dict: 扫描摘要，已有扫描进行中时为 {'volume', 'skipped': True, 'scan'}
+        """
+        root = self.volumes.get(volume_id)
+        if not root or not os.path.isdir(root):
+            raise ValueError(f'Volume not available: {volume_id}')
+
+        try:
+            with FileLock(os.path.join(self.lock_dir, f'nas_scan_{volume_id}.lock'), blocking=False):
+                return self._scan_volume(volume_id, root)
+        except FileLockBusy:
+            logger.info(f"Volume {volume_id} is already being scanned, skipping")
+            return {'volume': volume_id, 'skipped': True, 'scan': self.index.get_scan(volume_id)}
+
+    def _scan_volume(self, volume_id, root):
+        started = time.time()
+        scan_id = self.index.begin_scan(volume_id)
+        # 每个目录的直接统计: path -> [parent, size, files, dirs]
+        direct = {root: [os.path.dirname(root), 0, 0, 0]}
+        batch = []
+        entry_count = 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pending = {executor.submit(_scan_directory, root): root}
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        dir_path = pending.pop(future)
+                        files, subdirs = future.result()
+                        stats = direct[dir_path]
+
+                        for file_path, name, size, mtime in files:
+                            stats[1] += size
+                            stats[2] += 1
+                            batch.append((file_path, dir_path, name, 0, size, mtime))
+
+                        for sub_path, name, mtime in subdirs:
+                            stats[3] += 1
+                            direct[sub_path] = [dir_path, 0, 0, 0]
+                            batch.append((sub_path, dir_path, name, 1, 0, mtime))
+                            pending[executor.submit(_scan_directory, sub_path)] = sub_path
+
+                        if len(batch) >= INDEX_BATCH_SIZE:
+                            self.index.write_entries(volume_id, scan_id, batch)
+                            entry_count += len(batch)
+                            batch = []
+
+            self.index.write_entries(volume_id, scan_id, batch)
+            entry_count += len(batch)
+
+            # 自底向上累加到父目录
+            totals = {path: list(stats) for path, stats in direct.items()}
+            for path in sorted(totals, key=lambda p: p.count(os.sep), reverse=True):
+                if path == root:
+                    continue
+                parent, size, files, dirs = totals[path]
+                parent_totals = totals[parent]
+                parent_totals[1] += size
+                parent_totals[2] += files
+                parent_totals[3] += dirs
+
+            self.index.finish_scan(volume_id, scan_id, {p: tuple(t) for p, t in totals.items()}, entry_count)
+        except Exception as e:
+            self.index.fail_scan(volume_id, scan_id, e)
+            raise
+
+        root_totals = totals[root]
+        return {
+            'volume': volume_id,
+            'mountPoint': root,
+            'scanId': scan_id,
+            'entries': entry_count,
+            'totalSize': root_totals[1],
+            'fileCount': root_totals[2],
+            'dirCount': root_totals[3],
+            'duration': round(time.time() - started, 3)
+        }
+
+    def scan_all(self):
+        """同步扫描所有存储卷"""
+        results = []
+        for volume_id, root in self.volumes.items():
+            if not os.path.isdir(root):
+                continue
+            try:
+                results.append(self.scan_volume(volume_id))
+            except Exception as e:
+                logger.error(f"Volume scan failed for {volume_id}: {e}")
+                results.append({'volume': volume_id, 'error': str(e)})
+        return results
+
+    def is_scanning(self, volume_id):
+        """
+        存储卷是否正在扫描（读取 scans 表，所有进程结果一致）
+
+        超过 NAS_SCAN_TIME_LIMIT 仍为 running 的记录视为扫描进程已被终止
+        """
+        scan = self.index.get_scan(volume_id)
+        return bool(scan and scan['status'] == 'running'
+                    and time.time() - scan['started_at'] < NAS_SCAN_TIME_LIMIT)
+
+    def available_volumes(self):
+        """当前已挂载的存储卷ID"""
+        return [volume_id for volume_id, root in self.volumes.items() if os.path.isdir(root)]
+
+    # ========== 增量事件 ==========
+
+    def record_change(self, path, old_size=None, new_size=None):
+        """
+        处理文件变更事件
+
+        Args:
+            path: 文件路径
+            old_size: 变更前大小，None 表示新建
+            new_size: 变更后大小，None 表示删除
+        """
+        volume_id, root = self.volume_for_path(path)
+        if volume_id is None:
+            return
+        size_delta = (new_size or 0) - (old_size or 0)
+        count_delta = (1 if new_size is not None else 0) - (1 if old_size is not None else 0)
+
+        entry = None
+        if new_size is not None:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                mtime = time.time()
+            entry = (os.path.basename(path), new_size, mtime)
+
+        self.index.apply_change(volume_id, root, os.path.normpath(path), size_delta, count_delta, entry)
+
+    # ========== 查询 ==========
+
+    def get_folder_size(self, path, children=False, limit=50):
+        """
+        获取目录累计大小（读取索引，不访问磁盘）
+
+        Returns:
+            dict: 目录大小信息，未索引时返回 None
+        """
+        path = os.path.normpath(path)
+        total = self.index.get_dir_total(path)
+        if total is None:
+            return None
+
+        result = _format_total(total)
+        if children:
+            result['children'] = [_format_total(t) for t in self.index.get_child_totals(path, limit)]
+        return result
+
+
+def _format_total(total):
+    """转换为API格式"""
+    return {
+        'path': total['path'],
+        'volume': total['volume'],
+        'size': total['total_size'],
+        'fileCount': total['file_count'],
+        'dirCount': total['dir_count'],
+        'computed_at': _isoformat(total['computed_at']),
+        'updated_at': _isoformat(total['updated_at'])
+    }
+
+
+def _isoformat(ts):
+    return datetime.fromtimestamp(ts).isoformat()
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_size_aggregator():
+    """获取全局目录大小统计器"""
+    global _aggregator
+    if _aggregator is None:
+        with _aggregator_lock:
+            if _aggregator is None:
+                _aggregator = DirSizeAggregator(get_file_index())
+    return _aggregator
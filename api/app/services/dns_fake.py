@@ -0,0 +1,142 @@
+"""
+本地模拟 DNS 权威服务器
+基于 dnspython 在 UDP 上应答非递归查询：命中本服务器的 zone 时返回权威应答（AA）、
+遇到子域 NS 记录时返回委派（authority + glue），否则返回 NXDOMAIN；
+多个实例绑定在不同回环地址的同一端口上即可模拟 根 -> TLD -> 权威 的委派链，供解析追踪测试使用
+"""
+
+import socket
+import threading
+from collections import Counter
+
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+import dns.flags
+
+
+class FakeDnsServer:
+    """模拟 DNS 权威服务器"""
+
+    def __init__(self, zones, host='127.0.0.1', port=0):
+        """
+        Args:
+            zones: 本服务器权威的 zone 列表，如 ['.'] 或 ['example.com']
+            port: 0 表示随机端口；模拟多级服务器时其余实例使用第一个实例的 port
+        """
+        self.zones = [dns.name.from_text(zone) for zone in zones]
+        self.records = {}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.2)
+        self._running = False
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._sock.getsockname()[0]
+
+    @property
+    def port(self):
+        return self._sock.getsockname()[1]
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, name='fake-dns', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+        self._sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def add_record(self, name, record_type, value, ttl=300):
+        """预置记录（委派使用 NS 记录，glue 使用 NS 主机名的 A 记录）"""
+        key = (dns.name.from_text(name), dns.rdatatype.from_text(record_type))
+        with self._lock:
+            self.records.setdefault(key, {'ttl': ttl, 'values': []})['values'].append(value)
+
+    def set_record(self, name, record_type, values, ttl=300):
+        """替换记录值（用于模拟权威服务器之间不一致）"""
+        key = (dns.name.from_text(name), dns.rdatatype.from_text(record_type))
+        with self._lock:
+            self.records[key] = {'ttl': ttl, 'values': list(values)}
+
+    # ========== 应答 ==========
+
+    def _rrset(self, name, rdtype):
+        entry = self.records.get((name, rdtype))
+        if entry is None:
+            return None
+        return dns.rrset.from_text_list(name, entry['ttl'], dns.rdataclass.IN, rdtype, entry['values'])
+
+    def _zone_for(self, qname):
+        zones = [zone for zone in self.zones if qname.is_subdomain(zone)]
+        return max(zones, key=lambda zone: len(zone.labels)) if zones else None
+
+    def resolve(self, request):
+        """生成应答"""
+        response = dns.message.make_response(request)
+        question = request.question[0]
+        qname, rdtype = question.name, question.rdtype
+        with self._lock:
+            self.calls[(qname.to_text(), dns.rdatatype.to_text(rdtype))] += 1
+            zone = self._zone_for(qname)
+            if zone is None:
+                response.set_rcode(dns.rcode.REFUSED)
+                return response
+
+            # 从 zone 顶点向下查找委派点（zone 顶点本身的 NS 不是委派）
+            for depth in range(len(zone.labels) + 1, len(qname.labels) + 1):
+                cut = qname.split(depth)[1]
+                ns = self._rrset(cut, dns.rdatatype.NS)
+                if ns is not None and cut not in self.zones:
+                    response.authority.append(ns)
+                    for rdata in ns:
+                        for glue_type in (dns.rdatatype.A, dns.rdatatype.AAAA):
+                            glue = self._rrset(rdata.target, glue_type)
+                            if glue is not None:
+                                response.additional.append(glue)
+                    return response
+
+            response.flags |= dns.flags.AA
+            answer = self._rrset(qname, rdtype)
+            cname = self._rrset(qname, dns.rdatatype.CNAME)
+            if answer is not None:
+                response.answer.append(answer)
+            elif cname is not None:
+                response.answer.append(cname)
+            elif not any(name == qname or name.is_subdomain(qname) for name, _ in self.records):
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            return response
+
+    def _serve(self):
+        while self._running:
+            try:
+                data, addr = self._sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                request = dns.message.from_wire(data)
+            except Exception:
+                continue
+            response = self.resolve(request)
+            try:
+                self._sock.sendto(response.to_wire(), addr)
+            except OSError:
+                pass
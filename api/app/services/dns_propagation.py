@@ -0,0 +1,255 @@
+"""
+DNS 传播检测模块
+DDNS 更新后并发查询所有公共解析器和该域名的权威 NS，按退避间隔重复查询尚未生效的服务器，
+直到全部返回新值或超时；每个服务器的生效耗时写入指标时序存储，
+检测报告（含进行中的进度）保存在 DDNS 历史数据库中，守护进程发起的检测在 API 中同样可见
+"""
+
+import os
+import re
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .ddns_history import get_ddns_history_store
+from .dns_query import query
+from .metrics_store import get_metrics_store
+
+logger = logging.getLogger(__name__)
+
+# 公共解析器，逗号分隔的 名称=地址[:端口]
+DNS_PROPAGATION_RESOLVERS = os.getenv(
+    'DNS_PROPAGATION_RESOLVERS',
+    'Google=8.8.8.8,Cloudflare=1.1.1.1,OpenDNS=208.67.222.222,AliDNS=223.5.5.5'
+)
+# 等待生效的上限（秒）、首次重试间隔（秒）和最大重试间隔（秒）
+DNS_PROPAGATION_TIMEOUT = float(os.getenv('DNS_PROPAGATION_TIMEOUT', '600'))
+DNS_PROPAGATION_INITIAL_INTERVAL = float(os.getenv('DNS_PROPAGATION_INITIAL_INTERVAL', '2'))
+DNS_PROPAGATION_MAX_INTERVAL = float(os.getenv('DNS_PROPAGATION_MAX_INTERVAL', '60'))
+DNS_PROPAGATION_CONCURRENCY = int(os.getenv('DNS_PROPAGATION_CONCURRENCY', '16'))
+# DDNS 更新后是否自动检测传播
+DNS_PROPAGATION_WATCH = os.getenv('DNS_PROPAGATION_WATCH', 'true').lower() == 'true'
+
+# 权威 NS 列表的最长缓存时间（秒）
+NS_CACHE_MAX_TTL = 3600
+
+
+def parse_resolvers(spec=None):
+    """'Google=8.8.8.8,Local=127.0.0.1:5353' -> [{'name', 'server', 'kind'}]"""
+    resolvers = []
+    for item in (spec if spec is not None else DNS_PROPAGATION_RESOLVERS).split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, server = item.partition('=')
+        if not sep:
+            name, server = item, item
+        resolvers.append({'name': name.strip(), 'server': server.strip(), 'kind': 'resolver'})
+    return resolvers
+
+
+def propagation_series(server_name):
+    """时序名称，如 dns.propagation.Google"""
+    return 'dns.propagation.' + re.sub(r'[^A-Za-z0-9_.-]', '_', server_name)
+
+
+class PropagationChecker:
+    """DNS 传播检测器"""
+
+    def __init__(self, resolvers=None, store=None, timeout=None, concurrency=None, report_store=None):
+        """
+        Args:
+            store: 指标时序存储（生效耗时）
+            report_store: 检测报告存储（默认 DDNS 历史存储）
+        """
+        self.resolvers = parse_resolvers() if resolvers is None else resolvers
+        self.store = store or get_metrics_store()
+        self.report_store = report_store or get_ddns_history_store()
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=concurrency or DNS_PROPAGATION_CONCURRENCY,
+                                            thread_name_prefix='dns-propagation')
+        self._lock = threading.Lock()
+        self._ns_cache = {}
+
+    # ========== 权威服务器 ==========
+
+    def authoritative_servers(self, zone):
+        """
+        通过公共解析器查找 zone 的权威 NS 及其地址（带缓存）
+
+        Returns:
+            list: [{'name': NS 主机名, 'server': 地址, 'kind': 'authoritative'}]
+        """
+        now = time.time()
+        with self._lock:
+            cached = self._ns_cache.get(zone)
+            if cached and cached[0] > now:
+                return cached[1]
+
+        ns = None
+        for resolver in self.resolvers:
+            ns = query(resolver['server'], zone, 'NS', self.timeout)
+            if not ns['error'] and ns['answers']:
+                break
+        if not ns or ns['error'] or not ns['answers']:
+            return []
+
+        resolver = resolver['server']
+        hosts = list(self._executor.map(lambda host: query(resolver, host, 'A', self.timeout), ns['answers']))
+        servers = [
+            {'name': host.rstrip('.'), 'server': address, 'kind': 'authoritative'}
+            for host, result in zip(ns['answers'], hosts)
+            for address in result['answers'][:1]
+        ]
+        ttl = min(ns['ttl'] or NS_CACHE_MAX_TTL, NS_CACHE_MAX_TTL)
+        with self._lock:
+            self._ns_cache[zone] = (now + ttl, servers)
+        return servers
+
+    def servers(self, zone=None):
+        """要检测的全部服务器（公共解析器 + 权威 NS）"""
+        servers = list(self.resolvers)
+        if zone:
+            servers.extend(self.authoritative_servers(zone))
+        return servers
+
+    # ========== 检测 ==========
+
+    def _query_all(self, servers, name, rdtype):
+        futures = [
+            self._executor.submit(query, server['server'], name, rdtype, self.timeout,
+                                  server['kind'] != 'authoritative')
+            for server in servers
+        ]
+        return [dict(future.result(), label=server['name'], kind=server['kind'])
+                for server, future in zip(servers, futures)]
+
+    def check(self, name, rdtype='A', expected=None, zone=None):
+        """
+        并发查询一次
+
+        Args:
+            name: 完整域名
+            expected: 期望的记录值（为 None 时只检查各服务器是否一致）
+            zone: 主域名（用于查找权威 NS）
+
+        Returns:
+            dict: {'name', 'type', 'expected', 'converged', 'consistent', 'servers'}
+        """
+        results = self._query_all(self.servers(zone), name, rdtype)
+        for result in results:
+            result['matched'] = _matched(result, expected)
+        answer_sets = {tuple(r['answers']) for r in results if not r['error']}
+        return {
+            'name': name,
+            'type': rdtype,
+            'expected': expected,
+            'converged': bool(results) and all(r['matched'] for r in results),
+            'consistent': len(answer_sets) <= 1,
+            'servers': results
+        }
+
+    def wait(self, name, rdtype, expected, zone=None, max_wait=None, initial_interval=None, max_interval=None):
+        """
+        按退避间隔重复查询尚未生效的服务器，直到全部返回期望值或超时
+
+        Returns:
+            dict: {'name', 'type', 'expected', 'startedAt', 'elapsed', 'converged', 'servers'}，
+                  servers 中每项的 propagation 为生效耗时（秒，未生效为 None）
+        """
+        max_wait = max_wait or DNS_PROPAGATION_TIMEOUT
+        interval = initial_interval or DNS_PROPAGATION_INITIAL_INTERVAL
+        max_interval = max_interval or DNS_PROPAGATION_MAX_INTERVAL
+        started = time.time()
+        deadline = time.monotonic() + max_wait
+        pending = self.servers(zone)
+        report = {'name': name, 'type': rdtype, 'expected': expected, 'startedAt': started, 'elapsed': None,
+                  'converged': False, 'attempts': 0, 'servers': {}}
+        self._save_report(report)
+
+        samples = []
+        while pending:
+            report['attempts'] += 1
+            results = self._query_all(pending, name, rdtype)
+            now = time.time()
+            still_pending = []
+            for server, result in zip(pending, results):
+                entry = dict(result, propagation=None)
+                if _matched(result, expected):
+                    entry['propagation'] = round(now - started, 2)
+                    samples.append((propagation_series(server['name']), entry['propagation'], now))
+                else:
+                    still_pending.append(server)
+                report['servers'][server['name']] = entry
+            pending = still_pending
+            if pending:
+                self._save_report(report)
+            if not pending or time.monotonic() + interval > deadline:
+                break
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+
+        report['converged'] = not pending
+        report['elapsed'] = round(time.time() - started, 2)
+        self._save_report(report)
+        if samples:
+            self.store.record_many(samples)
+        if pending:
+            logger.warning(f"{name} {rdtype} not propagated to {[s['name'] for s in pending]} after "
+                           f"{report['elapsed']}s")
+        return report
+
+    def watch_results(self, results):
+        """在后台检测一批 DDNS 更新结果（仅 created/updated 的记录）"""
+        for result in results or []:
+            if result.get('action') not in ('created', 'updated'):
+                continue
+            rr, zone = result['rr'], result['domain']
+            name = zone if rr == '@' else f'{rr}.{zone}'
+            thread = threading.Thread(target=self._watch_one, args=(name, result['type'], result['value'], zone),
+                                      name='dns-propagation-watch', daemon=True)
+            thread.start()
+
+    def _watch_one(self, name, rdtype, expected, zone):
+        try:
+            self.wait(name, rdtype, expected, zone)
+        except Exception as e:
+            logger.error(f"Propagation check for {name} failed: {e}")
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    # ========== 报告 ==========
+
+    def _save_report(self, report):
+        try:
+            self.report_store.save_propagation_report(report)
+        except Exception as e:
+            logger.warning(f"Cannot save propagation report for {report['name']}: {e}")
+
+    def reports(self, name=None):
+        """最近的检测报告（进行中的报告 elapsed 为 None）"""
+        return self.report_store.propagation_reports(name)
+
+
+def _matched(result, expected):
+    if result['error'] or result['rcode'] != 'NOERROR':
+        return False
+    if expected is None:
+        return bool(result['answers'])
+    return expected in result['answers']
+
+
+_checker = None
+_checker_lock = threading.Lock()
+
+
+def get_propagation_checker():
+    """获取全局传播检测器"""
+    global _checker
+    if _checker is None:
+        with _checker_lock:
+            if _checker is None:
+                _checker = PropagationChecker()
+    return _checker
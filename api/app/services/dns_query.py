@@ -0,0 +1,115 @@
+"""
+DNS 查询模块
+基于 dnspython 直接向指定服务器发送 UDP 查询（响应被截断时改用 TCP），
+返回应答记录、TTL、AA 标志和耗时，供传播检测和解析追踪使用
+"""
+
+import os
+import time
+import ipaddress
+
+try:
+    import dns.flags
+    import dns.message
+    import dns.name
+    import dns.query
+    import dns.rcode
+    import dns.rdatatype
+    import dns.exception
+    dns_available = True
+except ImportError:
+    dns_available = False
+
+DNS_QUERY_TIMEOUT = float(os.getenv('DNS_QUERY_TIMEOUT', '3'))
+
+
+class DnsQueryError(Exception):
+    """DNS 查询失败（超时、网络错误或响应无效）"""
+
+
+def parse_server(server):
+    """
+    解析服务器地址
+
+    Args:
+        server: '8.8.8.8'、'127.0.0.1:5353'、'[::1]:5353' 或 '2001:4860:4860::8888'
+
+    Returns:
+        tuple: (地址, 端口)
+    """
+    server = server.strip()
+    if server.startswith('['):
+        host, _, port = server[1:].partition(']')
+        return host, int(port.lstrip(':') or 53)
+    try:
+        ipaddress.ip_address(server)
+        return server, 53
+    except ValueError:
+        pass
+    host, sep, port = server.rpartition(':')
+    if sep:
+        return host, int(port)
+    return server, 53
+
+
+def query_message(server, name, rdtype='A', timeout=None, recursion=True):
+    """
+    发送一次查询
+
+    Returns:
+        tuple: (dns.message.Message, 耗时毫秒)
+
+    Raises:
+        DnsQueryError: 超时或网络错误
+    """
+    if not dns_available:
+        raise DnsQueryError('dnspython not installed')
+    host, port = parse_server(server)
+    request = dns.message.make_query(name, rdtype)
+    if not recursion:
+        request.flags &= ~dns.flags.RD
+    start = time.perf_counter()
+    try:
+        response, _ = dns.query.udp_with_fallback(request, host, timeout=timeout or DNS_QUERY_TIMEOUT, port=port)
+    except (dns.exception.DNSException, OSError) as e:
+        raise DnsQueryError(str(e) or e.__class__.__name__)
+    return response, round((time.perf_counter() - start) * 1000, 2)
+
+
+def answer_values(response, name, rdtype):
+    """应答中指定名称和类型的记录值（排序），以及最小 TTL"""
+    values = []
+    ttl = None
+    rdtype = dns.rdatatype.from_text(rdtype) if isinstance(rdtype, str) else rdtype
+    qname = dns.name.from_text(name) if isinstance(name, str) else name
+    # 跟随应答中的 CNAME 链
+    names = {qname}
+    for rrset in response.answer:
+        if rrset.rdtype == dns.rdatatype.CNAME and rrset.name in names:
+            names.update(rdata.target for rdata in rrset)
+    for rrset in response.answer:
+        if rrset.rdtype == rdtype and rrset.name in names:
+            values.extend(rdata.to_text() for rdata in rrset)
+            ttl = rrset.ttl if ttl is None else min(ttl, rrset.ttl)
+    return sorted(values), ttl
+
+
+def query(server, name, rdtype='A', timeout=None, recursion=True):
+    """
+    查询并汇总结果
+
+    Returns:
+        dict: {'server', 'name', 'type', 'rcode', 'answers', 'ttl', 'authoritative', 'latency', 'error'}
+    """
+    result = {'server': server, 'name': name, 'type': rdtype, 'rcode': None, 'answers': [], 'ttl': None,
+              'authoritative': False, 'latency': None, 'error': None}
+    try:
+        response, latency = query_message(server, name, rdtype, timeout, recursion)
+    except DnsQueryError as e:
+        result['error'] = str(e)
+        return result
+    result['latency'] = latency
+    result['rcode'] = dns.rcode.to_text(response.rcode())
+    result['authoritative'] = bool(response.flags & dns.flags.AA)
+    result['answers'], result['ttl'] = answer_values(response, name, rdtype)
+    return result
@@ -0,0 +1,353 @@
+"""
+DNS 迭代解析追踪模块
+从根服务器开始逐级查询（不递归），每一级并发查询该级的全部 NS，记录每个服务器的耗时和响应，
+并比较同级服务器返回的委派/应答是否一致；委派关系（NS 与地址）按 TTL 缓存，
+没有 glue 记录的 NS 通过子追踪解析地址
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .dns_query import DnsQueryError, answer_values, dns_available, query_message
+
+if dns_available:
+    import dns.name
+    import dns.flags
+    import dns.rcode
+    import dns.rdatatype
+
+logger = logging.getLogger(__name__)
+
+# 根服务器（名称=地址，逗号分隔），测试时可指向本地模拟服务器
+DNS_ROOT_SERVERS = os.getenv(
+    'DNS_ROOT_SERVERS',
+    'a.root-servers.net=198.41.0.4,b.root-servers.net=170.247.170.2,c.root-servers.net=192.33.4.12,'
+    'd.root-servers.net=199.7.91.13,e.root-servers.net=192.203.230.10,f.root-servers.net=192.5.5.241,'
+    'g.root-servers.net=192.112.36.4,h.root-servers.net=198.97.190.53,i.root-servers.net=192.36.148.17,'
+    'j.root-servers.net=192.58.128.30,k.root-servers.net=193.0.14.129,l.root-servers.net=199.7.83.42,'
+    'm.root-servers.net=202.12.27.33'
+)
+DNS_TRACE_TIMEOUT = float(os.getenv('DNS_TRACE_TIMEOUT', '3'))
+DNS_TRACE_CONCURRENCY = int(os.getenv('DNS_TRACE_CONCURRENCY', '16'))
+# 每一级最多查询的 NS 数量（根和 TLD 有十几个 NS）
+DNS_TRACE_MAX_SERVERS = int(os.getenv('DNS_TRACE_MAX_SERVERS', '13'))
+
+# 最大委派层数和无 glue NS 的子追踪深度
+MAX_LEVELS = 16
+MAX_SUBTRACE_DEPTH = 3
+# 委派缓存的最长时间（秒）
+DELEGATION_CACHE_MAX_TTL = 86400
+
+
+def parse_root_servers(spec=None):
+    """'a.root-servers.net=198.41.0.4,...' -> [{'name', 'address'}]"""
+    servers = []
+    for item in (spec if spec is not None else DNS_ROOT_SERVERS).split(','):
+        item = item.strip()
+        if item:
+            name, sep, address = item.partition('=')
+            servers.append({'name': name if sep else address, 'address': address if sep else name})
+    return servers
+
+
+class DnsTracer:
+    """迭代解析追踪器"""
+
+    def __init__(self, root_servers=None, port=53, timeout=None, concurrency=None, max_servers=None):
+        """
+        Args:
+            root_servers: [{'name', 'address'}]（默认 DNS_ROOT_SERVERS）
+            port: 所有服务器使用的端口（本地模拟服务器使用非 53 端口）
+        """
+        self.root_servers = parse_root_servers() if root_servers is None else root_servers
+        self.port = port
+        self.timeout = timeout or DNS_TRACE_TIMEOUT
+        self.max_servers = max_servers or DNS_TRACE_MAX_SERVERS
+        self._executor = ThreadPoolExecutor(max_workers=concurrency or DNS_TRACE_CONCURRENCY,
+                                            thread_name_prefix='dns-trace')
+        self._lock = threading.Lock()
+        self._delegations = {}
+        self._addresses = {}
+
+    def _server(self, address):
+        if self.port == 53:
+            return address
+        return f'[{address}]:{self.port}' if ':' in address else f'{address}:{self.port}'
+
+    # ========== 单个服务器 ==========
+
+    def _ask(self, server, qname, rdtype, zone):
+        """
+        向一个服务器发送非递归查询并分类响应
+
+        Returns:
+            dict: {'name', 'address', 'latency', 'rcode', 'kind': referral/answer/cname/nxdomain/nodata/lame/error,
+                   'delegation', 'ns', 'glue', 'answers', 'authoritative', 'ttl', 'error'}
+        """
+        hop = {'name': server['name'], 'address': server['address'], 'latency': None, 'rcode': None,
+               'kind': 'error', 'delegation': None, 'ns': [], 'glue': {}, 'answers': [], 'cname': None,
+               'authoritative': False, 'ttl': None, 'error': None}
+        try:
+            response, hop['latency'] = query_message(self._server(server['address']), qname, rdtype,
+                                                     self.timeout, recursion=False)
+        except DnsQueryError as e:
+            hop['error'] = str(e)
+            return hop
+
+        hop['rcode'] = dns.rcode.to_text(response.rcode())
+        hop['authoritative'] = bool(response.flags & dns.flags.AA)
+        if response.rcode() == dns.rcode.NXDOMAIN:
+            hop['kind'] = 'nxdomain'
+            return hop
+        if response.rcode() != dns.rcode.NOERROR:
+            hop['kind'] = 'lame'
+            return hop
+
+        name = dns.name.from_text(qname)
+        hop['answers'], hop['ttl'] = answer_values(response, name, rdtype)
+        if hop['answers']:
+            hop['kind'] = 'answer'
+            return hop
+        for rrset in response.answer:
+            if rrset.rdtype == dns.rdatatype.CNAME and rrset.name == name:
+                hop['kind'] = 'cname'
+                hop['cname'] = rrset[0].target.to_text()
+                hop['ttl'] = rrset.ttl
+                return hop
+
+        zone_name = dns.name.from_text(zone)
+        for rrset in response.authority:
+            if rrset.rdtype != dns.rdatatype.NS:
+                continue
+            # 只接受比当前 zone 更深、且包含查询名的委派（防止向上或无关的委派）
+            if rrset.name != zone_name and rrset.name.is_subdomain(zone_name) and name.is_subdomain(rrset.name):
+                hop['kind'] = 'referral'
+                hop['delegation'] = rrset.name.to_text()
+                hop['ns'] = sorted(rdata.target.to_text() for rdata in rrset)
+                hop['ttl'] = rrset.ttl
+                for glue in response.additional:
+                    if glue.rdtype == dns.rdatatype.A and glue.name.to_text() in hop['ns']:
+                        hop['glue'].setdefault(glue.name.to_text(), []).extend(r.address for r in glue)
+                return hop
+
+        # 权威服务器返回 NOERROR 但没有该类型记录；非权威且没有委派则为错误委派
+        hop['kind'] = 'nodata' if hop['authoritative'] else 'lame'
+        return hop
+
+    # ========== 追踪 ==========
+
+    def trace(self, name, rdtype='A', use_cache=False, _depth=0):
+        """
+        从根开始迭代追踪
+
+        Args:
+            name: 查询的域名
+            rdtype: 记录类型
+            use_cache: 从已缓存的最深委派开始（跳过的层级标记为 cached）
+
+        Returns:
+            dict: {'name', 'type', 'levels', 'answers', 'complete', 'elapsed'}，answers 为多数权威服务器的应答，
+                  levels 每项为 {'zone', 'servers': [hop...], 'consistent', 'inconsistencies', 'cached'}
+        """
+        if not dns_available:
+            raise DnsQueryError('dnspython not installed')
+        qname = name if name.endswith('.') else name + '.'
+        start = time.perf_counter()
+        levels = []
+        zone = '.'
+        servers = self.root_servers[:self.max_servers]
+        if use_cache:
+            zone, servers, skipped = self._cached_start(qname)
+            levels.extend(skipped)
+
+        result = {'name': qname, 'type': rdtype, 'levels': levels, 'answers': [], 'cname': None,
+                  'complete': False, 'outcome': None, 'elapsed': None}
+        for _ in range(MAX_LEVELS):
+            if not servers:
+                result['outcome'] = 'no reachable nameservers'
+                break
+            hops = list(self._executor.map(lambda server: self._ask(server, qname, rdtype, zone), servers))
+            level = {'zone': zone, 'servers': hops, 'cached': False}
+            level.update(_compare(hops))
+            levels.append(level)
+
+            kinds = Counter(hop['kind'] for hop in hops if hop['kind'] not in ('error', 'lame'))
+            if not kinds:
+                result['outcome'] = 'all nameservers failed'
+                break
+            kind = kinds.most_common(1)[0][0]
+            if kind != 'referral':
+                final = [hop for hop in hops if hop['kind'] == kind]
+                result['outcome'] = kind
+                result['complete'] = True
+                # 采用多数服务器的应答，不一致的服务器记录在该级的 inconsistencies 中
+                cname, answers = Counter(
+                    (hop['cname'], tuple(sorted(hop['answers']))) for hop in final
+                ).most_common(1)[0][0]
+                result['answers'] = list(answers)
+                result['cname'] = cname
+                break
+
+            # 采用多数服务器给出的委派，合并各服务器返回的 NS 和 glue
+            delegation = Counter(hop['delegation'] for hop in hops if hop['kind'] == 'referral').most_common(1)[0][0]
+            referrals = [hop for hop in hops if hop['kind'] == 'referral' and hop['delegation'] == delegation]
+            ns_names = sorted({ns for hop in referrals for ns in hop['ns']})
+            glue = {}
+            for hop in referrals:
+                for ns, addresses in hop['glue'].items():
+                    glue.setdefault(ns, set()).update(addresses)
+            servers = self._next_servers(ns_names, glue, _depth)
+            self._cache_delegation(delegation, servers, min(hop['ttl'] or 0 for hop in referrals))
+            zone = delegation
+        else:
+            result['outcome'] = 'too many delegations'
+
+        result['elapsed'] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    def _next_servers(self, ns_names, glue, depth):
+        """下一级的服务器：优先 glue 地址，没有 glue 时通过缓存或子追踪解析 NS 地址"""
+        servers = []
+        for ns in ns_names:
+            addresses = sorted(glue.get(ns, ())) or self._resolve_address(ns, depth)
+            if addresses:
+                servers.append({'name': ns.rstrip('.'), 'address': addresses[0]})
+            if len(servers) >= self.max_servers:
+                break
+        return servers
+
+    def _resolve_address(self, ns, depth):
+        now = time.time()
+        with self._lock:
+            cached = self._addresses.get(ns)
+            if cached and cached[0] > now:
+                return cached[1]
+        if depth >= MAX_SUBTRACE_DEPTH:
+            return []
+        try:
+            sub = self.trace(ns, 'A', use_cache=True, _depth=depth + 1)
+        except DnsQueryError as e:
+            logger.debug(f"Cannot resolve nameserver {ns}: {e}")
+            return []
+        addresses = sub['answers']
+        ttl = min((hop['ttl'] or 0 for hop in sub['levels'][-1]['servers']), default=0) if sub['levels'] else 0
+        with self._lock:
+            self._addresses[ns] = (now + max(ttl, 60), addresses)
+        return addresses
+
+    # ========== 委派缓存 ==========
+
+    def _cache_delegation(self, zone, servers, ttl):
+        if not servers:
+            return
+        with self._lock:
+            self._delegations[zone] = (time.time() + min(max(ttl, 60), DELEGATION_CACHE_MAX_TTL), servers)
+
+    def _cached_start(self, qname):
+        """找到查询名最深的已缓存委派"""
+        name = dns.name.from_text(qname)
+        now = time.time()
+        with self._lock:
+            for depth in range(len(name.labels) - 1):
+                zone = name.split(len(name.labels) - depth)[1].to_text()
+                cached = self._delegations.get(zone)
+                if cached and cached[0] > now:
+                    skipped = [{'zone': '.', 'servers': [], 'cached': True, 'delegation': zone,
+                                'consistent': True, 'inconsistencies': [], 'unreachable': []}]
+                    return zone, cached[1], skipped
+        return '.', self.root_servers[:self.max_servers], []
+
+    def delegations(self):
+        """当前缓存的委派 {zone: [NS]}"""
+        now = time.time()
+        with self._lock:
+            return {zone: [s['name'] for s in servers]
+                    for zone, (expires, servers) in self._delegations.items() if expires > now}
+
+
+def _compare(hops):
+    """比较同一级服务器的响应"""
+    answered = [hop for hop in hops if hop['kind'] != 'error']
+    signatures = {}
+    for hop in answered:
+        if hop['kind'] == 'referral':
+            signature = ('referral', hop['delegation'], tuple(hop['ns']))
+        else:
+            signature = (hop['kind'], hop['cname'], tuple(hop['answers']))
+        signatures.setdefault(signature, []).append(hop['name'])
+
+    inconsistencies = []
+    if len(signatures) > 1:
+        majority = max(signatures, key=lambda s: len(signatures[s]))
+        for signature, names in signatures.items():
+            if signature != majority:
+                inconsistencies.append({'servers': names, 'got': _describe(signature),
+                                        'expected': _describe(majority)})
+    return {
+        'consistent': not inconsistencies,
+        'inconsistencies': inconsistencies,
+        'unreachable': [hop['name'] for hop in hops if hop['kind'] == 'error']
+    }
+
+
+def _describe(signature):
+    kind, target, values = signature
+    if kind == 'referral':
+        return {'kind': kind, 'delegation': target, 'ns': list(values)}
+    return {'kind': kind, 'cname': target, 'answers': list(values)}
+
+
+def analyze_trace(trace):
+    """
+    汇总追踪结果
+
+    Returns:
+        dict: {'complete', 'outcome', 'totalLatency', 'slowestHop', 'inconsistentZones', 'lameServers', 'unreachable'}
+    """
+    slowest = None
+    path_latency = 0
+    inconsistent = []
+    lame = []
+    unreachable = []
+    for level in trace['levels']:
+        latencies = [hop['latency'] for hop in level['servers'] if hop['latency'] is not None]
+        if latencies:
+            # 实际解析器每级只需要最快的一个服务器响应
+            path_latency += min(latencies)
+        for hop in level['servers']:
+            if hop['latency'] is not None and (slowest is None or hop['latency'] > slowest['latency']):
+                slowest = {'zone': level['zone'], 'server': hop['name'], 'latency': hop['latency']}
+            if hop['kind'] == 'lame':
+                lame.append({'zone': level['zone'], 'server': hop['name'], 'rcode': hop['rcode']})
+        if not level['consistent']:
+            inconsistent.append({'zone': level['zone'], 'details': level['inconsistencies']})
+        unreachable.extend({'zone': level['zone'], 'server': name} for name in level.get('unreachable', []))
+    return {
+        'complete': trace['complete'],
+        'outcome': trace['outcome'],
+        'answers': trace['answers'],
+        'pathLatency': round(path_latency, 2),
+        'elapsed': trace['elapsed'],
+        'slowestHop': slowest,
+        'inconsistentZones': inconsistent,
+        'lameServers': lame,
+        'unreachable': unreachable
+    }
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_dns_tracer():
+    """获取全局追踪器（委派缓存在多次追踪间共享）"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = DnsTracer()
+    return _tracer
@@ -0,0 +1,615 @@
+"""
+NAS文件索引模块
+使用SQLite保存存储卷的文件条目与目录累计大小，供后台统计、搜索等功能共享。
+文件名搜索使用 FTS5 trigram 全文索引，短关键词走文件名前缀索引
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+
+# 索引数据库路径
+NAS_INDEX_DB_PATH = os.getenv('NAS_INDEX_DB_PATH', '/app/data/nas_index.db')
+
+# 存储卷挂载点配置，格式: vol1:/volume1,vol2:/volume2
+NAS_VOLUME_MOUNTS = os.getenv('NAS_VOLUME_MOUNTS', 'vol1:/volume1,vol2:/volume2')
+
+# 批量写入的条目数
+INDEX_BATCH_SIZE = 5000
+
+# 搜索结果数量上限
+SEARCH_MAX_LIMIT = 500
+
+# 选择查询计划时估算的行数上限
+SEARCH_PLAN_CAP = 5000
+
+# 条目写入语句（路径冲突时更新，保持 rowid 不变，全文索引无需重建该条目）
+_UPSERT_ENTRY = (
+    'INSERT INTO entries (path, parent, volume, name, ext, is_dir, size, mtime, scan_id) '
+    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+    'ON CONFLICT(path) DO UPDATE SET volume = excluded.volume, ext = excluded.ext, '
+    'is_dir = excluded.is_dir, size = excluded.size, mtime = excluded.mtime, scan_id = excluded.scan_id'
+)
+
+
+def load_volume_mounts(spec=None):
+    """
+    解析存储卷挂载点配置
+
+    Args:
+        spec: 配置字符串，默认读取 NAS_VOLUME_MOUNTS
+
+    Returns:
+        dict: {volume_id: mount_point}
+    """
+    volumes = {}
+    for item in (spec if spec is not None else NAS_VOLUME_MOUNTS).split(','):
+        item = item.strip()
+        if not item or ':' not in item:
+            continue
+        volume_id, mount_point = item.split(':', 1)
+        volumes[volume_id.strip()] = os.path.normpath(mount_point.strip())
+    return volumes
+
+
+def file_ext(name, is_dir=False):
+    """获取小写扩展名（不含点），目录返回空字符串"""
+    if is_dir:
+        return ''
+    return os.path.splitext(name)[1].lower().lstrip('.')
+
+
+def ancestors_of(path, root):
+    """
+    返回 path 的所有祖先目录（直到 root，包含 root）
+
+    Args:
+        path: 文件或目录路径
+        root: 存储卷根目录
+
+    Returns:
+        list: 由近及远的祖先目录列表
+    """
+    result = []
+    current = os.path.dirname(path)
+    while current and current.startswith(root):
+        result.append(current)
+        if current == root:
+            break
+        parent = os.path.dirname(current)
+        if parent == current:
+            break
+        current = parent
+    return result
+
+
+class FileIndex:
+    """NAS文件索引（SQLite，WAL模式，读写分离连接）"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or NAS_INDEX_DB_PATH
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.fts_enabled = False
+
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._init_schema()
+
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        """初始化表结构"""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT NOT NULL,
+                    volume TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    ext TEXT NOT NULL DEFAULT '',
+                    is_dir INTEGER NOT NULL DEFAULT 0,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    mtime REAL NOT NULL DEFAULT 0,
+                    scan_id INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries(parent);
+                CREATE INDEX IF NOT EXISTS idx_entries_volume_scan ON entries(volume, scan_id);
+
+                CREATE TABLE IF NOT EXISTS dir_totals (
+                    path TEXT PRIMARY KEY,
+                    volume TEXT NOT NULL,
+                    parent TEXT NOT NULL,
+                    total_size INTEGER NOT NULL DEFAULT 0,
+                    file_count INTEGER NOT NULL DEFAULT 0,
+                    dir_count INTEGER NOT NULL DEFAULT 0,
+                    computed_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_dir_totals_parent ON dir_totals(parent, total_size);
+
+                CREATE TABLE IF NOT EXISTS scans (
+                    volume TEXT PRIMARY KEY,
+                    scan_id INTEGER NOT NULL,
+                    started_at REAL NOT NULL,
+                    finished_at REAL,
+                    entries INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    partial_hash TEXT,
+                    full_hash TEXT,
+                    hashed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_file_hashes_full ON file_hashes(full_hash);
+
+                CREATE TABLE IF NOT EXISTS dedup_reports (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at REAL NOT NULL,
+                    finished_at REAL NOT NULL,
+                    algorithm TEXT NOT NULL,
+                    files_scanned INTEGER NOT NULL,
+                    files_hashed INTEGER NOT NULL,
+                    bytes_hashed INTEGER NOT NULL,
+                    group_count INTEGER NOT NULL,
+                    wasted_bytes INTEGER NOT NULL,
+                    groups TEXT NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS dedup_scan (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    volume TEXT,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    pending INTEGER NOT NULL DEFAULT 0,
+                    started_at REAL NOT NULL,
+                    finished_at REAL,
+                    report_id INTEGER
+                );
+            ''')
+
+            # 旧版本索引没有 ext 列
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(entries)')}
+            if 'ext' not in columns:
+                conn.execute("ALTER TABLE entries ADD COLUMN ext TEXT NOT NULL DEFAULT ''")
+
+            conn.executescript('''
+                CREATE INDEX IF NOT EXISTS idx_entries_name ON entries(name COLLATE NOCASE);
+                CREATE INDEX IF NOT EXISTS idx_entries_ext_size ON entries(ext, size);
+                CREATE INDEX IF NOT EXISTS idx_entries_size ON entries(size);
+                CREATE INDEX IF NOT EXISTS idx_entries_mtime ON entries(mtime);
+            ''')
+
+        self._init_search_schema(conn)
+
+    def _init_search_schema(self, conn):
+        """初始化 trigram 全文索引（SQLite 3.34+），不支持时退化为 LIKE 查询"""
+        with self._write_lock, conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'entry_names'"
+            ).fetchone()
+            try:
+                # 外部内容表不使用触发器：全量扫描结束时整体重建，增量事件单独维护
+                # （存储卷扫描进行中时增量事件不维护全文索引，由扫描结束时的重建覆盖）
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS entry_names USING fts5("
+                    "name, path, content='entries', content_rowid='rowid', tokenize='trigram')"
+                )
+            except sqlite3.OperationalError:
+                return
+
+            if not exists:
+                # 已有条目补建全文索引（ext 列在下次扫描时补齐）
+                conn.execute("INSERT INTO entry_names(entry_names) VALUES ('rebuild')")
+        self.fts_enabled = True
+
+    # ========== 全量扫描写入 ==========
+
+    def begin_scan(self, volume):
+        """
+        开始一次存储卷扫描
+
+        Returns:
+            int: 本次扫描ID
+        """
+        conn = self._connect()
+        with self._write_lock, conn:
+            row = conn.execute('SELECT scan_id FROM scans WHERE volume = ?', (volume,)).fetchone()
+            scan_id = (row['scan_id'] if row else 0) + 1
+            conn.execute(
+                'INSERT OR REPLACE INTO scans (volume, scan_id, started_at, finished_at, entries, status) '
+                'VALUES (?, ?, ?, NULL, 0, ?)',
+                (volume, scan_id, time.time(), 'running')
+            )
+        return scan_id
+
+    def write_entries(self, volume, scan_id, rows):
+        """
+        批量写入文件条目
+
+        Args:
+            volume: 存储卷ID
+            scan_id: 扫描ID
+            rows: [(path, parent, name, is_dir, size, mtime), ...]
+        """
+        if not rows:
+            return
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.executemany(
+                _UPSERT_ENTRY,
+                [(p, parent, volume, name, file_ext(name, is_dir), is_dir, size, mtime, scan_id)
+                 for p, parent, name, is_dir, size, mtime in rows]
+            )
+
+    def finish_scan(self, volume, scan_id, totals, entry_count):
+        """
+        完成扫描：清理本次未出现的条目并替换目录累计大小
+
+        Args:
+            volume: 存储卷ID
+            scan_id: 扫描ID
+            totals: {dir_path: (parent, total_size, file_count, dir_count)}
+            entry_count: 扫描到的条目数
+        """
+        now = time.time()
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute('DELETE FROM entries WHERE volume = ? AND scan_id != ?', (volume, scan_id))
+            if self.fts_enabled:
+                # 批量重建比逐行维护快得多
+                conn.execute("INSERT INTO entry_names(entry_names) VALUES ('rebuild')")
+            conn.execute('DELETE FROM dir_totals WHERE volume = ?', (volume,))
+            conn.executemany(
+                'INSERT INTO dir_totals (path, volume, parent, total_size, file_count, dir_count, computed_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(path, volume, parent, size, files, dirs, now, now)
+                 for path, (parent, size, files, dirs) in totals.items()]
+            )
+            conn.execute(
+                'UPDATE scans SET finished_at = ?, entries = ?, status = ? WHERE volume = ? AND scan_id = ?',
+                (now, entry_count, 'completed', volume, scan_id)
+            )
+            # 更新统计信息，便于查询规划器选择合适的索引
+            conn.execute('PRAGMA analysis_limit=1000')
+            conn.execute('PRAGMA optimize')
+
+    def fail_scan(self, volume, scan_id, error):
+        """标记扫描失败"""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                'UPDATE scans SET finished_at = ?, status = ? WHERE volume = ? AND scan_id = ?',
+                (time.time(), f'failed: {error}', volume, scan_id)
+            )
+            if self.fts_enabled:
+                # 扫描期间写入的条目尚未进入全文索引
+                conn.execute("INSERT INTO entry_names(entry_names) VALUES ('rebuild')")
+
+    # ========== 增量更新 ==========
+
+    def apply_change(self, volume, root, path, size_delta, count_delta, entry=None):
+        """
+        根据文件变更事件增量更新条目和所有祖先目录的累计大小
+
+        Args:
+            volume: 存储卷ID
+            root: 存储卷根目录
+            path: 变更的文件路径
+            size_delta: 大小变化量（字节）
+            count_delta: 文件数变化量
+            entry: 新的条目 (name, size, mtime)，为 None 表示删除
+        """
+        now = time.time()
+        parents = ancestors_of(path, root)
+        conn = self._connect()
+        with self._write_lock, conn:
+            # 立即获取写锁，扫描状态的读取与条目写入在同一事务中（扫描可能在其他进程中结束）
+            if not conn.in_transaction:
+                conn.execute('BEGIN IMMEDIATE')
+            scan = conn.execute('SELECT scan_id, status FROM scans WHERE volume = ?', (volume,)).fetchone()
+            # 扫描进行中写入的条目不在全文索引中，逐行 'delete' 会损坏外部内容索引
+            maintain_fts = self.fts_enabled and not (scan and scan['status'] == 'running')
+
+            old = conn.execute('SELECT rowid, name, path FROM entries WHERE path = ?', (path,)).fetchone()
+            if old is not None and maintain_fts:
+                conn.execute(
+                    "INSERT INTO entry_names(entry_names, rowid, name, path) VALUES ('delete', ?, ?, ?)",
+                    (old['rowid'], old['name'], old['path'])
+                )
+
+            if entry is None:
+                conn.execute('DELETE FROM entries WHERE path = ?', (path,))
+            else:
+                name, size, mtime = entry
+                conn.execute(
+                    _UPSERT_ENTRY,
+                    (path, os.path.dirname(path), volume, name, file_ext(name), 0, size, mtime,
+                     scan['scan_id'] if scan else 0)
+                )
+                if maintain_fts:
+                    conn.execute(
+                        'INSERT INTO entry_names(rowid, name, path) SELECT rowid, name, path FROM entries WHERE path = ?',
+                        (path,)
+                    )
+
+            if parents and (size_delta or count_delta):
+                conn.executemany(
+                    'UPDATE dir_totals SET total_size = total_size + ?, file_count = file_count + ?, '
+                    'updated_at = ? WHERE path = ?',
+                    [(size_delta, count_delta, now, p) for p in parents]
+                )
+
+    # ========== 重复文件 ==========
+
+    def iter_size_candidates(self, min_size=1, volume=None):
+        """
+        按大小排序返回存在同大小文件的条目，并附带仍然有效的已缓存哈希
+
+        Yields:
+            dict: {path, size, mtime, partial_hash, full_hash}
+        """
+        volume_filter = 'AND volume = ?' if volume else ''
+        params = [min_size] + ([volume] if volume else [])
+        sql = f'''
+            SELECT e.path, e.size, e.mtime,
+                   CASE WHEN h.size = e.size AND h.mtime = e.mtime THEN h.partial_hash END AS partial_hash,
+                   CASE WHEN h.size = e.size AND h.mtime = e.mtime THEN h.full_hash END AS full_hash
+            FROM entries e
+            LEFT JOIN file_hashes h ON h.path = e.path
+            WHERE e.is_dir = 0 AND e.size IN (
+                SELECT size FROM entries
+                WHERE is_dir = 0 AND size >= ? {volume_filter}
+                GROUP BY size HAVING COUNT(*) > 1
+            ) {volume_filter.replace('volume', 'e.volume')}
+            ORDER BY e.size DESC
+        '''
+        for row in self._connect().execute(sql, params + ([volume] if volume else [])):
+            yield dict(row)
+
+    def save_hashes(self, rows):
+        """
+        保存文件哈希
+
+        Args:
+            rows: [(path, size, mtime, partial_hash, full_hash), ...]
+        """
+        if not rows:
+            return
+        now = time.time()
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.executemany(
+                'INSERT INTO file_hashes (path, size, mtime, partial_hash, full_hash, hashed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime, '
+                'partial_hash = excluded.partial_hash, '
+                'full_hash = COALESCE(excluded.full_hash, CASE WHEN file_hashes.size = excluded.size '
+                'AND file_hashes.mtime = excluded.mtime THEN file_hashes.full_hash END), '
+                'hashed_at = excluded.hashed_at',
+                [(path, size, mtime, partial, full, now) for path, size, mtime, partial, full in rows]
+            )
+
+    def begin_dedup_scan(self, volume=None):
+        """记录重复文件扫描开始（只保留最近一次扫描的状态）"""
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO dedup_scan (id, volume, status, stage, pending, started_at, finished_at, '
+                'report_id) VALUES (1, ?, ?, ?, 0, ?, NULL, NULL)',
+                (volume, 'running', 'size', time.time())
+            )
+
+    def update_dedup_scan(self, **fields):
+        """
+        更新重复文件扫描状态
+
+        Args:
+            **fields: status / stage / pending / finished_at / report_id
+        """
+        unknown = set(fields) - {'status', 'stage', 'pending', 'finished_at', 'report_id'}
+        if unknown:
+            raise ValueError(f'Unknown dedup scan fields: {sorted(unknown)}')
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                f"UPDATE dedup_scan SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = 1",
+                tuple(fields.values())
+            )
+
+    def get_dedup_scan(self):
+        """获取最近一次重复文件扫描状态"""
+        row = self._connect().execute('SELECT * FROM dedup_scan WHERE id = 1').fetchone()
+        return dict(row) if row else None
+
+    def save_dedup_report(self, report):
+        """保存重复文件报告，返回报告ID"""
+        conn = self._connect()
+        with self._write_lock, conn:
+            cursor = conn.execute(
+                'INSERT INTO dedup_reports (started_at, finished_at, algorithm, files_scanned, files_hashed, '
+                'bytes_hashed, group_count, wasted_bytes, groups) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (report['started_at'], report['finished_at'], report['algorithm'], report['files_scanned'],
+                 report['files_hashed'], report['bytes_hashed'], report['group_count'],
+                 report['wasted_bytes'], json.dumps(report['groups'], ensure_ascii=False))
+            )
+            # 只保留最近10份报告
+            conn.execute('DELETE FROM dedup_reports WHERE id <= ?', (cursor.lastrowid - 10,))
+        return cursor.lastrowid
+
+    def get_dedup_report(self, report_id=None):
+        """获取重复文件报告（默认最新一份）"""
+        conn = self._connect()
+        if report_id is None:
+            row = conn.execute('SELECT * FROM dedup_reports ORDER BY id DESC LIMIT 1').fetchone()
+        else:
+            row = conn.execute('SELECT * FROM dedup_reports WHERE id = ?', (report_id,)).fetchone()
+        if row is None:
+            return None
+        report = dict(row)
+        report['groups'] = json.loads(report['groups'])
+        return report
+
+    # ========== 查询 ==========
+
+    def get_entry(self, path):
+        """获取单个条目"""
+        row = self._connect().execute('SELECT * FROM entries WHERE path = ?', (path,)).fetchone()
+        return dict(row) if row else None
+
+    def get_dir_total(self, path):
+        """获取目录累计大小"""
+        row = self._connect().execute('SELECT * FROM dir_totals WHERE path = ?', (path,)).fetchone()
+        return dict(row) if row else None
+
+    def get_child_totals(self, path, limit=50):
+        """按累计大小倒序获取子目录"""
+        rows = self._connect().execute(
+            'SELECT * FROM dir_totals WHERE parent = ? AND path != ? ORDER BY total_size DESC LIMIT ?',
+            (path, path, limit)
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_scan(self, volume):
+        """获取存储卷最近一次扫描信息"""
+        row = self._connect().execute('SELECT * FROM scans WHERE volume = ?', (volume,)).fetchone()
+        return dict(row) if row else None
+
+    def search(self, q=None, exts=None, min_size=None, max_size=None, modified_after=None,
+               volume=None, kind=None, in_path=False, limit=50, offset=0):
+        """
+        搜索文件名/路径
+
+        Args:
+            q: 关键词；3个字符及以上走 trigram 子串匹配，更短时按文件名前缀匹配
+            exts: 扩展名列表（小写，不含点）
+            min_size: 最小文件大小（字节）
+            max_size: 最大文件大小（字节）
+            modified_after: 修改时间下限（时间戳）
+            volume: 存储卷ID
+            kind: 'file' 或 'dir'
+            in_path: 是否在完整路径中匹配关键词（默认只匹配文件名）
+            limit: 返回数量
+            offset: 偏移量
+
+        Returns:
+            list: 匹配的条目
+        """
+        where = []
+        params = []
+
+        if exts:
+            where.append(f"e.ext IN ({','.join('?' * len(exts))})")
+            params.extend(exts)
+        if min_size is not None:
+            where.append('e.size >= ?')
+            params.append(min_size)
+        if max_size is not None:
+            where.append('e.size <= ?')
+            params.append(max_size)
+        if modified_after is not None:
+            where.append('e.mtime >= ?')
+            params.append(modified_after)
+        if volume:
+            where.append('e.volume = ?')
+            params.append(volume)
+        if kind in ('file', 'dir'):
+            where.append('e.is_dir = ?')
+            params.append(1 if kind == 'dir' else 0)
+
+        source = 'entries e'
+        order = None
+        q = (q or '').strip()
+        column = 'path' if in_path else 'name'
+
+        if not q:
+            order = 'e.mtime DESC'
+            if where and self._count_capped(' AND '.join(where), params) >= SEARCH_PLAN_CAP:
+                # 过滤条件命中很多行时，沿 mtime 索引倒序扫描可以提前结束
+                source = 'entries e INDEXED BY idx_entries_mtime'
+        elif len(q) < 3 and not in_path:
+            prefix = [q, q + '\U0010ffff']
+            # 前缀范围查询默认使用 name 上的 NOCASE 索引；其他条件更有选择性时用 +e.name 关闭该索引
+            name_expr = 'e.name' if self._text_is_selective(
+                'SELECT 1 FROM entries e WHERE e.name >= ? COLLATE NOCASE AND e.name < ? COLLATE NOCASE',
+                prefix, where, params
+            ) else '+e.name'
+            where.insert(0, f'{name_expr} >= ? COLLATE NOCASE AND {name_expr} < ? COLLATE NOCASE')
+            params[0:0] = prefix
+        elif len(q) >= 3 and self.fts_enabled and self._text_is_selective(
+                'SELECT 1 FROM entry_names WHERE entry_names MATCH ?', [_fts_phrase(column, q)], where, params):
+            source = 'entry_names f JOIN entries e ON e.rowid = f.rowid'
+            where.insert(0, 'entry_names MATCH ?')
+            params.insert(0, _fts_phrase(column, q))
+        else:
+            # 其他条件更有选择性（或不支持全文索引）时，先走普通索引再做子串过滤
+            where.insert(0, f"e.{column} LIKE ? ESCAPE '\\'")
+            params.insert(0, '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+
+        sql = f'SELECT e.path, e.name, e.ext, e.volume, e.is_dir, e.size, e.mtime FROM {source}'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        if order:
+            sql += f' ORDER BY {order}'
+        sql += ' LIMIT ? OFFSET ?'
+        params.extend([min(max(limit, 1), SEARCH_MAX_LIMIT), max(offset, 0)])
+
+        return [dict(r) for r in self._connect().execute(sql, params).fetchall()]
+
+    def _text_is_selective(self, text_sql, text_params, where, params):
+        """
+        估算关键词条件与其他过滤条件的选择性，决定是否按关键词索引查询
+
+        两边都只统计到 SEARCH_PLAN_CAP 为止，估算成本有上限
+        """
+        if not where:
+            return True
+        conn = self._connect()
+        matches = conn.execute(
+            f'SELECT COUNT(*) FROM ({text_sql} LIMIT ?)', list(text_params) + [SEARCH_PLAN_CAP]
+        ).fetchone()[0]
+        if matches < SEARCH_PLAN_CAP:
+            return True
+        return self._count_capped(' AND '.join(where), params) >= SEARCH_PLAN_CAP
+
+    def _count_capped(self, condition, params):
+        """统计满足条件的条目数，最多统计到 SEARCH_PLAN_CAP"""
+        return self._connect().execute(
+            f'SELECT COUNT(*) FROM (SELECT 1 FROM entries e WHERE {condition} LIMIT ?)',
+            list(params) + [SEARCH_PLAN_CAP]
+        ).fetchone()[0]
+
+
+def _fts_phrase(column, q):
+    """构造限定列的 FTS5 短语查询"""
+    return f'{column} : "' + q.replace('"', '""') + '"'
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_file_index():
+    """获取全局文件索引"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = FileIndex()
+    return _index
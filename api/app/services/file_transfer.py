@@ -0,0 +1,146 @@
+"""
+NAS文件传输模块
+提供存储卷路径校验和流式上传写入，下载由 send_file 交给 wsgi.file_wrapper 处理
+"""
+
+import os
+import uuid
+
+from .file_index import load_volume_mounts
+
+# 上传写入缓冲区大小与 fsync 批量阈值（字节）
+NAS_UPLOAD_BUFFER_SIZE = int(os.getenv('NAS_UPLOAD_BUFFER_SIZE', str(1024 * 1024)))
+NAS_UPLOAD_FSYNC_BYTES = int(os.getenv('NAS_UPLOAD_FSYNC_BYTES', str(64 * 1024 * 1024)))
+
+
+class TransferError(Exception):
+    """文件传输错误"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def resolve_volume_path(path, volumes=None):
+    """
+    将请求路径解析为存储卷内的真实路径
+
+    Args:
+        path: 请求的文件路径
+        volumes: 存储卷挂载点，默认读取配置
+
+    Returns:
+        str: 解析后的绝对路径
+
+    Raises:
+        TransferError: 路径为空或不在任何存储卷内
+    """
+    if not path:
+        raise TransferError('path is required')
+
+    real_path = os.path.realpath(path)
+    for root in (volumes or load_volume_mounts()).values():
+        real_root = os.path.realpath(root)
+        if real_path == real_root or real_path.startswith(real_root + os.sep):
+            return real_path
+
+    raise TransferError('Path is not on a NAS volume', 403)
+
+
+def stream_to_file(stream, dest_path, overwrite=False, content_length=None,
+                   buffer_size=None, fsync_bytes=None):
+    """
+    将请求体流式写入文件
+
+    通过固定大小的缓冲区循环读写，每写入 fsync_bytes 字节批量 fsync 一次，
+    先写入同目录临时文件，完成后原子替换目标文件
+
+    Args:
+        stream: 输入流（request.stream）
+        dest_path: 目标文件路径
+        overwrite: 是否覆盖已有文件
+        content_length: 请求声明的长度，用于校验是否完整
+        buffer_size: 缓冲区大小
+        fsync_bytes: fsync 批量阈值
+
+    Returns:
+        dict: {'path', 'size', 'old_size'}
+    """
+    buffer_size = buffer_size or NAS_UPLOAD_BUFFER_SIZE
+    fsync_bytes = fsync_bytes or NAS_UPLOAD_FSYNC_BYTES
+
+    directory = os.path.dirname(dest_path)
+    if not os.path.isdir(directory):
+        raise TransferError('Parent directory not found', 404)
+
+    old_size = None
+    if os.path.exists(dest_path):
+        if not overwrite:
+            raise TransferError('File already exists', 409)
+        if os.path.isdir(dest_path):
+            raise TransferError('Path is a directory', 409)
+        old_size = os.path.getsize(dest_path)
+
+    tmp_path = os.path.join(directory, f'.{os.path.basename(dest_path)}.upload-{uuid.uuid4().hex}')
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    readinto = getattr(stream, 'readinto', None)
+    written = 0
+    unsynced = 0
+
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        while True:
+            if readinto is not None:
+                n = readinto(buf)
+                chunk = view[:n] if n else None
+            else:
+                data = stream.read(buffer_size)
+                n = len(data)
+                chunk = data
+            if not n:
+                break
+
+            while chunk:
+                sent = os.write(fd, chunk)
+                chunk = chunk[sent:]
+            written += n
+            unsynced += n
+
+            if unsynced >= fsync_bytes:
+                os.fsync(fd)
+                unsynced = 0
+
+        if content_length is not None and written != content_length:
+            raise TransferError(f'Incomplete upload: {written}/{content_length} bytes')
+
+        os.fsync(fd)
+    except BaseException:
+        os.close(fd)
+        os.unlink(tmp_path)
+        raise
+    else:
+        os.close(fd)
+
+    os.replace(tmp_path, dest_path)
+    _fsync_dir(directory)
+
+    return {
+        'path': dest_path,
+        'size': written,
+        'old_size': old_size
+    }
+
+
+def _fsync_dir(directory):
+    """同步目录项，确保重命名落盘"""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,133 @@
+"""
+frpc 管理接口客户端
+访问 frpc webServer 提供的 /api/status、/api/reload 等接口，使用连接池复用 HTTP 连接
+"""
+
+import os
+import threading
+
+import requests
+
+# 管理接口地址（为空时从 frpc.toml 的 webServer 配置推导）与超时（秒）
+FRPC_ADMIN_URL = os.getenv('FRPC_ADMIN_URL', '')
+FRPC_ADMIN_USER = os.getenv('FRPC_ADMIN_USER', '')
+FRPC_ADMIN_PASSWORD = os.getenv('FRPC_ADMIN_PASSWORD', '')
+FRPC_ADMIN_TIMEOUT = float(os.getenv('FRPC_ADMIN_TIMEOUT', '3'))
+
+
+class FrpAdminError(Exception):
+    """frpc 管理接口错误"""
+
+
+class FrpAdminClient:
+    """frpc 管理接口客户端"""
+
+    def __init__(self, base_url, user='', password='', timeout=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout or FRPC_ADMIN_TIMEOUT
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if user:
+            self.session.auth = (user, password)
+
+    def _request(self, method, endpoint, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(method, f'{self.base_url}{endpoint}', **kwargs)
+        except requests.exceptions.RequestException as e:
+            raise FrpAdminError(f'frpc admin API unavailable: {e}')
+        if response.status_code >= 400:
+            raise FrpAdminError(f'frpc admin API {endpoint} returned {response.status_code}: {response.text.strip()}')
+        return response
+
+    def status(self):
+        """
+        获取代理运行状态
+
+        Returns:
+            dict: {代理类型: [{'name', 'type', 'status', 'err', 'local_addr', 'remote_addr'}, ...]}
+        """
+        return self._request('GET', '/api/status').json()
+
+    def reload(self, strict=True):
+        """
+        让 frpc 重新读取配置文件，只增删/重建有变化的代理
+
+        Args:
+            strict: 严格校验配置（未知字段视为错误）
+        """
+        params = {'strictConfig': 'true'} if strict else None
+        self._request('GET', '/api/reload', params=params)
+
+    def get_config(self):
+        """获取 frpc 当前使用的配置文件内容"""
+        return self._request('GET', '/api/config').text
+
+    def is_ready(self):
+        """管理接口是否可用"""
+        try:
+            self.status()
+            return True
+        except (FrpAdminError, ValueError):
+            return False
+
+    def close(self):
+        self.session.close()
+
+
+def admin_endpoint(config=None):
+    """
+    获取管理接口地址与认证信息
+
+    优先使用环境变量 FRPC_ADMIN_URL，否则读取 frpc 配置中的 webServer.addr/port/user/password
+
+    Args:
+        config: FrpConfig
+
+    Returns:
+        tuple: (base_url, user, password)，未配置管理接口时返回 None
+    """
+    if FRPC_ADMIN_URL:
+        return FRPC_ADMIN_URL, FRPC_ADMIN_USER, FRPC_ADMIN_PASSWORD
+    if config is None:
+        return None
+
+    web = config.raw.get('webServer') or {}
+    port = web.get('port')
+    if not port:
+        return None
+    addr = web.get('addr') or '127.0.0.1'
+    if addr in ('0.0.0.0', '::'):
+        addr = '127.0.0.1'
+    return (
+        f'http://{addr}:{port}',
+        FRPC_ADMIN_USER or web.get('user', ''),
+        FRPC_ADMIN_PASSWORD or web.get('password', '')
+    )
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_admin_client(config=None):
+    """
+    获取管理接口客户端（按地址复用，保持连接池）
+
+    Args:
+        config: FrpConfig
+
+    Returns:
+        FrpAdminClient: 未配置管理接口时返回 None
+    """
+    endpoint = admin_endpoint(config)
+    if endpoint is None:
+        return None
+    with _clients_lock:
+        client = _clients.get(endpoint)
+        if client is None:
+            client = FrpAdminClient(*endpoint)
+            _clients[endpoint] = client
+        return client
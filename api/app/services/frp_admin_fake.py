@@ -0,0 +1,148 @@
+"""
+本地模拟 frpc 管理接口
+实现 /api/status、/api/reload、/api/config，reload 时按代理差异只重建有变化的代理，
+用于测试和没有 frpc 的开发环境（将 FRPC_ADMIN_URL 指向该服务）
+"""
+
+import json
+import base64
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from .frp_config import parse_toml, TomlDecodeError
+
+
+class FakeFrpAdminServer:
+    """模拟 frpc 管理接口"""
+
+    def __init__(self, config_path, user='', password='', host='127.0.0.1', port=0):
+        self.config_path = config_path
+        self.user = user
+        self.password = password
+        self.failing = set()
+        self.rejecting = set()
+        self.reload_count = 0
+        self.last_reloaded = []
+        self.proxies = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+        self._load(initial=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-frpc-admin', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def set_failing(self, *names):
+        """指定 reload 后启动失败的代理"""
+        self.failing = set(names)
+
+    def set_rejecting(self, *names):
+        """指定 reload 时拒绝的代理（配置中包含这些代理时 reload 返回错误，代理保持不变）"""
+        self.rejecting = set(names)
+
+    def _read_config(self):
+        with open(self.config_path, 'rb') as f:
+            return parse_toml(f.read().decode('utf-8'))
+
+    def _load(self, initial=False):
+        """按配置更新代理，只重建有变化的代理"""
+        config = self._read_config()
+        new = {p.get('name'): p for p in config.get('proxies', [])}
+        rejected = sorted(self.rejecting & set(new))
+        if rejected and not initial:
+            raise ValueError(f"invalid proxy {', '.join(rejected)}")
+        with self._lock:
+            rebuilt = [
+                name for name, raw in new.items()
+                if initial or name not in self.proxies or self.proxies[name]['raw'] != raw
+            ]
+            for name in list(self.proxies):
+                if name not in new:
+                    del self.proxies[name]
+            for name in rebuilt:
+                raw = new[name]
+                self.proxies[name] = {
+                    'raw': raw,
+                    'status': 'start error' if name in self.failing else 'running',
+                    'err': 'port unavailable' if name in self.failing else '',
+                    'generation': self.reload_count
+                }
+            if not initial:
+                self.reload_count += 1
+                self.last_reloaded = rebuilt
+
+    def status(self):
+        with self._lock:
+            grouped = {}
+            for name, proxy in self.proxies.items():
+                raw = proxy['raw']
+                grouped.setdefault(raw.get('type', 'tcp'), []).append({
+                    'name': name,
+                    'type': raw.get('type', 'tcp'),
+                    'status': proxy['status'],
+                    'err': proxy['err'],
+                    'local_addr': f"{raw.get('localIP', '127.0.0.1')}:{raw.get('localPort', 0)}",
+                    'plugin': '',
+                    'remote_addr': raw.get('subdomain', '') or str(raw.get('remotePort', ''))
+                })
+            return grouped
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, body, content_type='application/json'):
+                data = body.encode('utf-8') if isinstance(body, str) else body
+                self.send_response(code)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _authorized(self):
+                if not server.user:
+                    return True
+                expected = base64.b64encode(f'{server.user}:{server.password}'.encode()).decode()
+                return self.headers.get('Authorization') == f'Basic {expected}'
+
+            def do_GET(self):
+                if not self._authorized():
+                    return self._send(401, 'unauthorized', 'text/plain')
+                url = urlparse(self.path)
+                if url.path == '/api/status':
+                    return self._send(200, json.dumps(server.status()))
+                if url.path == '/api/reload':
+                    try:
+                        server._load()
+                    except (OSError, ValueError, TomlDecodeError) as e:
+                        return self._send(500, f'reload frpc proxy config error: {e}', 'text/plain')
+                    strict = parse_qs(url.query).get('strictConfig', ['false'])[0] == 'true'
+                    return self._send(200, json.dumps({'strict': strict}))
+                if url.path == '/api/config':
+                    with open(server.config_path, 'rb') as f:
+                        return self._send(200, f.read(), 'text/plain')
+                return self._send(404, 'not found', 'text/plain')
+
+        return Handler
@@ -0,0 +1,272 @@
+"""
+FRP配置备份存储模块
+备份内容按 SHA-256 内容寻址并压缩存储（优先 zstd，否则 gzip），相同内容只保存一份；
+备份列表由单个清单文件（时间、哈希、大小、标签）提供，列表接口不再逐个 stat 备份文件，
+并支持任意两个版本之间的差异比较
+"""
+
+import os
+import gzip
+import json
+import uuid
+import difflib
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from app.utils.file_lock import FileLock
+
+try:
+    import zstandard
+    zstd_available = True
+except ImportError:
+    zstd_available = False
+
+logger = logging.getLogger(__name__)
+
+FRP_BACKUP_DIR = os.getenv('FRP_BACKUP_DIR', '/frp/backups')
+
+MANIFEST_NAME = 'index.json'
+LEGACY_PREFIX = 'frpc_backup_'
+
+# 压缩格式：扩展名 -> (压缩, 解压)
+CODECS = {
+    'gz': (lambda data: gzip.compress(data, 9), gzip.decompress)
+}
+if zstd_available:
+    CODECS['zst'] = (
+        lambda data: zstandard.ZstdCompressor(level=19).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data)
+    )
+DEFAULT_CODEC = 'zst' if zstd_available else 'gz'
+
+
+class BackupNotFoundError(Exception):
+    """备份不存在"""
+
+
+class BackupStore:
+    """内容寻址的配置备份存储"""
+
+    def __init__(self, root=None):
+        self.root = root or FRP_BACKUP_DIR
+        self.manifest_path = os.path.join(self.root, MANIFEST_NAME)
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._manifest_key = None
+
+    # ---------- 清单 ----------
+
+    def _file_lock(self):
+        return FileLock(os.path.join(self.root, '.index.lock'))
+
+    def _load(self):
+        """读取清单（文件未变化时复用内存副本）"""
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if self._manifest is not None and self._manifest_key == key:
+            return self._manifest
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self._manifest, self._manifest_key = manifest, key
+        return manifest
+
+    def _save(self, manifest):
+        tmp_path = f'{self.manifest_path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest = None
+
+    def _load_for_write(self):
+        """在文件锁内读取清单，首次使用时导入旧格式的备份文件"""
+        manifest = self._load()
+        if manifest is None:
+            manifest = {'version': 1, 'backups': []}
+            self._import_legacy(manifest)
+        return manifest
+
+    def _import_legacy(self, manifest):
+        """导入 frpc_backup_<时间>.toml 形式的旧备份（原文件保留）"""
+        for filename in sorted(os.listdir(self.root)):
+            if not (filename.startswith(LEGACY_PREFIX) and filename.endswith('.toml')):
+                continue
+            path = os.path.join(self.root, filename)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                created = datetime.strptime(filename[len(LEGACY_PREFIX):-5], '%Y%m%d_%H%M%S')
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skip legacy backup {filename}: {e}")
+                continue
+            entry = self._add(manifest, data, label=filename, created=created)
+            entry['legacy_file'] = filename
+        if manifest['backups']:
+            logger.info(f"Imported {len(manifest['backups'])} legacy FRP backups")
+
+    # ---------- 对象 ----------
+
+    def _object_path(self, digest, codec):
+        return os.path.join(self.objects_dir, digest[:2], f'{digest}.{codec}')
+
+    def _write_object(self, digest, data):
+        """写入压缩对象，已存在时跳过（相同内容零成本）"""
+        for codec in CODECS:
+            path = self._object_path(digest, codec)
+            if os.path.exists(path):
+                return codec, os.path.getsize(path)
+        codec = DEFAULT_CODEC
+        path = self._object_path(digest, codec)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = CODECS[codec][0](data)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return codec, len(compressed)
+
+    def _add(self, manifest, data, label='', created=None):
+        digest = hashlib.sha256(data).hexdigest()
+        codec, stored_size = self._write_object(digest, data)
+        created = created or datetime.now()
+        entry = {
+            'id': f"{created.strftime('%Y%m%d_%H%M%S')}_{digest[:8]}",
+            'hash': digest,
+            'size': len(data),
+            'stored_size': stored_size,
+            'codec': codec,
+            'created': created.isoformat(),
+            'label': label or ''
+        }
+        ids = {b['id'] for b in manifest['backups']}
+        if entry['id'] in ids:
+            entry['id'] += f'_{uuid.uuid4().hex[:4]}'
+        manifest['backups'].append(entry)
+        return entry
+
+    # ---------- 公共接口 ----------
+
+    def create(self, content, label=''):
+        """
+        保存一个备份
+
+        内容与最近一次备份相同时不新增记录，直接返回最近一次备份
+
+        Args:
+            content: 配置文本
+            label: 备注
+
+        Returns:
+            tuple: (备份记录, 是否与最近一次备份重复)
+        """
+        data = content.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, self._file_lock():
+            manifest = self._load_for_write()
+            if manifest['backups'] and manifest['backups'][-1]['hash'] == digest:
+                return dict(manifest['backups'][-1]), True
+            entry = self._add(manifest, data, label)
+            self._save(manifest)
+            return dict(entry), False
+
+    def list(self):
+        """备份列表（新的在前），只读取清单文件"""
+        with self._lock:
+            manifest = self._load()
+        if manifest is None:
+            if not os.path.isdir(self.root):
+                return []
+            # 尚未建立清单，导入旧备份
+            with self._lock, self._file_lock():
+                manifest = self._load_for_write()
+                self._save(manifest)
+        return [dict(entry) for entry in reversed(manifest['backups'])]
+
+    def get(self, backup_id):
+        """按ID查找备份记录"""
+        for entry in self.list():
+            if entry['id'] == backup_id or entry.get('legacy_file') == backup_id:
+                return entry
+        raise BackupNotFoundError(backup_id)
+
+    def read(self, backup_id):
+        """读取备份内容"""
+        entry = self.get(backup_id)
+        with open(self._object_path(entry['hash'], entry['codec']), 'rb') as f:
+            data = CODECS[entry['codec']][1](f.read())
+        return data.decode('utf-8')
+
+    def delete(self, backup_id):
+        """删除备份记录，对象不再被引用时一并删除"""
+        with self._lock, self._file_lock():
+            manifest = self._load_for_write()
+            entry = next(
+                (b for b in manifest['backups'] if b['id'] == backup_id or b.get('legacy_file') == backup_id),
+                None
+            )
+            if entry is None:
+                raise BackupNotFoundError(backup_id)
+            manifest['backups'].remove(entry)
+            self._save(manifest)
+            if not any(b['hash'] == entry['hash'] for b in manifest['backups']):
+                try:
+                    os.remove(self._object_path(entry['hash'], entry['codec']))
+                except FileNotFoundError:
+                    pass
+            if entry.get('legacy_file'):
+                try:
+                    os.remove(os.path.join(self.root, entry['legacy_file']))
+                except FileNotFoundError:
+                    pass
+            return entry
+
+    def diff(self, from_id, to_id=None, current=None, context=3):
+        """
+        比较两个版本
+
+        Args:
+            from_id: 起始备份ID
+            to_id: 目标备份ID，为 None 时与 current 比较
+            current: 当前配置文本
+            context: 上下文行数
+
+        Returns:
+            dict: {'from', 'to', 'identical', 'diff'（unified diff 文本）}
+        """
+        old = self.read(from_id)
+        new = self.read(to_id) if to_id else (current or '')
+        to_name = to_id or 'current'
+        lines = difflib.unified_diff(
+            old.splitlines(keepends=True), new.splitlines(keepends=True),
+            fromfile=from_id, tofile=to_name, n=context
+        )
+        return {
+            'from': from_id,
+            'to': to_name,
+            'identical': old == new,
+            'diff': ''.join(lines)
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_backup_store():
+    """获取全局备份存储"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BackupStore()
+    return _store
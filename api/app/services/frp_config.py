@@ -0,0 +1,182 @@
+"""
+FRP配置解析缓存模块
+按 (path, mtime_ns, size, inode) 缓存解析后的 frpc.toml，代理配置按名称和本地端口建立索引，
+配置文件未变化时所有读取接口直接复用解析结果
+"""
+
+import os
+import errno
+import threading
+import time
+import uuid
+
+try:
+    import tomllib
+
+    TomlDecodeError = tomllib.TOMLDecodeError
+
+    def parse_toml(content):
+        """解析TOML文本"""
+        return tomllib.loads(content)
+except ImportError:
+    import toml
+
+    TomlDecodeError = toml.TomlDecodeError
+
+    def parse_toml(content):
+        """解析TOML文本"""
+        return toml.loads(content)
+
+
+class ProxyConfig:
+    """单个代理隧道配置"""
+
+    __slots__ = ('name', 'type', 'local_ip', 'local_port', 'subdomain', 'custom_domains', 'raw')
+
+    def __init__(self, raw, index=0):
+        self.raw = raw
+        self.name = raw.get('name') or f'proxy-{index}'
+        self.type = raw.get('type', 'http')
+        self.local_ip = raw.get('localIP', raw.get('local_ip', ''))
+        self.local_port = raw.get('localPort', raw.get('local_port', 0))
+        self.subdomain = raw.get('subdomain', '')
+        self.custom_domains = list(raw.get('customDomains', raw.get('custom_domains', [])))
+
+    def to_dict(self):
+        """转换为API格式"""
+        return {
+            'id': self.name,
+            'name': self.name,
+            'type': self.type,
+            'localIP': self.local_ip,
+            'localPort': self.local_port,
+            'subdomain': self.subdomain,
+            'customDomains': self.custom_domains,
+            'enabled': True,
+            'status': 'running'
+        }
+
+
+class FrpConfig:
+    """解析后的 frpc 配置"""
+
+    def __init__(self, path, raw, stat_key):
+        self.path = path
+        self.raw = raw
+        self.stat_key = stat_key
+        self.loaded_at = time.time()
+
+        self.proxies = tuple(ProxyConfig(p, i) for i, p in enumerate(raw.get('proxies', [])))
+        self.by_name = {}
+        self.by_port = {}
+        for proxy in self.proxies:
+            self.by_name.setdefault(proxy.name, proxy)
+            self.by_port.setdefault(proxy.local_port, []).append(proxy)
+        self._api = [proxy.to_dict() for proxy in self.proxies]
+
+    @property
+    def server_addr(self):
+        return self.raw.get('serverAddr', self.raw.get('server_addr'))
+
+    @property
+    def server_port(self):
+        return self.raw.get('serverPort', self.raw.get('server_port'))
+
+    def get(self, name):
+        """按名称查找代理"""
+        return self.by_name.get(name)
+
+    def find_by_port(self, local_port):
+        """按本地端口查找代理"""
+        return list(self.by_port.get(local_port, ()))
+
+    def to_api(self):
+        """代理列表的API格式（返回副本）"""
+        return [dict(item) for item in self._api]
+
+
+class FrpConfigCache:
+    """frpc 配置解析缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, path):
+        """
+        获取解析后的配置，文件变化时重新解析
+
+        Returns:
+            FrpConfig: 配置，文件不存在时返回 None
+
+        Raises:
+            TomlDecodeError: 配置文件语法错误
+        """
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+            return None
+        stat_key = (st.st_mtime_ns, st.st_size, st.st_ino)
+
+        entry = self._entries.get(path)
+        if entry is not None and entry.stat_key == stat_key:
+            return entry
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry.stat_key == stat_key:
+                return entry
+            with open(path, 'rb') as f:
+                content = f.read().decode('utf-8')
+            entry = FrpConfig(path, parse_toml(content), stat_key)
+            self._entries[path] = entry
+            return entry
+
+    def invalidate(self, path=None):
+        """清除缓存（写入配置文件后调用）"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+def write_config_file(path, content):
+    """
+    原子写入配置文件（同目录临时文件 + fsync + rename）
+
+    单文件 bind mount 无法被 rename 替换时退化为原地写入
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    tmp_path = os.path.join(directory, f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+    data = content.encode('utf-8')
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o644
+
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.chmod(tmp_path, mode)
+    try:
+        os.replace(tmp_path, path)
+    except OSError as e:
+        os.unlink(tmp_path)
+        if e.errno not in (errno.EBUSY, errno.EXDEV):
+            raise
+        with open(path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+    _cache.invalidate(path)
+
+
+_cache = FrpConfigCache()
+
+
+def get_frp_config_cache():
+    """获取全局 frpc 配置缓存"""
+    return _cache
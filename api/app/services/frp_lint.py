@@ -0,0 +1,399 @@
+"""
+FRP配置校验模块
+一次遍历配置文本建立键的行列位置索引，一次遍历代理建立名称、域名、远程端口等冲突索引，
+输出带行号、列号的结构化诊断；支持批量校验，同一 frps 服务器下的多份配置会做跨配置冲突检测
+"""
+
+import re
+
+from .frp_config import parse_toml, TomlDecodeError
+
+PROXY_TYPES = ('tcp', 'udp', 'http', 'https', 'tcpmux', 'stcp', 'xtcp', 'sudp')
+VISITOR_TYPES = ('stcp', 'xtcp', 'sudp')
+
+# 按域名路由的代理类型
+VHOST_TYPES = ('http', 'https', 'tcpmux')
+# 占用 frps 端口的代理类型，值为端口所属协议
+REMOTE_PORT_TYPES = {'tcp': 'tcp', 'udp': 'udp'}
+# 点对点代理类型，不占用 frps 端口
+SECRET_TYPES = ('stcp', 'xtcp', 'sudp')
+
+_KEY = r'(?:[A-Za-z0-9_\-]+|"[^"]*"|\'[^\']*\')'
+_HEADER_RE = re.compile(r'^\s*(\[\[?)\s*(' + _KEY + r'(?:\s*\.\s*' + _KEY + r')*)\s*\]\]?')
+_PAIR_RE = re.compile(r'^(\s*)(' + _KEY + r'(?:\s*\.\s*' + _KEY + r')*)\s*=')
+_KEY_PART_RE = re.compile(_KEY)
+_TOML_POS_RE = re.compile(r'at line (\d+), column (\d+)|line (\d+) column (\d+)', re.I)
+
+
+class Diagnostic:
+    """单条诊断"""
+
+    __slots__ = ('severity', 'code', 'message', 'path', 'line', 'column', 'related')
+
+    def __init__(self, severity, code, message, path=None, line=None, column=None, related=None):
+        self.severity = severity
+        self.code = code
+        self.message = message
+        self.path = path
+        self.line = line
+        self.column = column
+        self.related = related
+
+    def to_dict(self):
+        data = {
+            'severity': self.severity,
+            'code': self.code,
+            'message': self.message,
+            'path': self.path,
+            'line': self.line,
+            'column': self.column
+        }
+        if self.related:
+            data['related'] = self.related
+        return data
+
+    def __str__(self):
+        location = f'line {self.line}: ' if self.line else ''
+        return f'{location}{self.message}'
+
+
+def _split_key(key):
+    return [part.strip('"\'') for part in _KEY_PART_RE.findall(key)]
+
+
+def index_positions(content):
+    """
+    建立键路径到 (行, 列) 的索引
+
+    路径形如 serverPort、auth.token、proxies[2]、proxies[2].transport.useEncryption
+
+    Returns:
+        dict: {path: (line, column)}，行列号从 1 开始
+    """
+    positions = {}
+    arrays = {}
+    prefix = []
+    delimiter = None
+    for lineno, line in enumerate(content.splitlines(), 1):
+        if delimiter:
+            if line.count(delimiter) % 2:
+                delimiter = None
+            continue
+        header = _HEADER_RE.match(line)
+        if header:
+            parts = _split_key(header.group(2))
+            name = '.'.join(parts)
+            if header.group(1) == '[[':
+                arrays[name] = arrays.get(name, -1) + 1
+            prefix = []
+            for i, part in enumerate(parts):
+                prefix.append(part)
+                joined = '.'.join(parts[:i + 1])
+                if joined in arrays:
+                    prefix[-1] = f'{part}[{arrays[joined]}]'
+            positions.setdefault('.'.join(prefix), (lineno, line.index('[') + 1))
+            continue
+        pair = _PAIR_RE.match(line)
+        if pair:
+            path = '.'.join(prefix + _split_key(pair.group(2)))
+            positions.setdefault(path, (lineno, len(pair.group(1)) + 1))
+            for delim in ('"""', "'''"):
+                if line.count(delim) % 2:
+                    delimiter = delim
+    return positions
+
+
+class _Linter:
+    """单份配置的校验状态"""
+
+    def __init__(self, content, config_id=None):
+        self.content = content
+        self.config_id = config_id
+        self.diagnostics = []
+        self.config = None
+        self.positions = {}
+
+    def add(self, severity, code, message, path=None, related=None):
+        line = column = None
+        probe = path
+        while probe:
+            if probe in self.positions:
+                line, column = self.positions[probe]
+                break
+            probe = probe.rsplit('.', 1)[0] if '.' in probe else None
+        self.diagnostics.append(Diagnostic(severity, code, message, path, line, column, related))
+
+    def error(self, code, message, path=None, related=None):
+        self.add('error', code, message, path, related)
+
+    def warning(self, code, message, path=None, related=None):
+        self.add('warning', code, message, path, related)
+
+    def location(self, path):
+        line, column = self.positions.get(path, (None, None))
+        return {'path': path, 'line': line, 'column': column}
+
+    def run(self):
+        try:
+            self.config = parse_toml(self.content)
+        except TomlDecodeError as e:
+            match = _TOML_POS_RE.search(str(e))
+            line = column = None
+            if match:
+                groups = [int(g) for g in match.groups() if g]
+                line, column = groups[0], groups[1]
+            self.diagnostics.append(
+                Diagnostic('error', 'syntax', f'TOML syntax error: {e}', None, line, column)
+            )
+            return self
+        self.positions = index_positions(self.content)
+        self._check_common()
+        self._check_proxies()
+        self._check_visitors()
+        return self
+
+    def _check_common(self):
+        config = self.config
+        if 'serverAddr' not in config and 'server_addr' not in config:
+            self.error('missing-field', 'Missing required field: serverAddr')
+        port_key = 'serverPort' if 'serverPort' in config else 'server_port'
+        if port_key not in config:
+            self.error('missing-field', 'Missing required field: serverPort')
+        else:
+            self._check_port(config[port_key], port_key)
+
+        auth = config.get('auth') or {}
+        if isinstance(auth, dict) and auth.get('method', 'token') == 'token' and not auth.get('token'):
+            self.warning('auth', 'auth.token is empty, frps will reject the login if it requires a token', 'auth')
+
+        web = config.get('webServer') or {}
+        if isinstance(web, dict) and web.get('port'):
+            self._check_port(web['port'], 'webServer.port')
+
+    def _check_port(self, value, path, allow_zero=False):
+        if isinstance(value, bool) or not isinstance(value, int):
+            self.error('invalid-port', f'{path} must be an integer', path)
+            return False
+        if not (0 if allow_zero else 1) <= value <= 65535:
+            self.error('invalid-port', f'Invalid port number: {value}', path)
+            return False
+        return True
+
+    def _check_proxies(self):
+        proxies = self.config.get('proxies', [])
+        if not proxies:
+            self.warning('no-proxies', 'No proxy configurations found')
+            return
+
+        names = {}
+        domains = {}
+        remote_ports = {}
+        local_addrs = {}
+        for i, proxy in enumerate(proxies):
+            base = f'proxies[{i}]'
+            if not isinstance(proxy, dict):
+                self.error('invalid-proxy', 'Proxy must be a table', base)
+                continue
+
+            name = proxy.get('name')
+            if not name:
+                self.error('missing-field', 'Proxy name is required', base)
+            elif name in names:
+                self.error('duplicate-name', f'Duplicate proxy name: {name}', f'{base}.name',
+                           related=self.location(f'{names[name]}.name'))
+            else:
+                names[name] = base
+            label = name or base
+
+            proxy_type = proxy.get('type', 'tcp')
+            if proxy_type not in PROXY_TYPES:
+                self.error('invalid-type', f'{label}: unknown proxy type "{proxy_type}"', f'{base}.type')
+                continue
+
+            # 本地服务
+            if 'plugin' not in proxy:
+                if 'localPort' not in proxy and 'local_port' not in proxy:
+                    self.error('missing-field', f'{label}: localPort is required', base)
+                else:
+                    port_key = 'localPort' if 'localPort' in proxy else 'local_port'
+                    if self._check_port(proxy[port_key], f'{base}.{port_key}'):
+                        addr = (proxy.get('localIP', proxy.get('local_ip', '127.0.0.1')), proxy[port_key])
+                        if addr in local_addrs:
+                            self.warning('shared-local-port',
+                                         f'{label}: localPort {addr[1]} is already used by another proxy',
+                                         f'{base}.{port_key}', related=self.location(local_addrs[addr]))
+                        else:
+                            local_addrs[addr] = f'{base}.{port_key}'
+
+            # 远程端口
+            remote_port = proxy.get('remotePort', proxy.get('remote_port'))
+            if proxy_type in REMOTE_PORT_TYPES:
+                if remote_port is not None and self._check_port(remote_port, f'{base}.remotePort', allow_zero=True) \
+                        and remote_port != 0:
+                    key = (REMOTE_PORT_TYPES[proxy_type], remote_port)
+                    if key in remote_ports:
+                        self.error('remote-port-conflict',
+                                   f'{label}: remotePort {remote_port}/{key[0]} is already used',
+                                   f'{base}.remotePort', related=self.location(remote_ports[key]))
+                    else:
+                        remote_ports[key] = f'{base}.remotePort'
+            elif remote_port is not None:
+                self.warning('unused-field', f'{label}: remotePort is ignored for {proxy_type} proxies',
+                             f'{base}.remotePort')
+
+            # 域名路由
+            if proxy_type in VHOST_TYPES:
+                self._check_domains(proxy, proxy_type, base, label, domains)
+            elif proxy.get('subdomain') or proxy.get('customDomains'):
+                self.warning('unused-field', f'{label}: domains are ignored for {proxy_type} proxies', base)
+
+            if proxy_type in SECRET_TYPES and not proxy.get('secretKey'):
+                self.warning('missing-secret', f'{label}: secretKey is recommended for {proxy_type} proxies', base)
+            if proxy_type == 'tcpmux' and proxy.get('multiplexer', 'httpconnect') != 'httpconnect':
+                self.error('invalid-field', f'{label}: multiplexer must be "httpconnect"', f'{base}.multiplexer')
+
+    def _check_domains(self, proxy, proxy_type, base, label, domains):
+        subdomain = proxy.get('subdomain')
+        custom_domains = proxy.get('customDomains', proxy.get('custom_domains')) or []
+        if not subdomain and not custom_domains:
+            self.error('missing-field', f'{label}: {proxy_type} proxies need subdomain or customDomains', base)
+            return
+
+        routes = []
+        if subdomain:
+            routes.append(('subdomain', subdomain.lower(), f'{base}.subdomain'))
+        for domain in custom_domains:
+            if isinstance(domain, str):
+                routes.append(('domain', domain.lower(), f'{base}.customDomains'))
+        locations = (proxy.get('locations') or ['']) if proxy_type == 'http' else ['']
+        for kind, domain, path in routes:
+            for location in locations:
+                key = (proxy_type, kind, domain, location)
+                if key in domains:
+                    shown = f'{domain}{location}' if location else domain
+                    self.error('domain-conflict', f'{label}: {kind} {shown} is already routed to another {proxy_type} proxy',
+                               path, related=self.location(domains[key]))
+                else:
+                    domains[key] = path
+
+    def _check_visitors(self):
+        bind_ports = {}
+        for i, visitor in enumerate(self.config.get('visitors', [])):
+            base = f'visitors[{i}]'
+            if not isinstance(visitor, dict):
+                self.error('invalid-visitor', 'Visitor must be a table', base)
+                continue
+            label = visitor.get('name') or base
+            visitor_type = visitor.get('type')
+            if visitor_type not in VISITOR_TYPES:
+                self.error('invalid-type', f'{label}: unknown visitor type "{visitor_type}"', f'{base}.type')
+            if not visitor.get('serverName'):
+                self.error('missing-field', f'{label}: serverName is required', base)
+            port = visitor.get('bindPort')
+            if port is None:
+                self.error('missing-field', f'{label}: bindPort is required', base)
+            elif self._check_port(port, f'{base}.bindPort') and port > 0:
+                if port in bind_ports:
+                    self.error('bind-port-conflict', f'{label}: bindPort {port} is already used',
+                               f'{base}.bindPort', related=self.location(bind_ports[port]))
+                else:
+                    bind_ports[port] = f'{base}.bindPort'
+
+    def result(self):
+        errors = [d for d in self.diagnostics if d.severity == 'error']
+        warnings = [d for d in self.diagnostics if d.severity == 'warning']
+        data = {
+            'valid': not errors,
+            'errors': len(errors),
+            'warnings': len(warnings),
+            'diagnostics': [d.to_dict() for d in self.diagnostics]
+        }
+        if self.config_id is not None:
+            data['id'] = self.config_id
+        return data
+
+
+def lint_config(content, config_id=None):
+    """
+    校验单份 frpc 配置
+
+    Args:
+        content: TOML 文本
+        config_id: 配置标识（批量校验时回传）
+
+    Returns:
+        dict: {'valid', 'errors', 'warnings', 'diagnostics': [...]}
+    """
+    return _Linter(content, config_id).run().result()
+
+
+def lint_configs(items, cross_check=True):
+    """
+    批量校验 frpc 配置
+
+    Args:
+        items: [{'id': str, 'content': str}]
+        cross_check: 对连接同一 frps（serverAddr:serverPort）的配置检查代理名、远程端口和域名冲突
+
+    Returns:
+        dict: {'valid', 'total', 'invalid', 'results': [...]}
+    """
+    linters = []
+    for i, item in enumerate(items):
+        config_id = item.get('id', i) if isinstance(item, dict) else i
+        content = item.get('content', '') if isinstance(item, dict) else item
+        linters.append(_Linter(content or '', config_id).run())
+
+    if cross_check:
+        _cross_check(linters)
+
+    results = [linter.result() for linter in linters]
+    invalid = sum(1 for r in results if not r['valid'])
+    return {'valid': invalid == 0, 'total': len(results), 'invalid': invalid, 'results': results}
+
+
+def _cross_check(linters):
+    """同一 frps 下的跨配置冲突检测"""
+    servers = {}
+    for linter in linters:
+        config = linter.config
+        if not config:
+            continue
+        server = (config.get('serverAddr', config.get('server_addr')), config.get('serverPort', config.get('server_port')))
+        index = servers.setdefault(server, {})
+        user = config.get('user', '')
+        for i, proxy in enumerate(config.get('proxies', [])):
+            if not isinstance(proxy, dict):
+                continue
+            base = f'proxies[{i}]'
+            proxy_type = proxy.get('type', 'tcp')
+            keys = []
+            if proxy.get('name'):
+                # frps 以 user.name 区分代理
+                keys.append((('name', user, proxy['name']), f'{base}.name', f"proxy name {proxy['name']}"))
+            remote_port = proxy.get('remotePort')
+            if proxy_type in REMOTE_PORT_TYPES and isinstance(remote_port, int) and remote_port > 0:
+                keys.append(((REMOTE_PORT_TYPES[proxy_type], remote_port), f'{base}.remotePort',
+                             f'remotePort {remote_port}/{REMOTE_PORT_TYPES[proxy_type]}'))
+            if proxy_type in VHOST_TYPES:
+                routes = []
+                if isinstance(proxy.get('subdomain'), str) and proxy['subdomain']:
+                    routes.append(('subdomain', proxy['subdomain'], f'{base}.subdomain'))
+                for domain in proxy.get('customDomains', proxy.get('custom_domains')) or []:
+                    if isinstance(domain, str):
+                        routes.append(('domain', domain, f'{base}.customDomains'))
+                # http 代理按 locations 区分路由，与单个配置内的检查一致
+                locations = (proxy.get('locations') or ['']) if proxy_type == 'http' else ['']
+                for kind, domain, path in routes:
+                    for location in locations:
+                        shown = f'{domain}{location}' if location else domain
+                        keys.append(((proxy_type, kind, domain.lower(), location), path, f'{kind} {shown}'))
+            for key, path, what in keys:
+                owner = index.get(key)
+                if owner is None:
+                    index[key] = (linter, path)
+                elif owner[0] is not linter:
+                    related = dict(owner[0].location(owner[1]), id=owner[0].config_id)
+                    linter.error('cross-config-conflict',
+                                 f'{what} is also used by config {owner[0].config_id} on the same frps',
+                                 path, related=related)
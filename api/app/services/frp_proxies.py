@@ -0,0 +1,320 @@
+"""
+FRP代理持久化模块
+直接读写 frpc.toml 中的 [[proxies]] 配置块：按名称索引定位代理，只重新生成被修改的代理块，
+公共配置、注释和未修改的代理原样保留；所有修改在跨进程文件锁内完成，
+批量操作合并为一次原子写入和一次热加载
+"""
+
+import re
+import json
+import threading
+
+from .frp_config import parse_toml, TomlDecodeError
+from .frp_reload import get_config_applier
+
+# 只由接口生成、不写入配置文件的字段
+READ_ONLY_FIELDS = ('id', 'enabled', 'status')
+
+# 配置块表头，如 [[proxies]]、[proxies.plugin]、[auth]
+_HEADER_RE = re.compile(r'^\s*(\[\[?)\s*([A-Za-z0-9_.\-"\' ]+?)\s*\]\]?\s*(#.*)?$')
+_BARE_KEY_RE = re.compile(r'^[A-Za-z0-9_\-]+$')
+
+
+class ProxyRepositoryError(Exception):
+    """代理操作失败"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Block:
+    """配置文件中的一个配置块（表头到下一个表头之前的原始文本）"""
+
+    __slots__ = ('header', 'lines', 'proxy')
+
+    def __init__(self, header):
+        self.header = header
+        self.lines = []
+        self.proxy = None
+
+    @property
+    def is_proxy(self):
+        return self.header == '[[proxies]]'
+
+    @property
+    def text(self):
+        return ''.join(self.lines)
+
+
+def split_blocks(content):
+    """
+    按表头拆分配置文本
+
+    [proxies.xxx] 子表归入所属的 [[proxies]] 块
+
+    Returns:
+        list[_Block]: 第一个块为表头之前的公共配置（header 为 None）
+    """
+    blocks = [_Block(None)]
+    in_multiline = False
+    for line in content.splitlines(keepends=True):
+        match = None if in_multiline else _HEADER_RE.match(line)
+        if match:
+            header = f"{match.group(1)}{match.group(2)}{']]' if match.group(1) == '[[' else ']'}"
+            if not (header.startswith('[proxies.') and blocks[-1].is_proxy):
+                blocks.append(_Block(header))
+        blocks[-1].lines.append(line)
+        if line.count('"""') % 2 or line.count("'''") % 2:
+            in_multiline = not in_multiline
+
+    for block in blocks:
+        if block.is_proxy:
+            proxies = parse_toml(block.text).get('proxies') or [{}]
+            block.proxy = proxies[0]
+    return blocks
+
+
+def _format_key(key):
+    return key if _BARE_KEY_RE.match(key) else json.dumps(key, ensure_ascii=False)
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_format_value(v) for v in value) + ']'
+    if isinstance(value, dict):
+        return '{ ' + ', '.join(f'{_format_key(k)} = {_format_value(v)}' for k, v in value.items()) + ' }'
+    raise ProxyRepositoryError(f'Unsupported value type: {type(value).__name__}')
+
+
+def _format_pairs(data, prefix=''):
+    lines = []
+    for key, value in data.items():
+        if value is None:
+            continue
+        full_key = prefix + _format_key(key)
+        if isinstance(value, dict) and value:
+            # 嵌套配置写为点分键，如 transport.useEncryption = true
+            lines.extend(_format_pairs(value, full_key + '.'))
+        else:
+            lines.append(f'{full_key} = {_format_value(value)}\n')
+    return lines
+
+
+def render_proxy(proxy):
+    """生成单个 [[proxies]] 配置块"""
+    ordered = {'name': proxy.get('name'), 'type': proxy.get('type')}
+    ordered.update((k, v) for k, v in proxy.items() if k not in ordered)
+    return '[[proxies]]\n' + ''.join(_format_pairs(ordered))
+
+
+class _Edit:
+    """一次读-改-写中的代理集合"""
+
+    def __init__(self, content):
+        self.blocks = split_blocks(content or '')
+        self.index = {}
+        for block in self.blocks:
+            if block.is_proxy:
+                self.index.setdefault(block.proxy.get('name'), block)
+        self.dirty = set()
+        self.added = []
+
+    def get(self, name):
+        block = self.index.get(name)
+        return block.proxy if block else None
+
+    def create(self, proxy):
+        name = proxy['name']
+        if name in self.index:
+            raise ProxyRepositoryError(f'Proxy already exists: {name}', 409)
+        block = _Block('[[proxies]]')
+        block.proxy = proxy
+        self.index[name] = block
+        self.added.append(block)
+        self.dirty.add(id(block))
+
+    def update(self, name, fields):
+        block = self.index.get(name)
+        if block is None:
+            raise ProxyRepositoryError(f'Proxy not found: {name}', 404)
+        proxy = dict(block.proxy)
+        for key, value in fields.items():
+            if value is None:
+                proxy.pop(key, None)
+            else:
+                proxy[key] = value
+        _validate(proxy)
+        new_name = proxy['name']
+        if new_name != name:
+            if new_name in self.index:
+                raise ProxyRepositoryError(f'Proxy already exists: {new_name}', 409)
+            del self.index[name]
+            self.index[new_name] = block
+        block.proxy = proxy
+        self.dirty.add(id(block))
+        return proxy
+
+    def delete(self, name):
+        block = self.index.pop(name, None)
+        if block is None:
+            raise ProxyRepositoryError(f'Proxy not found: {name}', 404)
+        block.proxy = None
+        self.dirty.add(id(block))
+
+    def render(self):
+        """重新生成配置文本，未修改的块保持原样"""
+        last_proxy = max((i for i, b in enumerate(self.blocks) if b.is_proxy), default=len(self.blocks) - 1)
+        blocks = self.blocks[:last_proxy + 1] + self.added + self.blocks[last_proxy + 1:]
+
+        parts = []
+        for block in blocks:
+            if id(block) not in self.dirty:
+                text = block.text
+            elif block.proxy is None:
+                # 删除的块末尾的注释通常属于下一个块
+                text = ''.join(line for line in _trailing_comments(block.lines) if line.strip())
+                if not text:
+                    continue
+            else:
+                text = render_proxy(block.proxy)
+                # 保留原块末尾的空行和注释
+                trailing = _trailing_comments(block.lines)
+                text += ''.join(trailing) if trailing else '\n'
+            if parts and not parts[-1].endswith('\n'):
+                parts[-1] += '\n'
+            parts.append(text)
+        return ''.join(parts)
+
+
+def _trailing_comments(lines):
+    trailing = []
+    for line in reversed(lines):
+        if line.strip() and not line.lstrip().startswith('#'):
+            break
+        trailing.append(line)
+    return list(reversed(trailing))
+
+
+def _validate(proxy):
+    if not proxy.get('name') or not isinstance(proxy['name'], str):
+        raise ProxyRepositoryError('Proxy name is required')
+    if not proxy.get('type'):
+        raise ProxyRepositoryError(f"Proxy type is required: {proxy['name']}")
+    if 'localPort' not in proxy and 'plugin' not in proxy:
+        raise ProxyRepositoryError(f"localPort is required: {proxy['name']}")
+
+
+def normalize_proxy(data):
+    """将API请求体转换为 frpc 代理配置（去掉只读字段）"""
+    if not isinstance(data, dict):
+        raise ProxyRepositoryError('Proxy must be an object')
+    return {k: v for k, v in data.items() if k not in READ_ONLY_FIELDS}
+
+
+class ProxyRepository:
+    """frpc.toml 中的代理配置"""
+
+    ACTIONS = ('create', 'update', 'upsert', 'delete')
+
+    def __init__(self, applier=None):
+        self.applier = applier or get_config_applier()
+
+    def create(self, data):
+        return self.apply_batch([{'action': 'create', 'proxy': data}])
+
+    def update(self, name, data):
+        return self.apply_batch([{'action': 'update', 'name': name, 'proxy': data}])
+
+    def delete(self, name):
+        return self.apply_batch([{'action': 'delete', 'name': name}])
+
+    def apply_batch(self, operations, dry_run=False):
+        """
+        批量修改代理，全部成功后一次写入、一次热加载；任一操作失败则不写入
+
+        Args:
+            operations: [{'action': create/update/upsert/delete, 'name': str, 'proxy': dict}]
+            dry_run: 只返回差异，不写入
+
+        Returns:
+            dict: {'proxies': {name: 修改后的配置或 None}, 'apply': 应用结果}
+
+        Raises:
+            ProxyRepositoryError: 操作无效（status_code 为 400/404/409）
+            TomlDecodeError: 当前配置文件语法错误
+            FrpReloadError: frpc 拒绝新配置（已回滚）
+        """
+        if not operations:
+            raise ProxyRepositoryError('No operations given')
+        results = {}
+
+        def edit(current):
+            if current is None:
+                raise ProxyRepositoryError('Config file not found', 404)
+            results.clear()
+            proxies = _Edit(current)
+            for i, op in enumerate(operations):
+                try:
+                    self._apply_op(proxies, op, results)
+                except ProxyRepositoryError as e:
+                    if len(operations) > 1:
+                        e.args = (f'operation {i}: {e}',)
+                    raise
+            content = proxies.render()
+            try:
+                parse_toml(content)
+            except TomlDecodeError as e:
+                raise ProxyRepositoryError(f'Generated config is invalid: {e}')
+            return content
+
+        result = self.applier.apply_edit(edit, dry_run=dry_run)
+        return {'proxies': results, 'apply': result}
+
+    def _apply_op(self, proxies, op, results):
+        if not isinstance(op, dict):
+            raise ProxyRepositoryError('Operation must be an object')
+        action = op.get('action')
+        if action not in self.ACTIONS:
+            raise ProxyRepositoryError(f'Unknown action: {action}')
+        name = op.get('name')
+
+        if action == 'delete':
+            proxies.delete(name)
+            results[name] = None
+            return
+
+        data = normalize_proxy(op.get('proxy') or {})
+        if action == 'upsert':
+            name = name or data.get('name')
+            action = 'update' if proxies.get(name) is not None else 'create'
+        if action == 'create':
+            data.setdefault('name', name)
+            _validate(data)
+            proxies.create(data)
+            results[data['name']] = data
+        else:
+            proxy = proxies.update(name, data)
+            if proxy['name'] != name:
+                results[name] = None
+            results[proxy['name']] = proxy
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_proxy_repository():
+    """获取全局代理配置仓库"""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = ProxyRepository()
+    return _repository
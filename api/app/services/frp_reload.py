@@ -0,0 +1,238 @@
+"""
+FRP配置热加载模块
+写入新配置前与当前配置比较代理集合，只有代理增删改时通过 frpc 管理接口 reload 生效，
+并轮询 /api/status 确认受影响的代理已重新运行；公共配置（服务器地址、认证、传输等）变化时才整体重启
+"""
+
+import os
+import time
+import logging
+import threading
+
+from .frp_admin import FrpAdminError, get_admin_client
+from .frp_config import FrpConfig, get_frp_config_cache, parse_toml, write_config_file
+from .frp_supervisor import FRPC_CONFIG_PATH, get_frp_supervisor
+from app.utils.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# reload 后等待代理状态稳定的超时（秒）
+FRPC_RELOAD_VERIFY_TIMEOUT = float(os.getenv('FRPC_RELOAD_VERIFY_TIMEOUT', '10'))
+
+# reload 可以生效的配置段，其余字段变化需要重启
+RELOADABLE_SECTIONS = ('proxies', 'visitors')
+
+# 代理仍在启动中的状态
+_PENDING_STATUSES = ('new', 'wait start')
+
+
+class FrpReloadError(Exception):
+    """热加载失败"""
+
+
+class ConfigDiff:
+    """新旧配置的代理差异"""
+
+    def __init__(self, added, removed, changed, unchanged, visitors_changed=False, common_changed=False):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.unchanged = unchanged
+        self.visitors_changed = visitors_changed
+        self.common_changed = common_changed
+
+    @property
+    def has_changes(self):
+        return bool(self.added or self.removed or self.changed or self.visitors_changed or self.common_changed)
+
+    @property
+    def affected(self):
+        """reload 后需要重建的代理"""
+        return self.added + self.changed
+
+    def to_dict(self):
+        return {
+            'added': self.added,
+            'removed': self.removed,
+            'changed': self.changed,
+            'unchanged': self.unchanged,
+            'visitors_changed': self.visitors_changed,
+            'common_changed': self.common_changed
+        }
+
+
+def diff_configs(old, new):
+    """
+    比较新旧配置
+
+    Args:
+        old: FrpConfig（可为 None）
+        new: FrpConfig
+
+    Returns:
+        ConfigDiff
+    """
+    old_proxies = {p.name: p.raw for p in old.proxies} if old else {}
+    new_proxies = {p.name: p.raw for p in new.proxies}
+
+    added = [name for name in new_proxies if name not in old_proxies]
+    removed = [name for name in old_proxies if name not in new_proxies]
+    changed = []
+    unchanged = []
+    for name, raw in new_proxies.items():
+        if name in old_proxies:
+            (changed if old_proxies[name] != raw else unchanged).append(name)
+
+    old_raw = old.raw if old else {}
+    old_common = {k: v for k, v in old_raw.items() if k not in RELOADABLE_SECTIONS}
+    new_common = {k: v for k, v in new.raw.items() if k not in RELOADABLE_SECTIONS}
+    visitors_changed = old_raw.get('visitors', []) != new.raw.get('visitors', [])
+    common_changed = old is not None and old_common != new_common
+
+    return ConfigDiff(added, removed, changed, unchanged, visitors_changed, common_changed)
+
+
+def proxy_statuses(status):
+    """将 /api/status 的分组结果展开为 {name: {'type', 'status', 'err', 'local_addr', 'remote_addr'}}"""
+    result = {}
+    for proxy_type, items in (status or {}).items():
+        for item in items or []:
+            result[item.get('name')] = {
+                'type': item.get('type', proxy_type),
+                'status': item.get('status'),
+                'err': item.get('err', ''),
+                'local_addr': item.get('local_addr'),
+                'remote_addr': item.get('remote_addr')
+            }
+    return result
+
+
+class FrpConfigApplier:
+    """通过差异比较应用 frpc 配置"""
+
+    def __init__(self, config_path=None, supervisor=None, verify_timeout=None):
+        self.config_path = config_path or FRPC_CONFIG_PATH
+        self.supervisor = supervisor
+        self.verify_timeout = verify_timeout or FRPC_RELOAD_VERIFY_TIMEOUT
+        self.cache = get_frp_config_cache()
+        self._lock = threading.Lock()
+
+    def apply(self, content, dry_run=False):
+        """
+        应用新的配置文件内容
+
+        Args:
+            content: TOML 文本
+            dry_run: 只返回差异，不写入
+
+        Returns:
+            dict: {'diff', 'method': none/reload/restart/file, 'verified', 'proxies', 'failed', 'job'}
+
+        Raises:
+            TomlDecodeError: 配置语法错误
+            FrpReloadError: frpc 拒绝新配置（已回滚）
+        """
+        return self.apply_edit(lambda current: content, dry_run=dry_run)
+
+    def apply_edit(self, edit, dry_run=False):
+        """
+        在配置文件锁内读取当前内容、生成新内容并应用（读-改-写不会与其他进程交错）
+
+        Args:
+            edit: 回调 edit(current_text) -> new_text，current_text 在文件不存在时为 None
+            dry_run: 只返回差异，不写入
+
+        Returns:
+            dict: 同 apply()
+        """
+        with self._lock, FileLock(self.config_path + '.lock'):
+            old_content = _read_text(self.config_path)
+            content = edit(old_content)
+            new = FrpConfig(self.config_path, parse_toml(content), None)
+            old = self.cache.get(self.config_path)
+            diff = diff_configs(old, new)
+            result = {'diff': diff.to_dict(), 'method': 'none'}
+            if dry_run or (old is not None and not diff.has_changes):
+                return result
+
+            # 使用当前运行配置中的管理接口地址
+            admin = get_admin_client(old or new)
+            write_config_file(self.config_path, content)
+
+            supervisor = self.supervisor or get_frp_supervisor()
+            if admin is None or diff.common_changed:
+                job = supervisor.restart()
+                result.update({'method': 'restart', 'job': job.to_dict()})
+                return result
+
+            if not admin.is_ready():
+                # frpc 未运行，配置在下次启动时生效
+                result['method'] = 'file'
+                return result
+
+            try:
+                admin.reload()
+            except FrpAdminError as e:
+                if old_content is not None:
+                    write_config_file(self.config_path, old_content)
+                    try:
+                        admin.reload()
+                    except FrpAdminError:
+                        pass
+                raise FrpReloadError(f'frpc rejected the configuration, rolled back: {e}')
+
+            result['method'] = 'reload'
+            result.update(self._verify(admin, diff))
+            logger.info(f"frpc reloaded: {diff.to_dict()}")
+            return result
+
+    def _verify(self, admin, diff):
+        """轮询代理状态，确认新增/变更的代理已启动、删除的代理已移除"""
+        deadline = time.time() + self.verify_timeout
+        expected = diff.affected
+        statuses = {}
+        while True:
+            try:
+                statuses = proxy_statuses(admin.status())
+            except FrpAdminError:
+                statuses = {}
+            pending = [
+                name for name in expected
+                if name not in statuses or statuses[name]['status'] in _PENDING_STATUSES
+            ]
+            lingering = [name for name in diff.removed if name in statuses]
+            if (not pending and not lingering) or time.time() >= deadline:
+                break
+            time.sleep(0.2)
+
+        failed = [
+            name for name in expected
+            if statuses.get(name, {}).get('status') != 'running'
+        ] + lingering
+        return {
+            'verified': not failed,
+            'proxies': {name: statuses.get(name) for name in expected},
+            'failed': failed
+        }
+
+
+def _read_text(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8')
+    except FileNotFoundError:
+        return None
+
+
+_applier = None
+_applier_lock = threading.Lock()
+
+
+def get_config_applier():
+    """获取全局配置应用器"""
+    global _applier
+    if _applier is None:
+        with _applier_lock:
+            if _applier is None:
+                _applier = FrpConfigApplier()
+    return _applier
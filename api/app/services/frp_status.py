@@ -0,0 +1,286 @@
+"""
+FRP隧道状态轮询模块
+后台线程定期通过连接池访问 frpc 管理接口（代理运行状态）和 frps 面板接口（连接数、流量），
+在内存中维护每个代理的状态、连接数、累计流量与速率，接口只读取最新快照；
+同时以 Prometheus Collector 的形式导出，/metrics 抓取时不会触发额外请求
+"""
+
+import os
+import time
+import logging
+import threading
+
+import requests
+
+from .frp_admin import FrpAdminError, get_admin_client
+from .frp_config import get_frp_config_cache
+from .frp_reload import proxy_statuses
+from .frp_supervisor import FRPC_CONFIG_PATH
+
+try:
+    from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, REGISTRY
+    prometheus_available = True
+except ImportError:
+    prometheus_available = False
+
+logger = logging.getLogger(__name__)
+
+# 轮询间隔（秒）
+FRP_STATUS_POLL_INTERVAL = float(os.getenv('FRP_STATUS_POLL_INTERVAL', '5'))
+
+# frps 面板接口（可选，提供连接数和流量统计）
+FRPS_DASHBOARD_URL = os.getenv('FRPS_DASHBOARD_URL', '')
+FRPS_DASHBOARD_USER = os.getenv('FRPS_DASHBOARD_USER', '')
+FRPS_DASHBOARD_PASSWORD = os.getenv('FRPS_DASHBOARD_PASSWORD', '')
+
+PROXY_TYPES = ('tcp', 'udp', 'http', 'https', 'stcp', 'xtcp', 'sudp', 'tcpmux')
+
+
+class FrpsDashboardClient:
+    """frps 面板接口客户端"""
+
+    def __init__(self, base_url, user='', password='', timeout=3):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        if user:
+            self.session.auth = (user, password)
+
+    def proxy_stats(self, proxy_types):
+        """
+        获取代理统计
+
+        Returns:
+            dict: {name: {'conns', 'traffic_in', 'traffic_out', 'online'}}
+        """
+        stats = {}
+        for proxy_type in proxy_types:
+            response = self.session.get(f'{self.base_url}/api/proxy/{proxy_type}', timeout=self.timeout)
+            response.raise_for_status()
+            for item in response.json().get('proxies') or []:
+                stats[item.get('name')] = {
+                    'conns': _field(item, 'curConns', 'cur_conns'),
+                    'traffic_in': _field(item, 'todayTrafficIn', 'today_traffic_in'),
+                    'traffic_out': _field(item, 'todayTrafficOut', 'today_traffic_out'),
+                    'online': item.get('status') == 'online'
+                }
+        return stats
+
+
+def _field(item, *names):
+    for name in names:
+        if item.get(name) is not None:
+            return item[name]
+    return 0
+
+
+class _ProxyState:
+    """单个代理的内存状态"""
+
+    __slots__ = ('name', 'type', 'status', 'err', 'local_addr', 'remote_addr', 'since',
+                 'conns', 'today_in', 'today_out', 'total_in', 'total_out', 'rate_in', 'rate_out', 'sampled_at')
+
+    def __init__(self, name):
+        self.name = name
+        self.type = None
+        self.status = None
+        self.err = ''
+        self.local_addr = None
+        self.remote_addr = None
+        self.since = None
+        self.conns = None
+        self.today_in = None
+        self.today_out = None
+        self.total_in = 0
+        self.total_out = 0
+        self.rate_in = None
+        self.rate_out = None
+        self.sampled_at = None
+
+    def update_traffic(self, today_in, today_out, conns, now):
+        """折叠当日流量计数，计算速率并维护单调递增的累计值（跨日归零时重新累加）"""
+        if self.today_in is not None and self.sampled_at:
+            elapsed = max(now - self.sampled_at, 1e-6)
+            delta_in = today_in - self.today_in if today_in >= self.today_in else today_in
+            delta_out = today_out - self.today_out if today_out >= self.today_out else today_out
+            self.total_in += delta_in
+            self.total_out += delta_out
+            self.rate_in = round(delta_in / elapsed, 1)
+            self.rate_out = round(delta_out / elapsed, 1)
+        self.today_in = today_in
+        self.today_out = today_out
+        self.conns = conns
+        self.sampled_at = now
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'type': self.type,
+            'status': self.status,
+            'err': self.err,
+            'localAddr': self.local_addr,
+            'remoteAddr': self.remote_addr,
+            'since': self.since,
+            'connections': self.conns,
+            'trafficIn': self.today_in,
+            'trafficOut': self.today_out,
+            'rateIn': self.rate_in,
+            'rateOut': self.rate_out
+        }
+
+
+class FrpStatusPoller:
+    """frpc 状态轮询器"""
+
+    def __init__(self, config_path=None, interval=None, dashboard=None):
+        self.config_path = config_path or FRPC_CONFIG_PATH
+        self.interval = interval or FRP_STATUS_POLL_INTERVAL
+        self.dashboard = dashboard
+        if self.dashboard is None and FRPS_DASHBOARD_URL:
+            self.dashboard = FrpsDashboardClient(FRPS_DASHBOARD_URL, FRPS_DASHBOARD_USER, FRPS_DASHBOARD_PASSWORD)
+        self._states = {}
+        self._snapshot = {'reachable': False, 'polled_at': None, 'error': 'not polled yet', 'proxies': {}}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """启动后台轮询（重复调用无副作用）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = threading.Thread(target=self._run, name='frp-status-poller', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"FRP status poll failed: {e}")
+            self._stopped.wait(self.interval)
+
+    def poll(self):
+        """执行一次轮询并替换快照"""
+        now = time.time()
+        try:
+            config = get_frp_config_cache().get(self.config_path)
+        except Exception:
+            config = None
+        admin = get_admin_client(config)
+
+        error = None
+        statuses = {}
+        if admin is None:
+            error = 'frpc admin API not configured'
+        else:
+            try:
+                statuses = proxy_statuses(admin.status())
+            except (FrpAdminError, ValueError) as e:
+                error = str(e)
+
+        stats = {}
+        if self.dashboard is not None and error is None:
+            types = {s['type'] for s in statuses.values() if s.get('type')} or set(PROXY_TYPES)
+            try:
+                stats = self.dashboard.proxy_stats(sorted(types))
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logger.warning(f"frps dashboard unavailable: {e}")
+
+        for name, live in statuses.items():
+            state = self._states.get(name)
+            if state is None:
+                state = self._states[name] = _ProxyState(name)
+            if live['status'] != state.status:
+                state.since = now
+            state.type = live['type']
+            state.status = live['status']
+            state.err = live['err']
+            state.local_addr = live['local_addr']
+            state.remote_addr = live['remote_addr']
+            stat = stats.get(name)
+            if stat is not None:
+                state.update_traffic(stat['traffic_in'] or 0, stat['traffic_out'] or 0, stat['conns'], now)
+
+        if error is None:
+            for name in list(self._states):
+                if name not in statuses:
+                    del self._states[name]
+        else:
+            # 管理接口不可用时保留流量累计值，状态标记为未知
+            for state in self._states.values():
+                if state.status != 'unknown':
+                    state.status = 'unknown'
+                    state.since = now
+
+        self._snapshot = {
+            'reachable': error is None,
+            'polled_at': now,
+            'error': error,
+            'proxies': {name: state.to_dict() for name, state in self._states.items()},
+            'totals': {
+                name: (state.total_in, state.total_out) for name, state in self._states.items()
+            }
+        }
+        return self._snapshot
+
+    def snapshot(self):
+        """最新快照（不触发请求）"""
+        return self._snapshot
+
+
+class FrpStatusCollector:
+    """Prometheus 指标导出（读取轮询快照）"""
+
+    def __init__(self, poller):
+        self.poller = poller
+
+    def collect(self):
+        snapshot = self.poller.snapshot()
+        up = GaugeMetricFamily('frpc_up', 'Whether the frpc admin API is reachable')
+        up.add_metric([], 1 if snapshot['reachable'] else 0)
+        yield up
+
+        proxy_up = GaugeMetricFamily('frpc_proxy_up', 'Whether the proxy is running', labels=['name', 'type'])
+        conns = GaugeMetricFamily('frpc_proxy_connections', 'Current proxy connections', labels=['name', 'type'])
+        traffic_in = CounterMetricFamily('frpc_proxy_traffic_in_bytes', 'Proxy inbound traffic', labels=['name', 'type'])
+        traffic_out = CounterMetricFamily('frpc_proxy_traffic_out_bytes', 'Proxy outbound traffic', labels=['name', 'type'])
+        totals = snapshot.get('totals', {})
+        for name, proxy in snapshot['proxies'].items():
+            labels = [name, proxy['type'] or '']
+            proxy_up.add_metric(labels, 1 if proxy['status'] == 'running' else 0)
+            if proxy['connections'] is not None:
+                conns.add_metric(labels, proxy['connections'])
+            if name in totals:
+                traffic_in.add_metric(labels, totals[name][0])
+                traffic_out.add_metric(labels, totals[name][1])
+        yield proxy_up
+        yield conns
+        yield traffic_in
+        yield traffic_out
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_frp_status_poller():
+    """获取全局状态轮询器（首次调用时启动并注册 Prometheus 指标）"""
+    global _poller
+    if _poller is None:
+        with _poller_lock:
+            if _poller is None:
+                poller = FrpStatusPoller().start()
+                if prometheus_available:
+                    try:
+                        REGISTRY.register(FrpStatusCollector(poller))
+                    except ValueError:
+                        pass
+                _poller = poller
+    return _poller
@@ -0,0 +1,534 @@
+"""
+frpc 进程管理模块
+由API进程直接持有 frpc 子进程：记录PID、通过管理接口或日志标记判断就绪、异常退出后按指数退避自动重启；
+启动/停止/重启以任务形式在后台线程中串行执行，接口立即返回任务句柄
+
+期望状态、启动时间、重启次数、退避进度和最近的任务保存在状态文件中（在PID文件锁内读写），所有 worker 的状态一致；
+每个 worker 都运行监视循环，frpc 退出（包括启动它的 worker 已退出的情况）后由任一 worker 按退避时间重启
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import signal
+import logging
+import threading
+import subprocess
+
+from .frp_admin import get_admin_client
+from .frp_config import get_frp_config_cache
+from app.utils.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+FRPC_CONFIG_PATH = os.getenv('FRPC_CONFIG_PATH', '/frp/frpc.toml')
+FRP_BIN_PATH = os.getenv('FRP_BIN_PATH', '/usr/local/bin/frpc')
+FRP_LOG_PATH = os.getenv('FRP_LOG_PATH', '/var/log/frpc.log')
+FRPC_PID_FILE = os.getenv('FRPC_PID_FILE', '/frp/frpc.pid')
+FRPC_STATE_FILE = os.getenv('FRPC_STATE_FILE', '/frp/frpc.state.json')
+
+# 就绪等待超时、停止等待超时、退避重启的初始/最大间隔（秒），以及重置退避所需的稳定运行时间
+FRPC_READY_TIMEOUT = float(os.getenv('FRPC_READY_TIMEOUT', '15'))
+FRPC_STOP_TIMEOUT = float(os.getenv('FRPC_STOP_TIMEOUT', '10'))
+FRPC_BACKOFF_BASE = float(os.getenv('FRPC_BACKOFF_BASE', '1'))
+FRPC_BACKOFF_MAX = float(os.getenv('FRPC_BACKOFF_MAX', '60'))
+FRPC_BACKOFF_RESET = float(os.getenv('FRPC_BACKOFF_RESET', '60'))
+# 各 worker 检查 frpc 是否需要重启的间隔（秒）
+FRPC_WATCH_INTERVAL = float(os.getenv('FRPC_WATCH_INTERVAL', '5'))
+
+# 没有管理接口时，以日志中的登录成功标记判断就绪
+FRPC_READY_MARKER = b'login to server success'
+
+# 状态文件中保留的最近任务数
+MAX_JOBS = 50
+
+# 跨 worker 共享的状态
+_DEFAULT_STATE = {
+    'pid': None, 'owner': None, 'state': 'stopped', 'want_running': False, 'started_at': None,
+    'ready_at': None, 'restarts': 0, 'backoff_attempt': 0, 'last_exit': None, 'respawn_at': None,
+    'jobs': []
+}
+
+
+class SupervisorJob:
+    """进程操作任务"""
+
+    __slots__ = ('id', 'action', 'status', 'created_at', 'started_at', 'finished_at', 'result', 'error', '_done')
+
+    def __init__(self, action):
+        self.id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.status = 'pending'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """等待任务结束"""
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'action': self.action,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class FrpSupervisor:
+    """frpc 子进程管理器"""
+
+    def __init__(self, bin_path=None, config_path=None, log_path=None, pid_file=None,
+                 ready_timeout=None, readiness=None, state_file=None, watch_interval=None):
+        """
+        Args:
+            readiness: 自定义就绪检查函数 fn(log_offset) -> bool，默认使用管理接口或日志标记
+            state_file: 共享状态文件（默认 FRPC_STATE_FILE）
+        """
+        self.bin_path = bin_path or FRP_BIN_PATH
+        self.config_path = config_path or FRPC_CONFIG_PATH
+        self.log_path = log_path or FRP_LOG_PATH
+        self.pid_file = pid_file or FRPC_PID_FILE
+        self.state_file = state_file or FRPC_STATE_FILE
+        self.ready_timeout = ready_timeout or FRPC_READY_TIMEOUT
+        self.watch_interval = watch_interval or FRPC_WATCH_INTERVAL
+        self._readiness = readiness
+
+        self._lock = threading.RLock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._watcher = None
+
+        # 本 worker 启动的子进程（只有它能取得退出码）
+        self._proc = None
+
+    # ========== 任务 ==========
+
+    def start(self):
+        return self.submit('start')
+
+    def stop(self):
+        return self.submit('stop')
+
+    def restart(self):
+        return self.submit('restart')
+
+    def submit(self, action):
+        """
+        提交操作任务（立即返回）
+
+        Returns:
+            SupervisorJob: 任务句柄
+        """
+        job = SupervisorJob(action)
+        self._save_job(job)
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._work, name='frpc-supervisor', daemon=True)
+                self._worker.start()
+        self._queue.put(job)
+        return job
+
+    def get_job(self, job_id):
+        """
+        查询任务状态（读取共享状态文件，可查询任一 worker 提交的任务）
+
+        Returns:
+            dict: 任务信息（同 SupervisorJob.to_dict），不存在时返回 None
+        """
+        return next((job for job in self._read_state()['jobs'] if job['id'] == job_id), None)
+
+    def _save_job(self, job):
+        """将任务状态写入共享状态文件"""
+        with self._pid_lock():
+            state = self._read_state()
+            jobs = state['jobs']
+            for i, saved in enumerate(jobs):
+                if saved['id'] == job.id:
+                    jobs[i] = job.to_dict()
+                    break
+            else:
+                jobs.append(job.to_dict())
+            state['jobs'] = jobs[-MAX_JOBS:]
+            self._write_state(state)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = 'running'
+            job.started_at = time.time()
+            self._save_job(job)
+            try:
+                job.result = getattr(self, f'_do_{job.action}')()
+                job.status = 'succeeded'
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)
+                logger.error(f"frpc {job.action} failed: {e}")
+            finally:
+                job.finished_at = time.time()
+                self._save_job(job)
+                job._done.set()
+
+    # ========== 操作 ==========
+
+    def _do_start(self):
+        self._update_state(want_running=True, backoff_attempt=0, respawn_at=None)
+        pid = self._running_pid()
+        if pid:
+            return {'pid': pid, 'already_running': True}
+        return self._spawn()
+
+    def _do_stop(self):
+        self._update_state(want_running=False, respawn_at=None)
+        pid = self._running_pid()
+        if not pid:
+            self._update_state(pid=None, state='stopped')
+            return {'pid': None, 'already_stopped': True}
+        self._terminate(pid)
+        return {'pid': pid}
+
+    def _do_restart(self):
+        self._do_stop()
+        self._update_state(want_running=True, backoff_attempt=0, respawn_at=None)
+        return self._spawn()
+
+    def _do_respawn(self):
+        """退避后自动重启（由退出监视或监视循环提交）"""
+        state = self._read_state()
+        if not state['want_running'] or self._running_pid():
+            return {'skipped': True}
+        return self._spawn(respawn=True)
+
+    # ========== 进程 ==========
+
+    def _running_pid(self):
+        """当前运行中的 frpc PID（本进程启动的，或PID文件记录的）"""
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                return self._proc.pid
+        pid = self._read_pid_file()
+        if pid and _pid_alive(pid) and _is_frpc(pid, self.bin_path):
+            return pid
+        return None
+
+    def _spawn(self, respawn=False):
+        with self._pid_lock():
+            # 其他 worker 可能已经启动
+            pid = self._running_pid()
+            if pid:
+                return {'pid': pid, 'already_running': True}
+            state = self._read_state()
+            if respawn and not state['want_running']:
+                return {'skipped': True}
+
+            log_offset = _file_size(self.log_path)
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            with open(self.log_path, 'ab') as log_file:
+                proc = subprocess.Popen(
+                    [self.bin_path, '-c', self.config_path],
+                    stdin=subprocess.DEVNULL, stdout=log_file, stderr=subprocess.STDOUT,
+                    start_new_session=True
+                )
+
+            started_at = time.time()
+            with self._lock:
+                self._proc = proc
+            self._write_pid_file(proc.pid)
+            state.update(pid=proc.pid, owner=os.getpid(), state='starting', started_at=started_at,
+                         ready_at=None, respawn_at=None, restarts=state['restarts'] + (1 if respawn else 0))
+            self._write_state(state)
+
+        threading.Thread(target=self._monitor, args=(proc,), name='frpc-monitor', daemon=True).start()
+        logger.info(f"frpc started with pid {proc.pid}")
+
+        deadline = time.time() + self.ready_timeout
+        while time.time() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f'frpc exited during startup with code {proc.returncode}')
+            if self._is_ready(log_offset):
+                self._update_state(expect_pid=proc.pid, state='running', ready_at=time.time())
+                return {'pid': proc.pid, 'ready_in': round(time.time() - started_at, 3)}
+            time.sleep(0.2)
+
+        self._update_state(expect_pid=proc.pid, state='unready')
+        raise RuntimeError(f'frpc (pid {proc.pid}) not ready within {self.ready_timeout}s')
+
+    def _terminate(self, pid):
+        self._update_state(expect_pid=pid, state='stopping')
+        with self._lock:
+            proc = self._proc if self._proc is not None and self._proc.pid == pid else None
+
+        # 先删除PID文件，其他 worker 据此判断为主动停止而不再重启
+        self._remove_pid_file(pid)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+        deadline = time.time() + FRPC_STOP_TIMEOUT
+        while time.time() < deadline and _pid_alive(pid, proc):
+            time.sleep(0.1)
+        if _pid_alive(pid, proc):
+            logger.warning(f"frpc (pid {pid}) did not exit, killing")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            if proc is not None:
+                proc.wait(5)
+
+        with self._lock:
+            if proc is not None and self._proc is proc:
+                self._proc = None
+        self._update_state(expect_pid=pid, pid=None, state='stopped')
+
+    def _monitor(self, proc):
+        """等待本 worker 启动的子进程退出并记录退出码"""
+        returncode = proc.wait()
+        with self._lock:
+            if self._proc is proc:
+                self._proc = None
+        delay = self._record_exit(proc.pid, returncode)
+        if delay is not None:
+            # 本 worker 按时重启；其他 worker 的监视循环在 respawn_at 之后也会尝试（只有一个会启动）
+            timer = threading.Timer(delay, self.submit, args=('respawn',))
+            timer.daemon = True
+            timer.start()
+
+    def _record_exit(self, pid, returncode):
+        """
+        记录 frpc 退出，非主动停止时计算退避时间
+
+        Returns:
+            float: 重启前的等待秒数，不需要重启（主动停止或已被记录）时返回 None
+        """
+        now = time.time()
+        with self._pid_lock():
+            state = self._read_state()
+            if state['pid'] != pid:
+                return None
+            state.update(pid=None, last_exit={'code': returncode, 'at': now})
+            if state['state'] == 'stopping' or not state['want_running']:
+                state['state'] = 'stopped'
+                self._write_state(state)
+                return None
+
+            if now - (state['started_at'] or now) >= FRPC_BACKOFF_RESET:
+                state['backoff_attempt'] = 0
+            delay = min(FRPC_BACKOFF_BASE * (2 ** state['backoff_attempt']), FRPC_BACKOFF_MAX)
+            state.update(state='backoff', backoff_attempt=state['backoff_attempt'] + 1, respawn_at=now + delay)
+            self._write_state(state)
+            self._remove_pid_file(pid)
+
+        logger.warning(f"frpc (pid {pid}) exited with code {returncode}, restarting in {delay}s")
+        return delay
+
+    def _is_ready(self, log_offset):
+        if self._readiness is not None:
+            return self._readiness(log_offset)
+
+        admin = self._admin_client()
+        if admin is not None:
+            return admin.is_ready()
+        return _log_contains(self.log_path, log_offset, FRPC_READY_MARKER)
+
+    def _admin_client(self):
+        try:
+            config = get_frp_config_cache().get(self.config_path)
+        except Exception:
+            config = None
+        return get_admin_client(config)
+
+    # ========== 监视循环 ==========
+
+    def watch(self):
+        """启动本 worker 的监视循环（重复调用无副作用）"""
+        with self._lock:
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch_loop, name='frpc-watch', daemon=True)
+                self._watcher.start()
+        return self
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"frpc watch failed: {e}")
+
+    def check(self):
+        """
+        检查一次：记录未被发现的退出（启动它的 worker 已不在），到达退避时间后提交重启
+
+        Returns:
+            SupervisorJob: 提交的重启任务，无需重启时返回 None
+        """
+        state = self._read_state()
+        pid = state['pid']
+        if pid and not (_pid_alive(pid) and _is_frpc(pid, self.bin_path)):
+            with self._lock:
+                owned = self._proc is not None and self._proc.pid == pid
+            # 本 worker 启动的进程由 _monitor 记录退出码
+            if not owned:
+                self._record_exit(pid, None)
+                state = self._read_state()
+        if state['want_running'] and state['pid'] is None and (state['respawn_at'] or 0) <= time.time():
+            return self.submit('respawn')
+        return None
+
+    # ========== PID / 状态文件 ==========
+
+    def _pid_lock(self):
+        return FileLock(self.pid_file + '.lock')
+
+    def _read_pid_file(self):
+        try:
+            with open(self.pid_file) as f:
+                return int(f.read().strip() or 0) or None
+        except (OSError, ValueError):
+            return None
+
+    def _write_pid_file(self, pid):
+        try:
+            with open(self.pid_file, 'w') as f:
+                f.write(str(pid))
+        except OSError as e:
+            logger.warning(f"Cannot write frpc pid file: {e}")
+
+    def _remove_pid_file(self, pid):
+        if self._read_pid_file() == pid:
+            try:
+                os.remove(self.pid_file)
+            except OSError:
+                pass
+
+    def _read_state(self):
+        try:
+            with open(self.state_file) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        state = dict(_DEFAULT_STATE, **{k: v for k, v in data.items() if k in _DEFAULT_STATE})
+        state['jobs'] = list(state['jobs'])
+        return state
+
+    def _write_state(self, state):
+        """原子替换状态文件（调用方持有PID文件锁）"""
+        tmp = f'{self.state_file}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            logger.warning(f"Cannot write frpc state file: {e}")
+
+    def _update_state(self, expect_pid=None, **changes):
+        """
+        在锁内修改共享状态
+
+        Args:
+            expect_pid: 仅当状态中的 pid 等于该值时修改（防止覆盖新进程的状态）
+        """
+        with self._pid_lock():
+            state = self._read_state()
+            if expect_pid is not None and state['pid'] != expect_pid:
+                return state
+            state.update(changes)
+            self._write_state(state)
+            return state
+
+    # ========== 状态 ==========
+
+    def status(self):
+        """进程状态（读取共享状态文件，各 worker 结果一致）"""
+        state = self._read_state()
+        pid = self._running_pid()
+        current = state['state']
+        if pid is None and current in ('running', 'starting', 'unready'):
+            current = 'stopped'
+        tracked = pid is not None and pid == state['pid']
+        with self._lock:
+            managed = self._proc is not None and self._proc.pid == pid
+        return {
+            'state': current,
+            'pid': pid,
+            'managed': managed,
+            'owner': state['owner'] if tracked else None,
+            'started_at': state['started_at'] if tracked else None,
+            'uptime': round(time.time() - state['started_at'], 1) if tracked and state['started_at'] else None,
+            'ready_at': state['ready_at'] if tracked else None,
+            'restarts': state['restarts'],
+            'last_exit': state['last_exit'],
+            'respawn_at': state['respawn_at'] if current == 'backoff' else None
+        }
+
+
+def _pid_alive(pid, proc=None):
+    if proc is not None:
+        return proc.poll() is None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # 已退出但尚未被父进程回收（僵尸进程）
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            return f.read().rsplit(b')', 1)[1].split()[0] != b'Z'
+    except (OSError, IndexError):
+        return True
+
+
+def _is_frpc(pid, bin_path):
+    """确认PID对应的是 frpc 进程（防止PID被复用）"""
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            cmdline = f.read().split(b'\0')
+    except OSError:
+        return True
+    name = os.path.basename(bin_path).encode()
+    return any(os.path.basename(arg) == name for arg in cmdline[:2])
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _log_contains(path, offset, marker):
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return marker in f.read(1024 * 1024)
+    except OSError:
+        return False
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_frp_supervisor():
+    """获取全局 frpc 进程管理器"""
+    global _supervisor
+    if _supervisor is None:
+        with _supervisor_lock:
+            if _supervisor is None:
+                _supervisor = FrpSupervisor().watch()
+    return _supervisor
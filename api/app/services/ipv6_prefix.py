@@ -0,0 +1,224 @@
+"""
+IPv6 前缀跟踪模块
+只读取本机网卡地址（不访问外部服务），按网卡记录当前的全局 IPv6 地址和运营商下发的前缀；
+前缀轮换后按 "前缀 + 主机后缀" 重新计算局域网内各主机的地址，供 AAAA 记录与 A 记录一起批量更新。
+容器中只能看到容器自己的网卡，需要使用主机网络（docker-compose 中的 ddns-daemon 服务）才能读到主机的全局 IPv6
+"""
+
+import os
+import time
+import socket
+import logging
+import ipaddress
+import threading
+
+try:
+    import psutil
+    psutil_available = True
+except ImportError:
+    psutil_available = False
+
+logger = logging.getLogger(__name__)
+
+# 优先使用的网卡（为空时取第一个有全局地址的网卡）
+DDNS_IPV6_INTERFACE = os.getenv('DDNS_IPV6_INTERFACE', '')
+# 运营商下发的前缀长度（如 /56），为空时使用网卡地址的前缀长度（通常为 /64）
+DDNS_IPV6_PREFIX_LEN = os.getenv('DDNS_IPV6_PREFIX_LEN', '')
+# 局域网主机的 AAAA 记录，逗号分隔的 rr@domain=后缀[/网卡]，如 nas@0379.email=::1:211:32ff:fe12:3456/eth0
+DDNS_IPV6_HOSTS = os.getenv('DDNS_IPV6_HOSTS', '')
+# 前缀变化历史保留条数
+PREFIX_HISTORY_SIZE = 20
+
+
+def _netmask_prefix_len(netmask):
+    """'ffff:ffff:ffff:ffff::' 或 '64' -> 64"""
+    if not netmask:
+        return 64
+    try:
+        return int(netmask)
+    except ValueError:
+        return bin(int(ipaddress.IPv6Address(netmask.split('/')[0]))).count('1')
+
+
+def _is_eui64(address):
+    """接口标识由 MAC 生成（稳定，不会像临时隐私地址一样轮换）"""
+    return (int(address) >> 24) & 0xffff == 0xfffe
+
+
+def local_ipv6_addresses():
+    """
+    读取网卡上的 IPv6 地址
+
+    Returns:
+        dict: {网卡: [(地址, 子网掩码), ...]}
+    """
+    if not psutil_available:
+        return {}
+    return {
+        name: [(addr.address, addr.netmask) for addr in addrs if addr.family == socket.AF_INET6]
+        for name, addrs in psutil.net_if_addrs().items()
+    }
+
+
+def warn_missing_ipv6(count):
+    """配置了 AAAA 记录但本机网卡没有全局 IPv6 地址时记录警告（这些记录会被跳过）"""
+    logger.warning(
+        f"{count} AAAA record(s) configured but no global IPv6 address found on local interfaces, skipping them; "
+        f"inside a container this requires host networking (network_mode: host, as the ddns-daemon service uses)"
+    )
+
+
+def combine(prefix, suffix):
+    """
+    前缀 + 主机后缀
+
+    Args:
+        prefix: IPv6Network（前缀）
+        suffix: 主机后缀（如 ::1:211:32ff:fe12:3456），超出前缀长度的高位被忽略
+    """
+    suffix = int(ipaddress.IPv6Address(suffix))
+    return ipaddress.IPv6Address(int(prefix.network_address) | (suffix & int(prefix.hostmask)))
+
+
+def parse_hosts(spec=None):
+    """
+    解析主机后缀配置
+
+    Returns:
+        list: [{'domain', 'rr', 'suffix', 'interface'}]
+    """
+    hosts = []
+    for item in (spec if spec is not None else DDNS_IPV6_HOSTS).split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, value = item.partition('=')
+        rr, at, domain = name.rpartition('@')
+        if not sep or not at or not rr or not domain:
+            raise ValueError(f'invalid IPv6 host {item!r}, expected rr@domain=suffix[/interface]')
+        suffix, _, interface = value.partition('/')
+        ipaddress.IPv6Address(suffix)
+        hosts.append({'domain': domain.lower(), 'rr': rr, 'suffix': suffix, 'interface': interface or None})
+    return hosts
+
+
+class Ipv6PrefixTracker:
+    """按网卡跟踪 IPv6 前缀"""
+
+    def __init__(self, reader=None, interface=None, prefix_len=None, hosts=None):
+        """
+        Args:
+            reader: 地址读取函数（默认读取本机网卡，测试时可替换）
+            interface: 优先使用的网卡
+            prefix_len: 下发前缀长度（None 表示使用网卡地址的前缀长度）
+            hosts: parse_hosts() 的结果
+        """
+        self.reader = reader or local_ipv6_addresses
+        self.interface = interface if interface is not None else DDNS_IPV6_INTERFACE
+        if prefix_len is None and DDNS_IPV6_PREFIX_LEN:
+            prefix_len = int(DDNS_IPV6_PREFIX_LEN)
+        self.prefix_len = prefix_len
+        self.hosts = parse_hosts() if hosts is None else hosts
+        self._lock = threading.Lock()
+        self._prefixes = {}
+        self._history = []
+
+    def scan(self):
+        """
+        读取各网卡当前的全局地址和前缀，并记录前缀变化
+
+        Returns:
+            dict: {网卡: {'address', 'prefix', 'prefixLength'}}
+        """
+        interfaces = {}
+        for name, addrs in self.reader().items():
+            candidates = []
+            for text, netmask in addrs:
+                try:
+                    address = ipaddress.IPv6Address(text.split('%')[0])
+                except ValueError:
+                    continue
+                # 排除链路本地、ULA、回环等非全局地址
+                if not address.is_global:
+                    continue
+                length = self.prefix_len or _netmask_prefix_len(netmask)
+                candidates.append((address, length))
+            if not candidates:
+                continue
+            # 优先 EUI-64 稳定地址，其次按地址排序保证结果确定
+            address, length = min(candidates, key=lambda c: (not _is_eui64(c[0]), int(c[0])))
+            prefix = ipaddress.IPv6Network((int(address), length), strict=False)
+            interfaces[name] = {'address': str(address), 'prefix': str(prefix), 'prefixLength': length}
+
+        now = time.time()
+        with self._lock:
+            for name, info in interfaces.items():
+                old = self._prefixes.get(name)
+                if old is not None and old != info['prefix']:
+                    logger.info(f"IPv6 prefix changed on {name}: {old} -> {info['prefix']}")
+                    self._history.append({'time': now, 'interface': name, 'old': old, 'new': info['prefix']})
+                    del self._history[:-PREFIX_HISTORY_SIZE]
+                self._prefixes[name] = info['prefix']
+        return interfaces
+
+    def primary(self, interfaces=None):
+        """用于普通 AAAA 记录的本机地址信息（优先 DDNS_IPV6_INTERFACE），没有全局地址时返回 None"""
+        interfaces = self.scan() if interfaces is None else interfaces
+        if self.interface:
+            return interfaces.get(self.interface)
+        for name in sorted(interfaces):
+            return interfaces[name]
+        return None
+
+    def host_addresses(self, interfaces=None):
+        """
+        按前缀计算局域网主机地址
+
+        Returns:
+            dict: {(domain, rr, 'AAAA'): 地址}
+        """
+        interfaces = self.scan() if interfaces is None else interfaces
+        primary = self.primary(interfaces)
+        addresses = {}
+        for host in self.hosts:
+            info = interfaces.get(host['interface']) if host['interface'] else primary
+            if info is None:
+                continue
+            addresses[(host['domain'], host['rr'], 'AAAA')] = str(
+                combine(ipaddress.IPv6Network(info['prefix']), host['suffix'])
+            )
+        return addresses
+
+    def snapshot(self):
+        """
+        一次读取得到的双栈更新输入
+
+        Returns:
+            dict: {'address': 本机地址或 None, 'hosts': {(domain, rr, 'AAAA'): 地址}, 'interfaces'}
+        """
+        interfaces = self.scan()
+        primary = self.primary(interfaces)
+        return {
+            'address': primary['address'] if primary else None,
+            'hosts': self.host_addresses(interfaces),
+            'interfaces': interfaces
+        }
+
+    def history(self):
+        """前缀变化历史"""
+        with self._lock:
+            return list(self._history)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_ipv6_tracker():
+    """获取全局 IPv6 前缀跟踪器"""
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = Ipv6PrefixTracker()
+    return _tracker
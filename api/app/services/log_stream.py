@@ -0,0 +1,416 @@
+"""
+日志实时推送模块
+每个日志文件只有一个后台监视线程，轮询 inode/大小读取新追加的内容，逐行解析级别后写入共享环形缓冲区，
+所有订阅者从缓冲区读取并按级别/正则过滤，通过 Server-Sent Events 推送；
+inode 变化视为日志轮转（先读完旧文件再切换），文件变小视为被截断
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import deque
+from itertools import islice
+
+from app.utils.log_tail import tail_lines
+
+logger = logging.getLogger(__name__)
+
+# 轮询间隔（秒）、缓冲行数、单次轮询最多读取的字节数、单行最大长度、心跳间隔（秒）
+LOG_STREAM_POLL_INTERVAL = float(os.getenv('LOG_STREAM_POLL_INTERVAL', '0.5'))
+LOG_STREAM_BUFFER_LINES = int(os.getenv('LOG_STREAM_BUFFER_LINES', '2000'))
+LOG_STREAM_MAX_READ = 4 * 1024 * 1024
+LOG_STREAM_MAX_LINE = 64 * 1024
+LOG_STREAM_HEARTBEAT = 15
+
+LOG_LEVELS = {'trace': 0, 'debug': 1, 'info': 2, 'warn': 3, 'error': 4}
+
+# frpc 格式 "[I] [service.go:301]"，以及 Python logging 的 "INFO"/"ERROR"
+_FRP_LEVEL = re.compile(r'\[([TDIWE])\]')
+_WORD_LEVEL = re.compile(r'\b(TRACE|DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL|FATAL)\b')
+_FRP_LEVEL_NAMES = {'T': 'trace', 'D': 'debug', 'I': 'info', 'W': 'warn', 'E': 'error'}
+_WORD_LEVEL_NAMES = {
+    'TRACE': 'trace', 'DEBUG': 'debug', 'INFO': 'info', 'WARN': 'warn', 'WARNING': 'warn',
+    'ERROR': 'error', 'CRITICAL': 'error', 'FATAL': 'error'
+}
+
+
+def parse_level(line):
+    """识别日志行级别，无法识别时返回 None"""
+    match = _FRP_LEVEL.search(line, 0, 80)
+    if match:
+        return _FRP_LEVEL_NAMES[match.group(1)]
+    match = _WORD_LEVEL.search(line, 0, 120)
+    if match:
+        return _WORD_LEVEL_NAMES[match.group(1)]
+    return None
+
+
+class LogFilter:
+    """订阅者的服务端过滤条件"""
+
+    def __init__(self, level=None, pattern=None):
+        """
+        Args:
+            level: 最低日志级别（trace/debug/info/warn/error）
+            pattern: 正则表达式
+
+        Raises:
+            ValueError: 级别或正则无效
+        """
+        if level and level not in LOG_LEVELS:
+            raise ValueError(f'Invalid level: {level}')
+        self.min_level = LOG_LEVELS[level] if level else None
+        try:
+            self.pattern = re.compile(pattern) if pattern else None
+        except re.error as e:
+            raise ValueError(f'Invalid pattern: {e}')
+
+    def match(self, line, level):
+        if self.min_level is not None and LOG_LEVELS.get(level or 'info') < self.min_level:
+            return False
+        if self.pattern is not None and not self.pattern.search(line):
+            return False
+        return True
+
+
+class LogWatcher:
+    """单个日志文件的共享监视器"""
+
+    def __init__(self, path, poll_interval=None, buffer_lines=None):
+        self.path = path
+        self.poll_interval = poll_interval or LOG_STREAM_POLL_INTERVAL
+        self._cond = threading.Condition()
+        # 缓冲区元素: (seq, event, text, level, position)，seq 连续递增（仅本进程内有效），
+        # position 为 (inode, 该行结束处的字节偏移)，用作跨进程/重启有效的 SSE 事件ID
+        self._buffer = deque(maxlen=buffer_lines or LOG_STREAM_BUFFER_LINES)
+        self._seq = 0
+        self._subscribers = 0
+        self._thread = None
+        self._file = None
+        self._inode = None
+        self._offset = 0
+        self._partial = b''
+        # 最后发布的条目在文件中的结束位置（与 _seq 一起在锁内更新）
+        self._published = None
+
+    # ========== 订阅 ==========
+
+    @property
+    def seq(self):
+        return self._seq
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    @property
+    def position(self):
+        """已发布内容在文件中的位置 (inode, 偏移)，文件尚未打开时为 None"""
+        return self._published
+
+    def subscribe(self):
+        """
+        增加订阅者，必要时启动监视线程
+
+        Returns:
+            tuple: (当前序号, 当前位置)，订阅者从该序号之后开始读取
+        """
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                # 在监视线程启动前打开文件，使返回的位置与序号对应
+                if self._file is None:
+                    try:
+                        self._open(os.stat(self.path).st_size)
+                    except OSError:
+                        pass
+                self._thread = threading.Thread(
+                    target=self._run, name=f'log-watch-{os.path.basename(self.path)}', daemon=True
+                )
+                self._thread.start()
+            return self._seq, self.position
+
+    def unsubscribe(self):
+        """减少订阅者，没有订阅者时监视线程自行退出"""
+        with self._cond:
+            self._subscribers = max(self._subscribers - 1, 0)
+
+    def find(self, position):
+        """缓冲区中结束于指定位置的条目序号，不在缓冲区中时返回 None"""
+        with self._cond:
+            for seq, _, _, _, entry_position in reversed(self._buffer):
+                if entry_position == position:
+                    return seq
+        return None
+
+    def read(self, after_seq, timeout):
+        """
+        读取指定序号之后的条目，没有新条目时最多等待 timeout 秒
+
+        Returns:
+            tuple: (条目列表, 因缓冲区溢出而丢失的条目数)
+        """
+        with self._cond:
+            if self._seq <= after_seq:
+                self._cond.wait(timeout)
+            if self._seq <= after_seq:
+                return [], 0
+            first_seq = self._seq - len(self._buffer) + 1
+            start = max(after_seq + 1, first_seq)
+            return list(islice(self._buffer, start - first_seq, None)), start - after_seq - 1
+
+    # ========== 监视线程 ==========
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._subscribers == 0:
+                    # 在锁内关闭，避免与新启动的监视线程交错
+                    self._close()
+                    self._thread = None
+                    return
+            try:
+                self._poll()
+            except Exception as e:
+                logger.error(f"Log watcher error on {self.path}: {e}")
+            time.sleep(self.poll_interval)
+
+    def _poll(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # 已轮转但新文件尚未创建，读完旧文件
+            if self._file is not None:
+                self._drain()
+            return
+
+        if self._file is None:
+            # 首次打开从末尾开始，只推送新内容
+            self._open(st.st_size)
+            return
+
+        if st.st_ino != self._inode:
+            self._drain()
+            self._flush_partial()
+            self._close()
+            self._open(0)
+            self._publish_event('rotate')
+        elif st.st_size < self._offset:
+            self._file.seek(0)
+            self._offset = 0
+            self._partial = b''
+            self._publish_event('truncate')
+
+        if st.st_size > self._offset:
+            self._drain()
+
+    def _open(self, offset):
+        f = open(self.path, 'rb')
+        st = os.fstat(f.fileno())
+        offset = min(offset, st.st_size)
+        f.seek(offset)
+        self._file = f
+        self._inode = st.st_ino
+        self._offset = offset
+        self._partial = b''
+        with self._cond:
+            self._published = (self._inode, offset)
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _drain(self):
+        """读取新追加的内容"""
+        remaining = LOG_STREAM_MAX_READ
+        while remaining > 0:
+            data = self._file.read(min(remaining, 256 * 1024))
+            if not data:
+                break
+            self._offset += len(data)
+            remaining -= len(data)
+            self._consume(data)
+
+    def _consume(self, data):
+        # 本次数据之前已发布内容的结束位置
+        position = self._offset - len(data) - len(self._partial)
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        entries = []
+        for raw in lines:
+            position += len(raw) + 1
+            text = raw.decode('utf-8', errors='replace').rstrip('\r')
+            if text:
+                entries.append(('log', text, parse_level(text), (self._inode, position)))
+        if len(self._partial) > LOG_STREAM_MAX_LINE:
+            entries.append(self._partial_entry(position + len(self._partial)))
+        self._publish(entries)
+
+    def _partial_entry(self, position):
+        text = self._partial.decode('utf-8', errors='replace').rstrip('\r')
+        self._partial = b''
+        return 'log', text, parse_level(text), (self._inode, position)
+
+    def _flush_partial(self):
+        if self._partial:
+            self._publish([self._partial_entry(self._offset)])
+
+    def _publish_event(self, event):
+        self._publish([(event, '', None, (self._inode, self._offset - len(self._partial)))])
+
+    def _publish(self, entries):
+        if not entries:
+            return
+        with self._cond:
+            for event, text, level, position in entries:
+                self._seq += 1
+                self._buffer.append((self._seq, event, text, level, position))
+                self._published = position
+            self._cond.notify_all()
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def get_log_watcher(path):
+    """获取日志文件的共享监视器"""
+    with _watchers_lock:
+        watcher = _watchers.get(path)
+        if watcher is None:
+            watcher = LogWatcher(path)
+            _watchers[path] = watcher
+        return watcher
+
+
+def format_event_id(position):
+    """(inode, 偏移) -> SSE 事件ID 'inode:偏移'"""
+    return f'{position[0]}:{position[1]}' if position else None
+
+
+def parse_event_id(event_id):
+    """SSE 事件ID -> (inode, 偏移)，无效时返回 None"""
+    inode, sep, offset = (event_id or '').partition(':')
+    try:
+        return (int(inode), int(offset)) if sep else None
+    except ValueError:
+        return None
+
+
+def _read_range(path, position, end):
+    """
+    从文件中读取 [position, end) 之间的完整行（用于重连补发不在缓冲区中的内容）
+
+    Returns:
+        tuple: ([(text, (inode, 行结束偏移)), ...], 是否从头截断)
+    """
+    inode, offset = position
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_ino != inode:
+            return None, False
+        truncated = end - offset > LOG_STREAM_MAX_READ
+        if truncated:
+            offset = end - LOG_STREAM_MAX_READ
+        f.seek(offset)
+        data = f.read(end - offset)
+    lines = data.split(b'\n')
+    lines.pop()
+    if truncated and lines:
+        # 截断处可能在行中间，丢弃第一段
+        offset += len(lines.pop(0)) + 1
+    result = []
+    for raw in lines:
+        offset += len(raw) + 1
+        text = raw.decode('utf-8', errors='replace').rstrip('\r')
+        if text:
+            result.append((text, (inode, offset)))
+    return result, truncated
+
+
+def _sse(event, data, event_id=None):
+    message = ''
+    if event_id is not None:
+        message += f'id: {event_id}\n'
+    message += f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+    return message
+
+
+def sse_log_stream(path, log_filter, tail=0, last_event_id=None):
+    """
+    生成日志 SSE 事件流
+
+    事件ID为文件位置 'inode:偏移'（而不是进程内序号），客户端重连到其他 worker 或服务重启后仍能从断点继续：
+    位置在本进程缓冲区中时从缓冲区补发，否则直接从文件读取补发；文件已轮转无法定位时发送 gap 事件
+
+    Args:
+        path: 日志文件路径
+        log_filter: LogFilter
+        tail: 开始推送前先发送的最近行数
+        last_event_id: 客户端重连时的 Last-Event-ID
+
+    Yields:
+        str: SSE 消息
+    """
+    watcher = get_log_watcher(path)
+    seq, position = watcher.subscribe()
+    try:
+        resume = parse_event_id(last_event_id)
+        if resume is not None:
+            found = watcher.find(resume)
+            if found is not None:
+                # 从缓冲区补发，ready 事件的ID保持为断点位置
+                seq, position = found, resume
+            elif position is not None and resume[0] == position[0] and resume[1] <= position[1]:
+                try:
+                    lines, truncated = _read_range(path, resume, position[1])
+                except OSError:
+                    lines, truncated = None, False
+                if lines is None:
+                    yield _sse('gap', {'dropped': None})
+                else:
+                    if truncated:
+                        yield _sse('gap', {'dropped': None})
+                    for text, line_position in lines:
+                        level = parse_level(text)
+                        if log_filter.match(text, level):
+                            yield _sse('log', {'line': text, 'level': level}, format_event_id(line_position))
+            elif resume != position:
+                # 文件已轮转或位置无效，无法补发
+                yield _sse('gap', {'dropped': None})
+        elif tail > 0 and os.path.exists(path):
+            for line in tail_lines(path, tail)['lines']:
+                line = line.rstrip('\r\n')
+                level = parse_level(line)
+                if log_filter.match(line, level):
+                    yield _sse('log', {'line': line, 'level': level})
+
+        yield _sse('ready', {'path': os.path.basename(path)}, format_event_id(position))
+
+        last_sent = time.time()
+        while True:
+            entries, dropped = watcher.read(seq, LOG_STREAM_HEARTBEAT)
+            if dropped:
+                yield _sse('gap', {'dropped': dropped})
+
+            messages = []
+            for entry_seq, event, text, level, entry_position in entries:
+                seq = entry_seq
+                event_id = format_event_id(entry_position)
+                if event != 'log':
+                    messages.append(_sse(event, {}, event_id))
+                elif log_filter.match(text, level):
+                    messages.append(_sse('log', {'line': text, 'level': level}, event_id))
+
+            if messages:
+                yield ''.join(messages)
+                last_sent = time.time()
+            elif time.time() - last_sent >= LOG_STREAM_HEARTBEAT:
+                # 心跳，同时用于发现已断开的客户端
+                yield ': ping\n\n'
+                last_sent = time.time()
+    finally:
+        watcher.unsubscribe()
@@ -0,0 +1,121 @@
+"""
+指标时序存储模块
+使用SQLite按 (series, ts) 聚簇存储数值样本，供容量趋势、隧道延迟等功能记录和查询历史
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+# 时序数据库路径与默认保留时间（天）
+METRICS_DB_PATH = os.getenv('METRICS_DB_PATH', '/app/data/metrics.db')
+METRICS_RETENTION_DAYS = int(os.getenv('METRICS_RETENTION_DAYS', '400'))
+# 清理过期样本的周期（秒，由 Celery beat 调度，<= 0 表示不清理）
+METRICS_PRUNE_INTERVAL = int(os.getenv('METRICS_PRUNE_INTERVAL', '86400'))
+
+
+class MetricsStore:
+    """指标时序存储"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or METRICS_DB_PATH
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        if self.db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS samples (
+                    series TEXT NOT NULL,
+                    ts REAL NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (series, ts)
+                ) WITHOUT ROWID
+            ''')
+
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def record(self, series, value, ts=None):
+        """记录单个样本"""
+        self.record_many([(series, value, ts)])
+
+    def record_many(self, samples):
+        """
+        批量记录样本
+
+        Args:
+            samples: [(series, value, ts), ...]，ts 为 None 时使用当前时间
+        """
+        now = time.time()
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO samples (series, ts, value) VALUES (?, ?, ?)',
+                [(series, ts if ts is not None else now, float(value)) for series, value, ts in samples]
+            )
+
+    def query(self, series, since=None, until=None, limit=None):
+        """
+        查询样本
+
+        Args:
+            series: 序列名
+            since: 起始时间戳（不含）
+            until: 结束时间戳（含）
+            limit: 最多返回的样本数（取最新的样本）
+
+        Returns:
+            list: [(ts, value), ...]，按时间升序
+        """
+        sql = 'SELECT ts, value FROM samples WHERE series = ?'
+        params = [series]
+        if since is not None:
+            sql += ' AND ts > ?'
+            params.append(since)
+        if until is not None:
+            sql += ' AND ts <= ?'
+            params.append(until)
+        if limit:
+            sql = f'SELECT ts, value FROM ({sql} ORDER BY ts DESC LIMIT ?) ORDER BY ts'
+            params.append(limit)
+        else:
+            sql += ' ORDER BY ts'
+        return self._connect().execute(sql, params).fetchall()
+
+    def latest(self, series):
+        """获取最新样本 (ts, value)，没有数据时返回 None"""
+        return self._connect().execute(
+            'SELECT ts, value FROM samples WHERE series = ? ORDER BY ts DESC LIMIT 1', (series,)
+        ).fetchone()
+
+    def prune(self, retention_days=None):
+        """删除超过保留时间的样本"""
+        cutoff = time.time() - (retention_days or METRICS_RETENTION_DAYS) * 86400
+        conn = self._connect()
+        with self._write_lock, conn:
+            return conn.execute('DELETE FROM samples WHERE ts < ?', (cutoff,)).rowcount
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_metrics_store():
+    """获取全局指标时序存储"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = MetricsStore()
+    return _store
@@ -0,0 +1,243 @@
+"""
+公网IP检测模块
+先检查本机网卡是否直接持有公网地址，没有时并发请求多个外部IP查询服务，采用最先返回的有效结果；
+检测结果按短 TTL 缓存，并发请求合并为一次检测，状态接口几乎不产生额外延迟
+"""
+
+import os
+import time
+import logging
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+
+try:
+    import psutil
+    psutil_available = True
+except ImportError:
+    psutil_available = False
+
+logger = logging.getLogger(__name__)
+
+# 外部IP查询服务（逗号分隔，返回纯文本IP）
+DDNS_IP_SOURCES = [
+    url.strip() for url in os.getenv(
+        'DDNS_IP_SOURCES',
+        'https://api.ipify.org,https://ifconfig.me/ip,https://icanhazip.com,https://ipinfo.io/ip'
+    ).split(',') if url.strip()
+]
+# 缓存有效期（秒）、检测失败后的缓存时间（秒）、单个服务超时（秒）
+DDNS_IP_CACHE_TTL = float(os.getenv('DDNS_IP_CACHE_TTL', '60'))
+DDNS_IP_FAILURE_TTL = float(os.getenv('DDNS_IP_FAILURE_TTL', '10'))
+DDNS_IP_TIMEOUT = float(os.getenv('DDNS_IP_TIMEOUT', '3'))
+# 固定返回的IP（测试和离线开发环境使用，设置后不访问网络）
+DDNS_IP_STUB = os.getenv('DDNS_IP_STUB', '')
+
+
+class IpSourceError(Exception):
+    """IP查询失败"""
+
+
+def parse_public_ip(text, version=4):
+    """
+    校验并返回公网IP文本
+
+    Raises:
+        IpSourceError: 不是指定版本的公网IP
+    """
+    try:
+        address = ipaddress.ip_address(text.strip())
+    except ValueError:
+        raise IpSourceError(f'invalid IP: {text.strip()[:64]!r}')
+    if address.version != version or not address.is_global:
+        raise IpSourceError(f'not a public IPv{version} address: {address}')
+    return str(address)
+
+
+class StaticIpSource:
+    """固定IP（测试桩）"""
+
+    def __init__(self, ip, name='static'):
+        self.ip = ip
+        self.name = name
+
+    def fetch(self, timeout):
+        return self.ip
+
+
+class InterfaceIpSource:
+    """本机网卡上的公网地址（服务器直接持有公网IP时无需访问外部服务）"""
+
+    name = 'interface'
+
+    def __init__(self, version=4):
+        self.version = version
+
+    def fetch(self, timeout):
+        if not psutil_available:
+            raise IpSourceError('psutil not available')
+        for addrs in psutil.net_if_addrs().values():
+            for addr in addrs:
+                try:
+                    return parse_public_ip(addr.address.split('%')[0], self.version)
+                except IpSourceError:
+                    continue
+        raise IpSourceError('no public address on local interfaces')
+
+
+class HttpIpSource:
+    """返回纯文本IP的外部查询服务"""
+
+    def __init__(self, url, session, version=4):
+        self.url = url
+        self.name = url
+        self.session = session
+        self.version = version
+
+    def fetch(self, timeout):
+        try:
+            response = self.session.get(self.url, timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise IpSourceError(str(e))
+        return parse_public_ip(response.text, self.version)
+
+
+class PublicIpDetector:
+    """公网IP检测器"""
+
+    def __init__(self, sources, local_sources=None, ttl=None, failure_ttl=None, timeout=None):
+        """
+        Args:
+            sources: 并发竞速的外部来源
+            local_sources: 优先依次检查的本地来源（网卡、测试桩）
+        """
+        self.sources = list(sources)
+        self.local_sources = list(local_sources or [])
+        self.ttl = DDNS_IP_CACHE_TTL if ttl is None else ttl
+        self.failure_ttl = DDNS_IP_FAILURE_TTL if failure_ttl is None else failure_ttl
+        self.timeout = timeout or DDNS_IP_TIMEOUT
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.sources)), thread_name_prefix='public-ip')
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._result = None
+        self._expires = 0
+
+    def get(self, force=False):
+        """
+        获取公网IP
+
+        Args:
+            force: 忽略缓存重新检测（仍与进行中的检测合并）
+
+        Returns:
+            dict: {'ip', 'source', 'detectedAt', 'cached', 'latency', 'errors'}，检测失败时 ip 为 None
+        """
+        with self._lock:
+            now = time.time()
+            if not force and self._result is not None and now < self._expires:
+                return dict(self._result, cached=True)
+            inflight = self._inflight
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight = threading.Event()
+
+        if not leader:
+            inflight.wait(self.timeout * 2)
+            with self._lock:
+                if self._result is not None:
+                    return dict(self._result, cached=True)
+
+        try:
+            result = self._detect()
+            with self._lock:
+                self._result = result
+                self._expires = time.time() + (self.ttl if result['ip'] else self.failure_ttl)
+        finally:
+            if leader:
+                with self._lock:
+                    self._inflight = None
+                inflight.set()
+        return dict(result, cached=False)
+
+    def invalidate(self):
+        """清除缓存（例如网络切换后）"""
+        with self._lock:
+            self._result = None
+            self._expires = 0
+
+    def _detect(self):
+        start = time.perf_counter()
+        errors = {}
+        for source in self.local_sources:
+            try:
+                ip = source.fetch(self.timeout)
+                return self._make_result(ip, source.name, start, errors)
+            except IpSourceError as e:
+                errors[source.name] = str(e)
+
+        if self.sources:
+            futures = {self._executor.submit(source.fetch, self.timeout): source for source in self.sources}
+            pending = set(futures)
+            deadline = time.monotonic() + self.timeout + 1
+            while pending:
+                done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    source = futures[future]
+                    try:
+                        ip = future.result()
+                    except Exception as e:
+                        errors[source.name] = str(e)
+                        continue
+                    # 其余请求在后台自然结束，不等待
+                    for other in pending:
+                        other.cancel()
+                    return self._make_result(ip, source.name, start, errors)
+            for future in pending:
+                errors.setdefault(futures[future].name, 'timeout')
+
+        logger.warning(f"Public IP detection failed: {errors}")
+        return self._make_result(None, None, start, errors)
+
+    @staticmethod
+    def _make_result(ip, source, start, errors):
+        return {
+            'ip': ip,
+            'source': source,
+            'detectedAt': time.time(),
+            'latency': round((time.perf_counter() - start) * 1000, 1),
+            'errors': errors
+        }
+
+
+def create_default_detector():
+    """按环境变量创建检测器"""
+    if DDNS_IP_STUB:
+        return PublicIpDetector([], local_sources=[StaticIpSource(DDNS_IP_STUB)])
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=len(DDNS_IP_SOURCES) or 1, pool_maxsize=2)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = 'curl/8.0'
+    return PublicIpDetector(
+        [HttpIpSource(url, session) for url in DDNS_IP_SOURCES],
+        local_sources=[InterfaceIpSource()]
+    )
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_public_ip_detector():
+    """获取全局公网IP检测器"""
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = create_default_detector()
+    return _detector
@@ -0,0 +1,346 @@
+"""
+FRP隧道延迟探测模块
+对每个代理并发发起两次探测：经公网域名（穿过 frps 隧道）和直连 localIP:localPort（只经过后端），
+分别记录 DNS、连接、TLS、首字节和总耗时并写入指标时序存储（连接/首字节/总耗时从DNS解析完成后开始计算，
+两条路径的解析耗时不计入比较）；两者的差值即隧道开销，用于判断慢在隧道还是慢在后端服务。
+探测由 Celery beat 周期执行，最近一次结果从时序存储读取，各 worker 一致
+"""
+
+import os
+import ssl
+import time
+import socket
+import logging
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .frp_config import get_frp_config_cache
+from .frp_supervisor import FRPC_CONFIG_PATH
+from .metrics_store import get_metrics_store
+
+logger = logging.getLogger(__name__)
+
+# 子域名所属的主域名（对应 frps 的 subdomainHost）
+FRP_SUBDOMAIN_HOST = os.getenv('FRP_SUBDOMAIN_HOST', os.getenv('ALIYUN_DOMAIN', '0379.email'))
+# http 代理经公网访问时使用的协议（前面有 TLS 反向代理时设置为 https）
+FRP_PROBE_PUBLIC_SCHEME = os.getenv('FRP_PROBE_PUBLIC_SCHEME', 'https')
+FRP_PROBE_PATH = os.getenv('FRP_PROBE_PATH', '/')
+FRP_PROBE_TIMEOUT = float(os.getenv('FRP_PROBE_TIMEOUT', '5'))
+FRP_PROBE_CONCURRENCY = int(os.getenv('FRP_PROBE_CONCURRENCY', '8'))
+FRP_PROBE_INTERVAL = int(os.getenv('FRP_PROBE_INTERVAL', '300'))
+
+# 每次探测最多读取的响应体字节数
+PROBE_MAX_BODY = 64 * 1024
+# 用于计算隧道开销的耗时指标
+PROBE_METRICS = ('connect', 'ttfb', 'total')
+# 写入时序存储的全部耗时指标
+STORED_METRICS = ('dns', 'tls') + PROBE_METRICS
+# 每轮探测的完成标记（值为代理数量，时间戳即本轮所有样本的时间戳）
+PROBE_RUN_SERIES = 'frp.probe.run'
+# 可探测的代理类型
+HTTP_TYPES = ('http', 'https')
+TCP_TYPES = ('tcp',)
+
+
+def probe_series(name, route, metric):
+    """时序名称，如 frp.probe.nas-0379.public.ttfb"""
+    return f'frp.probe.{name}.{route}.{metric}'
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def probe_http(url_host, port, tls, host_header=None, path='/', timeout=None, connect_host=None):
+    """
+    发起一次 HTTP GET 并记录各阶段耗时
+
+    Args:
+        url_host: TLS SNI 和默认 Host 头使用的主机名
+        port: 端口
+        tls: 是否使用 TLS
+        host_header: Host 请求头（直连后端时使用公网域名，保证虚拟主机路由一致）
+        path: 请求路径
+        timeout: 超时（秒）
+        connect_host: 实际连接的地址（默认 url_host）
+
+    Returns:
+        dict: {'ok', 'status', 'dns', 'connect', 'tls', 'ttfb', 'total', 'error'}，耗时单位为毫秒，
+              connect/ttfb/total 从DNS解析完成时开始计算
+    """
+    timeout = timeout or FRP_PROBE_TIMEOUT
+    result = {'ok': False, 'status': None, 'dns': None, 'connect': None, 'tls': None,
+              'ttfb': None, 'total': None, 'error': None}
+    start = time.perf_counter()
+    sock = None
+    try:
+        infos = socket.getaddrinfo(connect_host or url_host, port, type=socket.SOCK_STREAM)
+        t_dns = time.perf_counter()
+        result['dns'] = _ms(t_dns - start)
+
+        sock = socket.create_connection(infos[0][4][:2], timeout=timeout)
+        t_connect = time.perf_counter()
+        result['connect'] = _ms(t_connect - t_dns)
+
+        if tls:
+            context = ssl.create_default_context()
+            if connect_host:
+                # 直连后端时证书通常签发给公网域名或自签名
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(sock, server_hostname=url_host)
+            result['tls'] = _ms(time.perf_counter() - t_connect)
+
+        request = (
+            f'GET {path} HTTP/1.1\r\n'
+            f'Host: {host_header or url_host}\r\n'
+            'User-Agent: yyc3-tunnel-probe\r\n'
+            'Accept: */*\r\n'
+            'Connection: close\r\n\r\n'
+        )
+        sock.sendall(request.encode('ascii'))
+        response = http.client.HTTPResponse(sock)
+        response.begin()
+        result['ttfb'] = _ms(time.perf_counter() - t_dns)
+        result['status'] = response.status
+        remaining = PROBE_MAX_BODY
+        while remaining > 0:
+            chunk = response.read(min(remaining, 16384))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        result['total'] = _ms(time.perf_counter() - t_dns)
+        # 5xx 说明后端或隧道异常（frps 找不到代理时返回 404 页面，仍视为可达）
+        result['ok'] = response.status < 500
+    except (OSError, http.client.HTTPException) as e:
+        result['error'] = str(e) or e.__class__.__name__
+    finally:
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+    return result
+
+
+def probe_tcp(host, port, timeout=None):
+    """只测量 TCP 连接耗时（tcp 类型代理）"""
+    timeout = timeout or FRP_PROBE_TIMEOUT
+    result = {'ok': False, 'status': None, 'dns': None, 'connect': None, 'tls': None,
+              'ttfb': None, 'total': None, 'error': None}
+    start = time.perf_counter()
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        t_dns = time.perf_counter()
+        result['dns'] = _ms(t_dns - start)
+        with socket.create_connection(infos[0][4][:2], timeout=timeout):
+            result['connect'] = result['total'] = _ms(time.perf_counter() - t_dns)
+        result['ok'] = True
+    except OSError as e:
+        result['error'] = str(e) or e.__class__.__name__
+    return result
+
+
+def breakdown(public, direct):
+    """
+    计算隧道开销
+
+    Returns:
+        dict: {'overhead': {connect, ttfb, total}, 'tunnelShare', 'bottleneck': tunnel/backend/unreachable/None}
+    """
+    overhead = {}
+    for metric in PROBE_METRICS:
+        if public.get(metric) is not None and direct.get(metric) is not None:
+            overhead[metric] = round(public[metric] - direct[metric], 2)
+        else:
+            overhead[metric] = None
+
+    bottleneck = None
+    share = None
+    if not direct['ok'] and not public['ok']:
+        bottleneck = 'backend'
+    elif direct['ok'] and not public['ok']:
+        bottleneck = 'tunnel'
+    elif public['ok'] and public['total'] and overhead['total'] is not None:
+        share = round(max(overhead['total'], 0) / public['total'], 3)
+        bottleneck = 'tunnel' if share >= 0.5 else 'backend'
+    return {'overhead': overhead, 'tunnelShare': share, 'bottleneck': bottleneck}
+
+
+class TunnelProber:
+    """FRP隧道延迟探测器"""
+
+    def __init__(self, store=None, config_path=None, concurrency=None, timeout=None, subdomain_host=None):
+        self.store = store or get_metrics_store()
+        self.config_path = config_path or FRPC_CONFIG_PATH
+        self.concurrency = concurrency or FRP_PROBE_CONCURRENCY
+        self.timeout = timeout or FRP_PROBE_TIMEOUT
+        self.subdomain_host = subdomain_host or FRP_SUBDOMAIN_HOST
+
+    def targets(self, config=None):
+        """
+        生成探测目标
+
+        Returns:
+            list: [{'name', 'type', 'public': (kind, args), 'direct': (kind, args)}]
+        """
+        config = config or get_frp_config_cache().get(self.config_path)
+        if config is None:
+            return []
+        targets = []
+        for proxy in config.proxies:
+            local_ip = proxy.local_ip or '127.0.0.1'
+            if proxy.type in HTTP_TYPES:
+                if proxy.custom_domains:
+                    host = proxy.custom_domains[0]
+                elif proxy.subdomain:
+                    host = f'{proxy.subdomain}.{self.subdomain_host}'
+                else:
+                    continue
+                if proxy.type == 'https':
+                    public_tls = True
+                    public_port = 443
+                else:
+                    public_tls = FRP_PROBE_PUBLIC_SCHEME == 'https'
+                    public_port = 443 if public_tls else 80
+                targets.append({
+                    'name': proxy.name,
+                    'type': proxy.type,
+                    'host': host,
+                    'public': ('http', dict(url_host=host, port=public_port, tls=public_tls)),
+                    'direct': ('http', dict(url_host=host, port=proxy.local_port, tls=proxy.type == 'https',
+                                            connect_host=local_ip, host_header=host))
+                })
+            elif proxy.type in TCP_TYPES and proxy.raw.get('remotePort') and config.server_addr:
+                targets.append({
+                    'name': proxy.name,
+                    'type': proxy.type,
+                    'host': f'{config.server_addr}:{proxy.raw["remotePort"]}',
+                    'public': ('tcp', dict(host=config.server_addr, port=proxy.raw['remotePort'])),
+                    'direct': ('tcp', dict(host=local_ip, port=proxy.local_port))
+                })
+        return targets
+
+    def _run_probe(self, spec):
+        kind, kwargs = spec
+        if kind == 'tcp':
+            return probe_tcp(timeout=self.timeout, **kwargs)
+        return probe_http(path=FRP_PROBE_PATH, timeout=self.timeout, **kwargs)
+
+    def probe_all(self, targets=None):
+        """
+        并发探测所有代理并写入时序存储
+
+        Returns:
+            dict: {name: {'name', 'type', 'host', 'public', 'direct', 'overhead', 'tunnelShare', 'bottleneck'}}
+        """
+        targets = self.targets() if targets is None else targets
+        now = time.time()
+        results = {}
+        if targets:
+            specs = [(t['name'], route, t[route]) for t in targets for route in ('public', 'direct')]
+            workers = max(1, min(self.concurrency, len(specs)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tunnel-probe') as pool:
+                probes = list(pool.map(lambda spec: self._run_probe(spec[2]), specs))
+            measured = {(name, route): probe for (name, route, _), probe in zip(specs, probes)}
+
+            samples = []
+            for target in targets:
+                name = target['name']
+                public = measured[(name, 'public')]
+                direct = measured[(name, 'direct')]
+                for route, probe in (('public', public), ('direct', direct)):
+                    samples.append((probe_series(name, route, 'up'), 1 if probe['ok'] else 0, now))
+                    if probe['status'] is not None:
+                        samples.append((probe_series(name, route, 'status'), probe['status'], now))
+                    if probe['ok']:
+                        samples.extend(
+                            (probe_series(name, route, metric), probe[metric], now)
+                            for metric in STORED_METRICS if probe[metric] is not None
+                        )
+                results[name] = dict(
+                    {'name': name, 'type': target['type'], 'host': target['host'],
+                     'public': public, 'direct': direct},
+                    **breakdown(public, direct)
+                )
+            self.store.record_many(samples)
+
+        self.store.record(PROBE_RUN_SERIES, len(results), now)
+        return results
+
+    def latest(self, targets=None):
+        """
+        最近一次探测结果（从时序存储读取，错误信息不保存）
+
+        Returns:
+            dict: {'probedAt', 'proxies': {name: 同 probe_all() 的单项}}，尚未探测时 probedAt 为 None
+        """
+        run = self.store.latest(PROBE_RUN_SERIES)
+        if run is None:
+            return {'probedAt': None, 'proxies': {}}
+        ts = run[0]
+        targets = self.targets() if targets is None else targets
+
+        proxies = {}
+        for target in targets:
+            name = target['name']
+            routes = {route: self._stored_probe(name, route, ts) for route in ('public', 'direct')}
+            if routes['public'] is None or routes['direct'] is None:
+                # 代理在上次探测之后才加入配置
+                continue
+            proxies[name] = dict(
+                {'name': name, 'type': target['type'], 'host': target['host'], **routes},
+                **breakdown(routes['public'], routes['direct'])
+            )
+        return {'probedAt': _isoformat(ts), 'proxies': proxies}
+
+    def _stored_probe(self, name, route, ts):
+        """读取某轮探测中一条路径的结果"""
+        def value(metric):
+            sample = self.store.latest(probe_series(name, route, metric))
+            return sample[1] if sample is not None and sample[0] == ts else None
+
+        up = value('up')
+        if up is None:
+            return None
+        status = value('status')
+        probe = {metric: value(metric) for metric in STORED_METRICS}
+        probe.update(ok=bool(up), status=int(status) if status is not None else None,
+                     error=None if up else 'probe failed')
+        return probe
+
+    def history(self, name, since=None, limit=500):
+        """
+        代理的延迟历史
+
+        Returns:
+            dict: {route: {metric: [[iso时间, 毫秒], ...]}}
+        """
+        history = {}
+        for route in ('public', 'direct'):
+            history[route] = {
+                metric: [[_isoformat(ts), value] for ts, value in
+                         self.store.query(probe_series(name, route, metric), since=since, limit=limit)]
+                for metric in PROBE_METRICS
+            }
+        return history
+
+
+def _isoformat(ts):
+    return datetime.fromtimestamp(ts).isoformat() if ts else None
+
+
+_prober = None
+_prober_lock = threading.Lock()
+
+
+def get_tunnel_prober():
+    """获取全局隧道延迟探测器"""
+    global _prober
+    if _prober is None:
+        with _prober_lock:
+            if _prober is None:
+                _prober = TunnelProber()
+    return _prober
@@ -3,34 +3,101 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+
+def _schedule(celery, name, task, interval, args=()):
+    """添加 Celery beat 周期任务（interval 为秒，<= 0 表示不调度）"""
+    if interval and interval > 0:
+        celery.conf.beat_schedule[name] = {'task': task, 'schedule': float(interval), 'args': tuple(args)}
+
+
 def register_tasks(celery):
     """注册所有 Celery 任务"""
+    from app.services.dir_size import NAS_SCAN_INTERVAL, NAS_SCAN_TIME_LIMIT
+    from app.services.dedup import NAS_DEDUP_TIME_LIMIT
+    from app.services.capacity_forecast import NAS_CAPACITY_SAMPLE_INTERVAL
+    from app.services.tunnel_probe import FRP_PROBE_INTERVAL
+    from app.services.ddns_history import DDNS_HISTORY_PRUNE_INTERVAL
+    from app.services.metrics_store import METRICS_PRUNE_INTERVAL
 
     @celery.task(name='tasks.ddns_update')
     def update_ddns_record(record_id, new_ip):
-        """异步执行 DDNS 更新"""
+        """异步执行 DDNS 更新（记录值未变化时不调用更新接口）"""
         try:
             logger.info(f"Updating DDNS record {record_id} to {new_ip}")
 
-            # 这里调用实际的阿里云 API 更新逻辑
-            # from app.services.ddns import update_aliyun_dns
-            # result = update_aliyun_dns(record_id, new_ip)
-
-            # 模拟耗时操作
             import time
-            time.sleep(2)
+            from app.services.alidns import get_alidns_client
+            from app.services.ddns_coalesce import address_value, get_update_coalescer, records_key
+            from app.services.ddns_history import record_update
 
-            logger.info(f"DDNS update completed for record {record_id}")
+            client = get_alidns_client()
+            record = client.describe_domain_record_info(record_id)
+            identity = (record['DomainName'], record['RR'], record['Type'])
+
+            def _update():
+                start = time.perf_counter()
+                # 等待期间其他路径可能已更新该记录，重新读取
+                current = client.describe_domain_record_info(record_id)
+                result = client.sync_record(*identity, new_ip, records=[current])
+                result['latency'] = round((time.perf_counter() - start) * 1000, 1)
+                record_update([result], 'task')
+                return {'ip': new_ip, 'update': {'action': result['action'], 'results': [result],
+                                                 'summary': {result['action']: 1}}}
+
+            # 与 API、守护进程和其他 worker 上对同一记录、同一IP的更新合并，只调用一次接口
+            shared, coalesced = get_update_coalescer().run(
+                records_key([identity]), _update, value=address_value([identity], {record['Type']: new_ip})
+            )
+            result = next((r for r in shared['update']['results'] if r.get('type') == record['Type']
+                           and r.get('rr') == record['RR']), shared['update'])
+
+            logger.info(f"DDNS update completed for record {record_id}: {result['action']}")
             return {
                 'status': 'success',
                 'record_id': record_id,
                 'ip': new_ip,
+                'action': result['action'],
+                'coalesced': coalesced,
                 'timestamp': datetime.utcnow().isoformat()
             }
         except Exception as e:
             logger.error(f"DDNS update failed: {e}")
             raise
 
+    @celery.task(name='tasks.ddns_history_prune')
+    def ddns_history_prune():
+        """删除超过保留时间的 DDNS 更新历史"""
+        try:
+            from app.services.ddns_history import get_ddns_history_store
+            deleted = get_ddns_history_store().prune()
+
+            logger.info(f"Pruned {deleted} DDNS history rows")
+            return {
+                'status': 'success',
+                'deleted': deleted,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"DDNS history prune failed: {e}")
+            raise
+
+    @celery.task(name='tasks.metrics_prune')
+    def metrics_prune():
+        """删除超过保留时间的指标样本（容量采样、传播耗时、隧道探测等）"""
+        try:
+            from app.services.metrics_store import get_metrics_store
+            deleted = get_metrics_store().prune()
+
+            logger.info(f"Pruned {deleted} metric samples")
+            return {
+                'status': 'success',
+                'deleted': deleted,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Metrics prune failed: {e}")
+            raise
+
     @celery.task(name='tasks.send_email')
     def send_email_async(to, subject, body, html=None):
         """异步发送邮件"""
@@ -129,15 +196,22 @@ def register_tasks(celery):
         try:
             logger.info(f"Checking DNS health for {domain}")
 
-            # DNS 健康检查逻辑
-            # from app.services.dns import check_domain_health
-            # health_status = check_domain_health(domain, nameservers)
+            from app.services.dns_propagation import PropagationChecker, get_propagation_checker, parse_resolvers
+            checker = PropagationChecker(resolvers=parse_resolvers(','.join(nameservers))) if nameservers else None
+            try:
+                zone = '.'.join(domain.split('.')[-2:])
+                report = (checker or get_propagation_checker()).check(domain, 'A', zone=zone)
+            finally:
+                if checker is not None:
+                    checker.close()
+            healthy = report['converged'] and report['consistent']
 
             logger.info(f"DNS health check completed for {domain}")
             return {
                 'status': 'success',
                 'domain': domain,
-                'healthy': True,
+                'healthy': healthy,
+                'servers': {r['label']: r['answers'] or r['error'] for r in report['servers']},
                 'timestamp': datetime.utcnow().isoformat()
             }
         except Exception as e:
@@ -183,3 +257,93 @@ def register_tasks(celery):
         except Exception as e:
             logger.error(f"Alert processing failed: {e}")
             raise
+
+    @celery.task(name='tasks.nas_size_scan', time_limit=NAS_SCAN_TIME_LIMIT,
+                 soft_time_limit=max(NAS_SCAN_TIME_LIMIT - 300, 60))
+    def nas_size_scan(volume_id=None):
+        """统计存储卷目录大小（未指定存储卷时每个存储卷单独排队，各自使用 NAS_SCAN_TIME_LIMIT）"""
+        try:
+            from app.services.dir_size import get_size_aggregator
+            aggregator = get_size_aggregator()
+
+            if not volume_id:
+                volumes = aggregator.available_volumes()
+                logger.info(f"Queueing scans for NAS volumes {volumes}")
+                for volume in volumes:
+                    nas_size_scan.delay(volume)
+                return {
+                    'status': 'queued',
+                    'volumes': volumes,
+                    'timestamp': datetime.utcnow().isoformat()
+                }
+
+            logger.info(f"Scanning NAS volume {volume_id}")
+            summary = aggregator.scan_volume(volume_id)
+            return {
+                'status': 'skipped' if summary.get('skipped') else 'success',
+                'volumes': [summary],
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"NAS size scan failed: {e}")
+            raise
+
+    @celery.task(name='tasks.nas_capacity_sample')
+    def nas_capacity_sample():
+        """采样存储卷容量"""
+        try:
+            from app.services.capacity_forecast import get_capacity_forecaster
+            results = get_capacity_forecaster().sample()
+
+            return {
+                'status': 'success',
+                'volumes': results,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"NAS capacity sample failed: {e}")
+            raise
+
+    @celery.task(name='tasks.frp_tunnel_probe')
+    def frp_tunnel_probe():
+        """探测FRP隧道延迟"""
+        try:
+            from app.services.tunnel_probe import get_tunnel_prober
+            results = get_tunnel_prober().probe_all()
+
+            return {
+                'status': 'success',
+                'proxies': len(results),
+                'slow_tunnels': [name for name, r in results.items() if r['bottleneck'] == 'tunnel'],
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"FRP tunnel probe failed: {e}")
+            raise
+
+    @celery.task(name='tasks.nas_dedup_scan', time_limit=NAS_DEDUP_TIME_LIMIT,
+                 soft_time_limit=max(NAS_DEDUP_TIME_LIMIT - 300, 60))
+    def nas_dedup_scan(volume=None):
+        """扫描重复文件"""
+        try:
+            logger.info(f"Scanning duplicate files on {volume or 'all volumes'}")
+
+            from app.services.dedup import get_dedup_scanner
+            summary = get_dedup_scanner().scan(volume)
+
+            return {
+                'status': 'skipped' if summary.get('skipped') else 'success',
+                'report': summary,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Dedup scan failed: {e}")
+            raise
+
+    # ========== 周期任务 ==========
+
+    _schedule(celery, 'nas-size-scan', 'tasks.nas_size_scan', NAS_SCAN_INTERVAL)
+    _schedule(celery, 'nas-capacity-sample', 'tasks.nas_capacity_sample', NAS_CAPACITY_SAMPLE_INTERVAL)
+    _schedule(celery, 'frp-tunnel-probe', 'tasks.frp_tunnel_probe', FRP_PROBE_INTERVAL)
+    _schedule(celery, 'ddns-history-prune', 'tasks.ddns_history_prune', DDNS_HISTORY_PRUNE_INTERVAL)
+    _schedule(celery, 'metrics-prune', 'tasks.metrics_prune', METRICS_PRUNE_INTERVAL)
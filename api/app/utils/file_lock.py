@@ -0,0 +1,56 @@
+"""
+跨进程文件锁
+基于 fcntl.flock，用于多个 gunicorn worker / Celery worker 之间互斥修改同一文件或执行同一任务；
+以非阻塞方式轮询加锁，gevent worker 中等待锁时不会阻塞整个事件循环
+"""
+
+import os
+import time
+import fcntl
+
+# 加锁失败后的重试间隔（秒）
+LOCK_POLL_INTERVAL = 0.05
+
+
+class FileLockBusy(Exception):
+    """非阻塞加锁时锁已被其他进程持有"""
+
+
+class FileLock:
+    """跨进程排他文件锁（上下文管理器）"""
+
+    def __init__(self, path, poll_interval=None, blocking=True):
+        """
+        Args:
+            path: 锁文件路径
+            poll_interval: 加锁失败后的重试间隔（秒）
+            blocking: False 时锁已被持有则立即抛出 FileLockBusy
+        """
+        self.path = path
+        self.poll_interval = poll_interval or LOCK_POLL_INTERVAL
+        self.blocking = blocking
+        self._fd = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except BlockingIOError:
+                if not self.blocking:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise FileLockBusy(self.path)
+                # time.sleep 在 gevent 下会让出执行权
+                time.sleep(self.poll_interval)
+            except BaseException:
+                os.close(self._fd)
+                self._fd = None
+                raise
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,77 @@
+"""
+日志尾部读取工具
+从文件末尾按固定大小的块向前读取，只读取返回最后N行所需的数据，
+并返回首行的字节偏移作为游标，用于继续向前翻页
+"""
+
+import os
+
+# 向前读取的块大小与单次读取的最大字节数
+TAIL_BLOCK_SIZE = 64 * 1024
+TAIL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def tail_lines(path, lines=100, before=None, block_size=TAIL_BLOCK_SIZE, max_bytes=TAIL_MAX_BYTES):
+    """
+    读取文件的最后N行
+
+    Args:
+        path: 文件路径
+        lines: 返回的行数
+        before: 游标（字节偏移），只读取该位置之前的行，用于加载更早的日志
+        block_size: 每次向前读取的块大小
+        max_bytes: 单次最多读取的字节数，防止超长行占用过多内存
+
+    Returns:
+        dict: {
+            'lines': 日志行（保留行尾换行符，与 readlines 一致）,
+            'cursor': 第一行的字节偏移，作为下一页的 before 参数,
+            'has_more': 游标之前是否还有数据,
+            'size': 读取时的文件大小
+        }
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if before is None else max(0, min(int(before), size))
+        result = {'lines': [], 'cursor': end, 'has_more': end > 0, 'size': size}
+        if lines <= 0 or end == 0:
+            return result
+
+        blocks = []
+        pos = end
+        newlines = 0
+        need = lines + 1
+        while pos > 0 and newlines < need and end - pos < max_bytes:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            block = f.read(read_size)
+            if not blocks and block.endswith(b'\n'):
+                # 末尾换行属于最后一行，不作为分隔符
+                need += 1
+            blocks.append(block)
+            newlines += block.count(b'\n')
+
+    data = b''.join(reversed(blocks))
+    trailing = data.endswith(b'\n')
+    parts = (data[:-1] if trailing else data).split(b'\n')
+
+    offset = pos
+    if pos > 0 and len(parts) > 1:
+        # 第一段是被截断的更早一行
+        offset += len(parts[0]) + 1
+        parts = parts[1:]
+
+    selected = parts[-lines:]
+    offset += sum(len(p) + 1 for p in parts[:len(parts) - len(selected)])
+
+    result_lines = [(p + b'\n').decode('utf-8', errors='replace') for p in selected]
+    if result_lines and not trailing:
+        result_lines[-1] = result_lines[-1][:-1]
+
+    result.update({
+        'lines': result_lines,
+        'cursor': offset,
+        'has_more': offset > 0
+    })
+    return result
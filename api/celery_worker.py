@@ -0,0 +1,11 @@
+"""
+Celery worker / beat 入口
+    celery -A celery_worker.celery worker
+    celery -A celery_worker.celery beat
+"""
+from app import create_app
+from app.celery import init_celery
+
+# worker / beat 进程不处理请求，不启动 FRP 状态轮询等后台线程
+app = create_app(background=False)
+celery = init_celery(app)
@@ -40,6 +40,20 @@ class Config:
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or 'redis://localhost:6379/2'
     CELERY_TASK_TRACK_STARTED = True
     CELERY_TASK_TIME_LIMIT = 30 * 60  # 30分钟超时
+    CELERY_ENABLED = os.environ.get('CELERY_ENABLED', 'false').lower() == 'true'
+
+    # ======================
+    # 后台线程配置（只在 Web worker 中启动，Celery 入口会关闭）
+    # ======================
+    # 应用启动时开始轮询 frpc 状态（关闭时在首次请求FRP状态时才开始轮询）
+    FRP_STATUS_POLLER_ENABLED = os.environ.get('FRP_STATUS_POLLER_ENABLED', 'true').lower() == 'true'
+
+    # ======================
+    # WebSocket 配置
+    # ======================
+    # 默认关闭：SocketIO 未配置 message_queue，多个 gunicorn worker 之间没有会话共享，
+    # 开启前需将 worker 数设为 1 或在代理层配置粘性会话（Celery 入口始终关闭）
+    SOCKETIO_ENABLED = os.environ.get('SOCKETIO_ENABLED', 'false').lower() == 'true'
 
     # ======================
     # 其他设置
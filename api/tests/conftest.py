@@ -0,0 +1,9 @@
+"""
+pytest 公共配置
+服务模块的测试直接导入 app.services.*，使用本地模拟服务（frp_admin_fake / alidns_fake / dns_fake），不依赖外部网络
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -0,0 +1,125 @@
+"""
+Alidns 客户端与批量更新测试：签名向量、sync_record 的三种结果、被限流后的退避重试（使用模拟 Alidns 接口）
+"""
+
+import pytest
+
+from app.services.alidns import AlidnsClient, AlidnsError, RpcSigner
+from app.services.alidns_fake import FakeAlidnsServer
+from app.services.ddns_batch import AdaptiveRateLimiter, BatchUpdater, parse_targets
+
+
+@pytest.fixture
+def alidns():
+    with FakeAlidnsServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client(alidns):
+    client = AlidnsClient(alidns.access_key_id, alidns.access_key_secret, endpoint=alidns.url)
+    yield client
+    client.close()
+
+
+def test_signature_matches_documented_vector():
+    # 阿里云云解析 API 文档「签名机制」中的示例
+    signer = RpcSigner('testid', 'testsecret', {
+        'Format': 'XML',
+        'Version': '2015-01-09',
+        'SignatureMethod': 'HMAC-SHA1',
+        'SignatureVersion': '1.0'
+    })
+    params, signature = signer.sign({
+        'Action': 'DescribeDomainRecords',
+        'DomainName': 'example.com',
+        'SignatureNonce': 'f59ed6a9-83fc-473b-9cc6-99c95df3856e',
+        'Timestamp': '2016-03-24T16:41:54Z'
+    })
+
+    assert signature == 'uRpHwaSEt3J+6KQD//svCh/x+pI='
+    assert params['AccessKeyId'] == 'testid'
+    assert params['Action'] == 'DescribeDomainRecords'
+
+
+def test_wrong_secret_is_rejected(alidns):
+    client = AlidnsClient(alidns.access_key_id, 'wrong-secret', endpoint=alidns.url)
+    with pytest.raises(AlidnsError) as excinfo:
+        client.describe_domain_records('example.com')
+    assert excinfo.value.code == 'SignatureDoesNotMatch'
+    client.close()
+
+
+def test_sync_record_created(alidns, client):
+    result = client.sync_record('example.com', 'ddns', 'A', '203.0.113.10', ttl=600)
+
+    assert result['action'] == 'created'
+    assert result['oldValue'] is None
+    [record] = alidns.find('example.com', 'ddns', 'A')
+    assert record['RecordId'] == result['recordId']
+    assert record['Value'] == '203.0.113.10'
+
+
+def test_sync_record_unchanged(alidns, client):
+    record_id = alidns.add_record('example.com', 'ddns', 'A', '203.0.113.10', ttl=600)
+
+    result = client.sync_record('example.com', 'ddns', 'A', '203.0.113.10', ttl=600)
+
+    assert result['action'] == 'unchanged'
+    assert result['recordId'] == record_id
+    assert alidns.calls['UpdateDomainRecord'] == 0
+    assert alidns.calls['AddDomainRecord'] == 0
+
+
+def test_sync_record_updated(alidns, client):
+    record_id = alidns.add_record('example.com', 'ddns', 'A', '203.0.113.10', ttl=600)
+
+    result = client.sync_record('example.com', 'ddns', 'A', '203.0.113.20', ttl=600)
+
+    assert result['action'] == 'updated'
+    assert result['recordId'] == record_id
+    assert result['oldValue'] == '203.0.113.10'
+    assert alidns.records[record_id]['Value'] == '203.0.113.20'
+    assert alidns.calls['UpdateDomainRecord'] == 1
+
+
+def test_sync_record_ttl_change_updates(alidns, client):
+    record_id = alidns.add_record('example.com', 'ddns', 'A', '203.0.113.10', ttl=600)
+
+    assert client.sync_record('example.com', 'ddns', 'A', '203.0.113.10', ttl=60)['action'] == 'updated'
+    assert alidns.records[record_id]['TTL'] == 60
+
+
+def test_batch_retries_after_throttling():
+    # 每秒只允许 2 次写请求，6 条记录必然触发 Throttling.User
+    with FakeAlidnsServer(rate_limit=2) as alidns:
+        client = AlidnsClient(alidns.access_key_id, alidns.access_key_secret, endpoint=alidns.url)
+        limiter = AdaptiveRateLimiter(rate=100, burst=10)
+        updater = BatchUpdater(client=client, concurrency=6, limiter=limiter, retries=5)
+        targets = parse_targets(','.join(f'host{i}@example.com:A' for i in range(6)), ttl=600)
+
+        result = updater.update(targets, {'A': '203.0.113.10'})
+        client.close()
+
+    assert result['action'] == 'updated'
+    assert result['summary'] == {'created': 6}
+    assert limiter.throttle_count > 0
+    assert limiter.rate < limiter.max_rate
+    assert alidns.calls['AddDomainRecord'] == 6
+    assert all(record['Value'] == '203.0.113.10' for record in alidns.records.values())
+
+
+def test_batch_reports_failure_when_retries_exhausted():
+    with FakeAlidnsServer(rate_limit=1) as alidns:
+        client = AlidnsClient(alidns.access_key_id, alidns.access_key_secret, endpoint=alidns.url)
+        updater = BatchUpdater(client=client, concurrency=4, limiter=AdaptiveRateLimiter(rate=100, burst=10),
+                               retries=0)
+        targets = parse_targets(','.join(f'host{i}@example.com:A' for i in range(4)), ttl=600)
+
+        result = updater.update(targets, {'A': '203.0.113.10'})
+        client.close()
+
+    assert result['action'] == 'partial'
+    assert result['summary']['failed'] >= 1
+    failed = [r for r in result['results'] if r['action'] == 'failed']
+    assert all('Throttling.User' in r['error'] for r in failed)
@@ -0,0 +1,95 @@
+"""
+DNS 迭代解析追踪测试：在回环地址上启动 根 -> TLD -> 权威 三级模拟服务器，
+覆盖正常应答、NXDOMAIN、权威服务器不一致和从缓存的委派开始追踪
+"""
+
+import pytest
+
+pytest.importorskip('dns')
+
+from app.services.dns_fake import FakeDnsServer
+from app.services.dns_trace import DnsTracer, analyze_trace
+
+ADDRESS = '203.0.113.10'
+
+
+@pytest.fixture
+def chain():
+    """root(127.0.0.1) -> com(127.0.0.2) -> example.com(127.0.0.3-5)，所有服务器使用同一端口"""
+    root = FakeDnsServer(['.'])
+    port = root.port
+    tld = FakeDnsServer(['com'], host='127.0.0.2', port=port)
+    auths = [FakeDnsServer(['example.com'], host=f'127.0.0.{i}', port=port) for i in (3, 4, 5)]
+
+    root.add_record('com.', 'NS', 'a.gtld-servers.net.')
+    root.add_record('a.gtld-servers.net.', 'A', '127.0.0.2')
+    for i in (1, 2, 3):
+        tld.add_record('example.com.', 'NS', f'ns{i}.example.com.')
+        tld.add_record(f'ns{i}.example.com.', 'A', f'127.0.0.{i + 2}')
+    for auth in auths:
+        auth.add_record('ddns.example.com.', 'A', ADDRESS)
+
+    servers = [root, tld] + auths
+    for server in servers:
+        server.start()
+    tracer = DnsTracer(root_servers=[{'name': 'root', 'address': '127.0.0.1'}], port=port, timeout=1)
+    yield {'tracer': tracer, 'root': root, 'tld': tld, 'auths': auths}
+    for server in servers:
+        server.stop()
+
+
+def test_trace_answer(chain):
+    result = chain['tracer'].trace('ddns.example.com')
+
+    assert result['complete'] is True
+    assert result['outcome'] == 'answer'
+    assert result['answers'] == [ADDRESS]
+    assert [level['zone'] for level in result['levels']] == ['.', 'com.', 'example.com.']
+    assert all(level['consistent'] for level in result['levels'])
+    assert sorted(hop['name'] for hop in result['levels'][-1]['servers']) == \
+        ['ns1.example.com', 'ns2.example.com', 'ns3.example.com']
+
+    summary = analyze_trace(result)
+    assert summary['inconsistentZones'] == []
+    assert summary['unreachable'] == []
+
+
+def test_trace_nxdomain(chain):
+    result = chain['tracer'].trace('missing.example.com')
+
+    assert result['complete'] is True
+    assert result['outcome'] == 'nxdomain'
+    assert result['answers'] == []
+
+
+def test_trace_inconsistent_authoritative_servers(chain):
+    chain['auths'][2].set_record('ddns.example.com.', 'A', ['203.0.113.99'])
+
+    result = chain['tracer'].trace('ddns.example.com')
+
+    # 返回多数服务器的应答，不一致的服务器单独列出
+    assert result['answers'] == [ADDRESS]
+    level = result['levels'][-1]
+    assert level['consistent'] is False
+    [inconsistency] = level['inconsistencies']
+    assert inconsistency['servers'] == ['ns3.example.com']
+    assert inconsistency['got']['answers'] == ['203.0.113.99']
+    assert inconsistency['expected']['answers'] == [ADDRESS]
+    assert [zone['zone'] for zone in analyze_trace(result)['inconsistentZones']] == ['example.com.']
+
+
+def test_trace_use_cache_starts_at_cached_delegation(chain):
+    tracer = chain['tracer']
+    tracer.trace('ddns.example.com')
+    assert 'example.com.' in tracer.delegations()
+    chain['root'].calls.clear()
+    chain['tld'].calls.clear()
+
+    result = tracer.trace('ddns.example.com', use_cache=True)
+
+    assert result['answers'] == [ADDRESS]
+    assert result['levels'][0]['cached'] is True
+    assert result['levels'][0]['delegation'] == 'example.com.'
+    assert result['levels'][-1]['zone'] == 'example.com.'
+    assert not chain['root'].calls
+    assert not chain['tld'].calls
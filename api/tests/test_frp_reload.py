@@ -0,0 +1,154 @@
+"""
+FRP配置热加载测试：通过模拟管理接口验证 reload、代理启动失败、拒绝后回滚和公共配置变化时重启
+"""
+
+import pytest
+
+from app.services import frp_admin
+from app.services.frp_admin_fake import FakeFrpAdminServer
+from app.services.frp_reload import FrpConfigApplier, FrpReloadError
+
+
+BASE_CONFIG = '''serverAddr = "frp.example.com"
+serverPort = 7000
+
+[[proxies]]
+name = "web"
+type = "http"
+localPort = 8080
+subdomain = "web"
+
+[[proxies]]
+name = "ssh"
+type = "tcp"
+localPort = 22
+remotePort = 6022
+'''
+
+NEW_PROXY = '''
+[[proxies]]
+name = "nas"
+type = "http"
+localPort = 5000
+subdomain = "nas"
+'''
+
+
+class FakeSupervisor:
+    """只记录重启调用的进程管理器"""
+
+    class Job:
+        def to_dict(self):
+            return {'id': 'job-1', 'action': 'restart'}
+
+    def __init__(self):
+        self.restarts = 0
+
+    def restart(self):
+        self.restarts += 1
+        return self.Job()
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / 'frpc.toml'
+    path.write_text(BASE_CONFIG)
+    return str(path)
+
+
+@pytest.fixture
+def admin(config_path, monkeypatch):
+    with FakeFrpAdminServer(config_path) as server:
+        monkeypatch.setattr(frp_admin, 'FRPC_ADMIN_URL', server.url)
+        yield server
+
+
+@pytest.fixture
+def supervisor():
+    return FakeSupervisor()
+
+
+@pytest.fixture
+def applier(config_path, admin, supervisor):
+    applier = FrpConfigApplier(config_path=config_path, supervisor=supervisor, verify_timeout=2)
+    # 以当前文件为运行中的配置
+    applier.cache.get(config_path)
+    return applier
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_reload_rebuilds_only_affected_proxies(applier, admin, supervisor, config_path):
+    result = applier.apply(BASE_CONFIG + NEW_PROXY)
+
+    assert result['method'] == 'reload'
+    assert result['diff']['added'] == ['nas']
+    assert result['diff']['unchanged'] == ['web', 'ssh']
+    assert result['verified'] is True
+    assert result['failed'] == []
+    assert result['proxies']['nas']['status'] == 'running'
+    assert admin.reload_count == 1
+    assert admin.last_reloaded == ['nas']
+    assert supervisor.restarts == 0
+    assert 'name = "nas"' in _read(config_path)
+
+
+def test_reload_changed_and_removed_proxies(applier, admin):
+    content = BASE_CONFIG.replace('localPort = 8080', 'localPort = 8081')
+    content = content[:content.index('[[proxies]]\nname = "ssh"')]
+
+    result = applier.apply(content)
+
+    assert result['diff']['changed'] == ['web']
+    assert result['diff']['removed'] == ['ssh']
+    assert result['verified'] is True
+    assert admin.last_reloaded == ['web']
+    assert 'ssh' not in admin.proxies
+
+
+def test_reload_reports_failed_proxy(applier, admin):
+    admin.set_failing('nas')
+
+    result = applier.apply(BASE_CONFIG + NEW_PROXY)
+
+    assert result['method'] == 'reload'
+    assert result['verified'] is False
+    assert result['failed'] == ['nas']
+    assert result['proxies']['nas']['err'] == 'port unavailable'
+
+
+def test_rejected_reload_rolls_back(applier, admin, supervisor, config_path):
+    admin.set_rejecting('nas')
+
+    with pytest.raises(FrpReloadError, match='rolled back'):
+        applier.apply(BASE_CONFIG + NEW_PROXY)
+
+    # 配置文件恢复为旧内容，并再次 reload 旧配置
+    assert _read(config_path) == BASE_CONFIG
+    assert admin.reload_count == 1
+    assert set(admin.proxies) == {'web', 'ssh'}
+    assert supervisor.restarts == 0
+
+
+def test_common_change_restarts(applier, admin, supervisor, config_path):
+    result = applier.apply(BASE_CONFIG.replace('serverPort = 7000', 'serverPort = 7001'))
+
+    assert result['method'] == 'restart'
+    assert result['diff']['common_changed'] is True
+    assert result['job']['action'] == 'restart'
+    assert supervisor.restarts == 1
+    assert admin.reload_count == 0
+    assert 'serverPort = 7001' in _read(config_path)
+
+
+def test_unchanged_and_dry_run_do_not_write(applier, admin, config_path):
+    assert applier.apply(BASE_CONFIG)['method'] == 'none'
+
+    result = applier.apply(BASE_CONFIG + NEW_PROXY, dry_run=True)
+    assert result['method'] == 'none'
+    assert result['diff']['added'] == ['nas']
+    assert _read(config_path) == BASE_CONFIG
+    assert admin.reload_count == 0
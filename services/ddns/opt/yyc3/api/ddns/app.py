@@ -4,16 +4,18 @@ DDNS API 服务 - 简单版本
 """
 import os
 import json
-import time
 import subprocess
 from datetime import datetime
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
+
+from common import get_public_ip, tail_lines
 
 app = Flask(__name__)
 
 # 确保日志目录存在
 os.makedirs('/opt/yyc3/logs', exist_ok=True)
 
+
 @app.route('/')
 def index():
     return jsonify({"message": "DDNS API Service", "status": "running"})
@@ -40,13 +42,7 @@ def status():
             pass
         
         # 获取公网IP
-        current_ip = None
-        try:
-            result = subprocess.run(['curl', '-s', 'ifconfig.me'], 
-                                  capture_output=True, text=True, timeout=5)
-            current_ip = result.stdout.strip() if result.returncode == 0 else None
-        except:
-            pass
+        current_ip = get_public_ip()
         
         # 获取系统负载
         load_avg = None
@@ -80,26 +76,30 @@ def status():
 @app.route('/api/ddns/logs/recent')
 def logs_recent():
     try:
-        lines = 50
+        lines = min(request.args.get('lines', 50, type=int), 5000)
+        before = request.args.get('before', type=int)
         log_file = '/opt/yyc3/logs/ddns.log'
         
         logs = []
+        cursor = 0
         if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                lines_content = f.readlines()[-lines:]
-                for line in lines_content:
-                    line = line.strip()
-                    if line:
-                        logs.append({
-                            "timestamp": datetime.now().isoformat(),
-                            "level": "info",
-                            "message": line
-                        })
+            # 从文件末尾读取，cursor 作为下一页的 before 参数
+            lines_content, cursor = tail_lines(log_file, lines, before=before)
+            for line in lines_content:
+                line = line.strip()
+                if line:
+                    logs.append({
+                        "timestamp": datetime.now().isoformat(),
+                        "level": "info",
+                        "message": line
+                    })
         
         return jsonify({
             "success": True,
             "count": len(logs),
-            "logs": logs
+            "logs": logs,
+            "cursor": cursor,
+            "has_more": cursor > 0
         })
     except Exception as e:
         return jsonify({
@@ -11,6 +11,8 @@ import subprocess
 from datetime import datetime
 from flask import Flask, request, jsonify
 
+from common import get_public_ip, tail_lines
+
 # 添加虚拟环境路径
 venv_path = '/opt/yyc3/api/ddns/venv'
 if venv_path not in sys.path:
@@ -68,19 +70,7 @@ def api_status():
             pass
         
         # 获取当前IP
-        current_ip = None
-        try:
-            import requests
-            current_ip = requests.get('https://api.ipify.org', timeout=5).text
-        except:
-            try:
-                current_ip = subprocess.run(
-                    ['curl', '-s', 'https://api.ipify.org'],
-                    capture_output=True,
-                    text=True
-                ).stdout.strip()
-            except:
-                pass
+        current_ip = get_public_ip()
         
         response = {
             'success': True,
@@ -145,7 +135,8 @@ def api_update():
 def api_logs():
     """获取DDNS日志API"""
     try:
-        lines = request.args.get('lines', 50, type=int)
+        lines = min(request.args.get('lines', 50, type=int), 5000)
+        before = request.args.get('before', type=int)
         log_file = '/opt/yyc3/logs/ddns.log'
         
         if not os.path.exists(log_file):
@@ -155,9 +146,8 @@ def api_logs():
                 'message': '日志文件不存在'
             })
         
-        # 读取日志文件
-        with open(log_file, 'r') as f:
-            log_lines = f.readlines()[-lines:]
+        # 从文件末尾读取日志
+        log_lines, cursor = tail_lines(log_file, lines, before=before)
         
         # 格式化日志
         logs = []
@@ -177,7 +167,9 @@ def api_logs():
         return jsonify({
             'success': True,
             'count': len(logs),
-            'logs': logs
+            'logs': logs,
+            'cursor': cursor,
+            'has_more': cursor > 0
         })
     except Exception as e:
         logger.error(f"日志API错误: {e}")
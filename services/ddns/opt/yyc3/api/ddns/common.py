@@ -0,0 +1,151 @@
+"""
+DDNS API 服务公共函数（app.py 与 app_fixed.py 共用）
+"""
+import os
+import time
+import socket
+import ipaddress
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# 向前读取的块大小与单次读取的最大字节数
+TAIL_BLOCK_SIZE = 64 * 1024
+TAIL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def tail_lines(path, lines=50, before=None, block_size=TAIL_BLOCK_SIZE, max_bytes=TAIL_MAX_BYTES):
+    """
+    从文件末尾按块向前读取最后N行
+
+    Args:
+        path: 文件路径
+        lines: 返回的行数
+        before: 游标（字节偏移），只读取该位置之前的行
+        block_size: 每次向前读取的块大小
+        max_bytes: 单次最多读取的字节数，防止没有换行的超长日志被整个读入内存
+
+    Returns:
+        tuple: (日志行列表, 第一行的字节偏移游标)
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if before is None else max(0, min(before, size))
+        blocks = []
+        pos = end
+        newlines = 0
+        need = lines + 1
+        while pos > 0 and newlines < need and end - pos < max_bytes:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            block = f.read(read_size)
+            if not blocks and block.endswith(b'\n'):
+                need += 1
+            blocks.append(block)
+            newlines += block.count(b'\n')
+
+    data = b''.join(reversed(blocks))
+    if not data or lines <= 0:
+        return [], end
+    parts = (data[:-1] if data.endswith(b'\n') else data).split(b'\n')
+    offset = pos
+    if pos > 0 and len(parts) > 1:
+        offset += len(parts[0]) + 1
+        parts = parts[1:]
+    selected = parts[-lines:]
+    offset += sum(len(p) + 1 for p in parts[:len(parts) - len(selected)])
+    return [p.decode('utf-8', errors='replace') for p in selected], offset
+
+
+# 公网IP查询服务（并发请求，取最先返回的有效结果）
+IP_SOURCES = [u.strip() for u in os.getenv(
+    'DDNS_IP_SOURCES', 'https://api.ipify.org,https://ifconfig.me/ip,https://icanhazip.com'
+).split(',') if u.strip()]
+# 缓存有效期、检测失败后的缓存时间、单个服务超时（秒）
+IP_CACHE_TTL = float(os.getenv('DDNS_IP_CACHE_TTL', '60'))
+IP_FAILURE_TTL = float(os.getenv('DDNS_IP_FAILURE_TTL', '10'))
+IP_TIMEOUT = float(os.getenv('DDNS_IP_TIMEOUT', '3'))
+# 固定返回的IP（测试和离线环境使用，设置后不访问网络）
+IP_STUB = os.getenv('DDNS_IP_STUB', '')
+
+_ip_cache = {'ip': None, 'expires': 0}
+_ip_lock = threading.Lock()
+_ip_inflight = None
+_ip_executor = ThreadPoolExecutor(max_workers=max(1, len(IP_SOURCES)))
+
+
+def _public_ipv4(text):
+    address = ipaddress.ip_address(text.strip())
+    if address.version != 4 or not address.is_global:
+        raise ValueError(f'not a public IPv4 address: {address}')
+    return str(address)
+
+
+def _interface_ip():
+    """默认路由出口网卡的地址（UDP connect 只选路由，不发送数据），服务器直接持有公网IP时返回该地址"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.connect(('223.5.5.5', 53))
+            return _public_ipv4(sock.getsockname()[0])
+    except (OSError, ValueError):
+        return None
+
+
+def _fetch_ip(url):
+    req = urllib.request.Request(url, headers={'User-Agent': 'curl/8.0'})
+    with urllib.request.urlopen(req, timeout=IP_TIMEOUT) as resp:
+        return _public_ipv4(resp.read(64).decode('ascii', 'replace'))
+
+
+def _detect_ip():
+    if IP_STUB:
+        return IP_STUB
+    ip = _interface_ip()
+    if ip:
+        return ip
+
+    pending = {_ip_executor.submit(_fetch_ip, url) for url in IP_SOURCES}
+    deadline = time.monotonic() + IP_TIMEOUT + 1
+    while pending:
+        done, pending = wait(pending, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            try:
+                return future.result()
+            except Exception:
+                continue
+    return None
+
+
+def get_public_ip():
+    """
+    获取公网IP（先检查本机网卡，再并发请求多个外部服务，全部失败时返回 None）
+
+    结果缓存 IP_CACHE_TTL 秒（失败时 IP_FAILURE_TTL 秒）；并发请求合并为一次检测，
+    检测期间不持有锁，其他请求只等待这一次检测的结果
+    """
+    global _ip_inflight
+    with _ip_lock:
+        if time.time() < _ip_cache['expires']:
+            return _ip_cache['ip']
+        inflight = _ip_inflight
+        leader = inflight is None
+        if leader:
+            inflight = _ip_inflight = threading.Event()
+
+    if not leader:
+        inflight.wait(IP_TIMEOUT * 2)
+        with _ip_lock:
+            return _ip_cache['ip']
+
+    ip = None
+    try:
+        ip = _detect_ip()
+    finally:
+        with _ip_lock:
+            _ip_cache.update(ip=ip, expires=time.time() + (IP_CACHE_TTL if ip else IP_FAILURE_TTL))
+            _ip_inflight = None
+        inflight.set()
+    return ip